@@ -2,6 +2,7 @@ import os
 from flask import Flask
 from flask_cors import CORS
 from flask_migrate import Migrate
+from werkzeug.middleware.proxy_fix import ProxyFix
 from dotenv import load_dotenv
 
 # Load environment variables from .env file first
@@ -17,7 +18,27 @@ from routes.reservation_routes import reservation_routes
 from routes.menu_routes import menu_routes
 from routes.payment_routes import payment_routes
 from routes.notification_routes import notification_routes
+from routes.asset_routes import asset_bp
+from routes.activity_routes import activity_routes
 from utils.google_oauth import init_oauth
+from utils.payment_gateway import init_gateway
+from utils.payment_worker import init_payment_processor
+from utils.revenue import init_revenue
+from utils.settlement import init_settlement
+from utils.mailer import init_email_sender
+from utils.unread_counters import init_unread_counters
+from utils.notification_stream import init_notification_stream
+from utils.identity_cache import init_identity_cache
+from utils.auth_tokens import init_auth_tokens
+from utils.passwords import init_password_hasher
+from utils.throttle import init_throttle
+from utils.avatars import init_avatars
+from utils.assets import init_assets
+from utils.activity_log import init_activity_log
+from utils.activity_partitions import init_activity_partitions
+from utils.serialization import init_serialization
+from utils.db_engine import init_db_engine
+from utils.paging import NEXT_PAGE_HEADER
 
 def create_app():
     """Application factory function"""
@@ -29,11 +50,26 @@ def create_app():
         ProductionConfig() if env == "production" else DevelopmentConfig()
     )
 
+    # Behind trusted proxies, take the client's address and scheme from X-Forwarded-*
+    proxy_hops = {
+        "x_for": app.config.get('PROXY_FIX_X_FOR', 0),
+        "x_proto": app.config.get('PROXY_FIX_X_PROTO', 0),
+        "x_host": app.config.get('PROXY_FIX_X_HOST', 0),
+    }
+    if any(proxy_hops.values()):
+        app.wsgi_app = ProxyFix(app.wsgi_app, **proxy_hops)
+
     # Initialize extensions
+    init_serialization(app)
+    init_db_engine(app)
     db.init_app(app)
     login_manager.init_app(app)
+    init_identity_cache(app)
+    init_auth_tokens(app)
+    init_password_hasher(app)
+    init_throttle(app)
     Migrate(app, db)
-    CORS(app, supports_credentials=True, origins=["http://localhost:3000"])
+    CORS(app, supports_credentials=True, origins=["http://localhost:3000"], expose_headers=[NEXT_PAGE_HEADER])
 
     # Register blueprints
     app.register_blueprint(auth_bp)
@@ -43,12 +79,31 @@ def create_app():
     app.register_blueprint(menu_routes)
     app.register_blueprint(payment_routes)
     app.register_blueprint(notification_routes)
+    app.register_blueprint(asset_bp)
+    app.register_blueprint(activity_routes)
 
     # Initialize Google OAuth
     init_oauth(app)
 
+    # Payment gateway and background outbox worker
+    init_gateway(app)
+    init_payment_processor(app)
+    init_revenue(app)
+    init_settlement(app)
+
+    # Background email delivery
+    init_email_sender(app)
+    init_unread_counters(app)
+    init_notification_stream(app)
+
+    # Audit trail, written in batches by a background thread
+    init_activity_log(app)
+    init_activity_partitions(app)
+
     # Ensure avatar folder exists
     os.makedirs(app.config["UPLOAD_FOLDER"], exist_ok=True)
+    init_avatars(app)
+    init_assets(app)
 
     return app
 
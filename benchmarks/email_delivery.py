@@ -0,0 +1,114 @@
+# benchmarks/email_delivery.py
+"""Email outbox delivery against a real SMTP server (aiosmtpd, in-process).
+
+Queues ``--emails`` outbox rows in a throwaway SQLite database, drains them
+with ``EmailSender`` into an aiosmtpd server on localhost, and checks that
+every message arrived. Every ``--bounce-every``-th recipient is refused with a
+550, which must mark that row ``failed`` without retrying or disturbing the
+rest of its batch. Also reports how many SMTP sessions the sender opened.
+
+    pip install aiosmtpd
+    python benchmarks/email_delivery.py --emails 2000 --batch-size 50
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+import warnings
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class RecordingHandler:
+    def __init__(self, bounce_every):
+        self.bounce_every = bounce_every
+        self.received = []
+        self.sessions = 0
+
+    async def handle_EHLO(self, server, session, envelope, hostname, responses):
+        self.sessions += 1
+        session.host_name = hostname
+        return responses
+
+    async def handle_RCPT(self, server, session, envelope, address, rcpt_options):
+        if self.bounce_every and address.startswith('bounce'):
+            return '550 No such user'
+        envelope.rcpt_tos.append(address)
+        return '250 OK'
+
+    async def handle_DATA(self, server, session, envelope):
+        self.received.extend(envelope.rcpt_tos)
+        return '250 Message accepted for delivery'
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--emails', type=int, default=1000)
+    parser.add_argument('--batch-size', type=int, default=50)
+    parser.add_argument('--bounce-every', type=int, default=100, help="Refuse every n-th recipient; 0 refuses none")
+    parser.add_argument('--port', type=int, default=8025)
+    args = parser.parse_args()
+
+    try:
+        from aiosmtpd.controller import Controller
+    except ImportError:
+        sys.exit("aiosmtpd is required: pip install aiosmtpd")
+
+    warnings.filterwarnings('ignore')
+    os.environ.setdefault('DATABASE_URL', 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'bench.db'))
+    os.environ.update(
+        SMTP_SERVER='localhost', SMTP_PORT=str(args.port), SMTP_USE_TLS='false',
+        EMAIL_SENDER_ENABLED='false', ACTIVITY_LOG_ENABLED='false',
+    )
+    from sqlalchemy import insert
+    from app import create_app
+    from models import db, EmailOutbox
+    from utils.mailer import email_sender
+
+    handler = RecordingHandler(args.bounce_every)
+    controller = Controller(handler, hostname='localhost', port=args.port)
+    controller.start()
+    app = create_app()
+    app.config.update(SERVER_NAME=None, EMAIL_BATCH_SIZE=args.batch_size)
+    try:
+        with app.app_context():
+            db.create_all()
+
+            def address(i):
+                bounced = args.bounce_every and i % args.bounce_every == 0
+                return f"{'bounce' if bounced else 'guest'}{i}@bench.local"
+
+            db.session.execute(insert(EmailOutbox), [
+                {"recipient_email": address(i), "subject": f"Notification {i}", "html_body": "<p>Hello</p>"}
+                for i in range(1, args.emails + 1)
+            ])
+            db.session.commit()
+
+        started = time.perf_counter()
+        processed = email_sender.drain()
+        elapsed = time.perf_counter() - started
+        email_sender._disconnect()
+
+        with app.app_context():
+            statuses = dict(
+                db.session.query(EmailOutbox.status, db.func.count()).group_by(EmailOutbox.status).all()
+            )
+            retried = EmailOutbox.query.filter(EmailOutbox.attempts > 1).count()
+    finally:
+        controller.stop()
+
+    bounced = args.emails // args.bounce_every if args.bounce_every else 0
+    print(f"processed {processed} in {elapsed:.2f}s ({processed / elapsed:.0f}/s) over {handler.sessions} SMTP session(s)")
+    print(f"outbox: {statuses}; received by the server: {len(handler.received)}; retried: {retried}")
+    ok = (
+        statuses.get('sent', 0) == len(handler.received) == args.emails - bounced
+        and statuses.get('failed', 0) == bounced and not retried
+    )
+    print("OK" if ok else "MISMATCH")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == '__main__':
+    main()
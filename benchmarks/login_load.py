@@ -0,0 +1,100 @@
+# benchmarks/login_load.py
+"""Concurrent load against POST /api/auth/login.
+
+Simulates a shift change: ``--users`` staff accounts all signing in at once,
+``--rounds`` times each. By default the app runs in-process on a threaded
+development server over a throwaway SQLite database. Pass ``--url`` (plus
+``--email``/``--password`` of an existing account) to load a real deployment.
+
+    python benchmarks/login_load.py --users 40 --concurrency 40
+    PASSWORD_HASH_MAX_PENDING=8 python benchmarks/login_load.py --users 40
+    PASSWORD_HASH_SCHEME=werkzeug python benchmarks/login_load.py
+"""
+
+import argparse
+import logging
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def start_local_app(users, password):
+    os.environ.setdefault('DATABASE_URL', 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'bench.db'))
+    from werkzeug.serving import make_server
+    from app import create_app
+    from models import db, User
+    from models.user import RoleEnum
+    from utils.passwords import hash_password
+
+    app = create_app()
+    app.config.update(SESSION_COOKIE_SECURE=False, SESSION_COOKIE_DOMAIN=None, SERVER_NAME=None)
+    with app.app_context():
+        db.create_all()
+        password_hash = hash_password(password)  # one hash, shared, keeps seeding fast
+        db.session.add_all([
+            User(full_name=f'Staff {i}', email=f'staff{i}@bench.local', role=RoleEnum.WAITER,
+                 password_hash=password_hash)
+            for i in range(users)
+        ])
+        db.session.commit()
+
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f'http://127.0.0.1:{server.server_port}', server
+
+
+def login(url, email, password):
+    started = time.perf_counter()
+    response = requests.post(f'{url}/api/auth/login', json={'email': email, 'password': password}, timeout=60)
+    return response.status_code, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--url', help="Target an existing server instead of an in-process app")
+    parser.add_argument('--email', help="Account to sign in as with --url")
+    parser.add_argument('--password', default='bench-password')
+    parser.add_argument('--users', type=int, default=40)
+    parser.add_argument('--rounds', type=int, default=3)
+    parser.add_argument('--concurrency', type=int, default=40)
+    args = parser.parse_args()
+
+    server = None
+    if args.url:
+        if not args.email:
+            parser.error("--email is required with --url")
+        url, emails = args.url.rstrip('/'), [args.email] * args.users
+    else:
+        url, server = start_local_app(args.users, args.password)
+        emails = [f'staff{i}@bench.local' for i in range(args.users)]
+
+    attempts = emails * args.rounds
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        results = list(pool.map(lambda email: login(url, email, args.password), attempts))
+    elapsed = time.perf_counter() - started
+
+    statuses = Counter(status for status, _ in results)
+    latencies = sorted(latency for status, latency in results if status == 200)
+    print(f"{len(results)} logins, concurrency {args.concurrency}, {elapsed:.2f}s, {len(results) / elapsed:.1f} req/s")
+    print("status codes:", dict(sorted(statuses.items())))
+    if latencies:
+        quantiles = statistics.quantiles(latencies, n=100, method='inclusive') if len(latencies) > 1 else latencies * 99
+        print(f"200 latency ms: p50 {quantiles[49] * 1000:.0f}  p95 {quantiles[94] * 1000:.0f}  "
+              f"p99 {quantiles[98] * 1000:.0f}  max {latencies[-1] * 1000:.0f}")
+    if server is not None:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
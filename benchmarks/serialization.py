@@ -0,0 +1,147 @@
+# benchmarks/serialization.py
+"""List endpoint serialization: to_dict + stdlib jsonify versus compiled serializers.
+
+Seeds a throwaway SQLite database with ``size`` orders (two items and a
+payment each) and as many reservations, then times building the response body
+of GET /api/menu/orders and GET /api/reservations three ways:
+
+* ``to_dict``: the previous code path: lazy loads, ``to_dict()`` per row,
+  and Flask's stdlib JSON provider
+* ``to_dict+orjson``: the same dicts through ``FastJSONProvider``
+* ``compiled``: what the endpoints do now: eager loads, compiled serializers and a
+  streamed body (uncompressed, as no Accept-Encoding is sent)
+
+The to_dict paths lazy-load every row's relations and take minutes per run
+at 100000 rows, so above ``--legacy-max`` rows only ``compiled`` is timed.
+
+    python benchmarks/serialization.py --sizes 1000,10000,100000
+"""
+
+import argparse
+import gc
+import os
+import random
+import sys
+import tempfile
+import time
+import warnings
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def seed(app, size):
+    from sqlalchemy import insert
+    from models import db, User, Table, MenuCategory, MenuItem, Order, OrderItem, Payment, Reservation
+    from models.user import RoleEnum
+
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        now = datetime.utcnow()
+        db.session.add(User(full_name='Bench Admin', email='admin@bench.local', role=RoleEnum.ADMIN, password_hash='x'))
+        db.session.add(MenuCategory(name='Bench'))
+        db.session.flush()
+        db.session.execute(insert(User), [
+            {"full_name": f"Guest {i}", "email": f"guest{i}@bench.local", "role": RoleEnum.CUSTOMER}
+            for i in range(100)
+        ])
+        db.session.execute(insert(Table), [{"number": i, "capacity": 4 + i % 4} for i in range(1, 51)])
+        db.session.execute(insert(MenuItem), [
+            {"name": f"Dish {i}", "price": 5 + i, "category_id": 1, "preparation_time": 10 + i} for i in range(40)
+        ])
+        db.session.execute(insert(Order), [
+            {"id": i, "user_id": 2 + i % 100, "table_id": 1 + i % 50, "status": "served",
+             "created_at": now - timedelta(minutes=i), "estimated_completion": now - timedelta(minutes=i - 15)}
+            for i in range(1, size + 1)
+        ])
+        db.session.execute(insert(OrderItem), [
+            {"order_id": 1 + i // 2, "menu_item_id": 1 + random.randrange(40), "quantity": 1 + i % 3, "status": "done"}
+            for i in range(size * 2)
+        ])
+        db.session.execute(insert(Payment), [
+            {"order_id": i, "cashier_id": 1, "amount": 25.5, "method": "card", "status": "completed",
+             "paid_at": now - timedelta(minutes=i), "transaction_id": f"tx-{i}"}
+            for i in range(1, size + 1)
+        ])
+        db.session.execute(insert(Reservation), [
+            {"user_id": 2 + i % 100, "table_id": 1 + i % 50, "reservation_time": now + timedelta(minutes=30 * i),
+             "duration": 60, "guests": 2, "status": "confirmed"}
+            for i in range(size)
+        ])
+        db.session.commit()
+
+
+def timed(fn, repeat):
+    best = None
+    for _ in range(repeat):
+        gc.collect()
+        started = time.perf_counter()
+        body = fn()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None or elapsed < best else best
+    return best, len(body)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', default='1000,10000,100000', help="Comma-separated row counts")
+    parser.add_argument('--repeat', type=int, default=3, help="Runs per measurement; the best is reported")
+    parser.add_argument('--legacy-max', type=int, default=10000, help="Largest size the to_dict paths are timed at")
+    args = parser.parse_args()
+
+    warnings.filterwarnings('ignore')
+    os.environ.setdefault('DATABASE_URL', 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'bench.db'))
+    os.environ.setdefault('ACTIVITY_LOG_ENABLED', 'false')
+    from flask.json.provider import DefaultJSONProvider
+    from flask import jsonify
+    from app import create_app
+    from models import db, Order, Reservation
+    from routes.menu_routes import get_orders
+    from routes.reservation_routes import get_reservations
+    from utils.serialization import FastJSONProvider, orjson
+
+    app = create_app()
+    app.config.update(SERVER_NAME=None)
+    stdlib, fast = DefaultJSONProvider(app), FastJSONProvider(app)
+    print(f"orjson: {'installed' if orjson else 'not installed (stdlib fallback)'}")
+
+    def legacy(model, order_by):
+        def run():
+            db.session.expunge_all()
+            rows = model.query.order_by(order_by).all()
+            return jsonify([row.to_dict() for row in rows]).get_data()
+        return run
+
+    def current(view):
+        def run():
+            db.session.expunge_all()
+            return view().get_data()
+        return run
+
+    endpoints = (
+        ("orders", Order, Order.created_at.desc(), get_orders.__wrapped__),
+        ("reservations", Reservation, Reservation.reservation_time, get_reservations.__wrapped__),
+    )
+    for size in (int(s) for s in args.sizes.split(',')):
+        seed(app, size)
+        print(f"\n{size} rows")
+        for name, model, order_by, view in endpoints:
+            results = []
+            with app.test_request_context(f'/?bench={name}'):
+                if size <= args.legacy_max:
+                    app.json = stdlib
+                    results.append(("to_dict", timed(legacy(model, order_by), args.repeat)))
+                    app.json = fast
+                    results.append(("to_dict+orjson", timed(legacy(model, order_by), args.repeat)))
+                else:
+                    app.json = fast
+                results.append(("compiled", timed(current(view), args.repeat)))
+            baseline = results[0][1][0]
+            for label, (elapsed, length) in results:
+                speedup = f"x{baseline / elapsed:5.1f}" if len(results) > 1 else ""
+                print(f"  {name:<13} {label:<15} {elapsed * 1000:9.1f} ms  {length / 1e6:7.2f} MB  {speedup}")
+
+
+if __name__ == '__main__':
+    main()
@@ -9,6 +9,17 @@ class Config:
     SECRET_KEY = os.getenv("SECRET_KEY", "supersecret")
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     UPLOAD_FOLDER = os.getenv("UPLOAD_FOLDER", "static/avatars")
+    AVATAR_SIZES = tuple(int(size) for size in os.getenv("AVATAR_SIZES", "64,128,256").split(","))
+    AVATAR_QUALITY = int(os.getenv("AVATAR_QUALITY", 82))
+    AVATAR_MAX_BYTES = int(os.getenv("AVATAR_MAX_BYTES", 10 * 1024 * 1024))
+    AVATAR_WORKERS = int(os.getenv("AVATAR_WORKERS", 2))  # processes
+    ASSET_OFFLOAD = os.getenv("ASSET_OFFLOAD")  # nginx (X-Accel-Redirect) or sendfile (X-Sendfile); unset serves from Python
+    ASSET_ACCEL_PREFIX = os.getenv("ASSET_ACCEL_PREFIX", "/protected-static/")  # nginx internal location aliased to static/
+    JSON_SERIALIZER = os.getenv("JSON_SERIALIZER", "auto")  # auto uses orjson when installed; stdlib forces the json module
+    STREAM_BATCH_SIZE = int(os.getenv("STREAM_BATCH_SIZE", 500))  # rows per fetch and per chunk of streamed lists
+    RESPONSE_COMPRESSION = os.getenv("RESPONSE_COMPRESSION", "true").lower() == "true"  # false when a proxy compresses
+    RESPONSE_GZIP_LEVEL = int(os.getenv("RESPONSE_GZIP_LEVEL", 6))
+    RESPONSE_BROTLI_QUALITY = int(os.getenv("RESPONSE_BROTLI_QUALITY", 4))  # higher qualities cost too much CPU on the fly
     GOOGLE_CLIENT_ID = os.getenv("GOOGLE_CLIENT_ID")
     GOOGLE_CLIENT_SECRET = os.getenv("GOOGLE_CLIENT_SECRET")
     
@@ -18,7 +29,106 @@ class Config:
     SMTP_USER = os.getenv("SMTP_USER")
     SMTP_PASSWORD = os.getenv("SMTP_PASSWORD")
     MAIL_DEFAULT_SENDER = os.getenv("MAIL_DEFAULT_SENDER", "notifications@example.com")
+    SMTP_USE_TLS = os.getenv("SMTP_USE_TLS", "true").lower() == "true"
+    SMTP_TIMEOUT = float(os.getenv("SMTP_TIMEOUT", 10))
+    SMTP_IDLE_TIMEOUT = float(os.getenv("SMTP_IDLE_TIMEOUT", 60))  # close the reused SMTP session after this
+    SMTP_NOOP_AFTER = float(os.getenv("SMTP_NOOP_AFTER", 30))  # idle seconds after which the session is checked with NOOP
+    EMAIL_SENDER_ENABLED = os.getenv("EMAIL_SENDER_ENABLED", "true").lower() == "true"  # false: run `flask email worker`
+    EMAIL_BATCH_SIZE = int(os.getenv("EMAIL_BATCH_SIZE", 50))
+    EMAIL_MAX_ATTEMPTS = int(os.getenv("EMAIL_MAX_ATTEMPTS", 5))
+    EMAIL_RETRY_BACKOFF = float(os.getenv("EMAIL_RETRY_BACKOFF", 30))
+    EMAIL_POLL_INTERVAL = float(os.getenv("EMAIL_POLL_INTERVAL", 10))
+    EMAIL_SENDING_LEASE = int(os.getenv("EMAIL_SENDING_LEASE", 300))  # seconds before a claimed batch is handed out again
+
+    # Password hashing
+    PASSWORD_HASH_SCHEME = os.getenv("PASSWORD_HASH_SCHEME", "bcrypt")  # bcrypt or werkzeug; old hashes are upgraded on login
+    PASSWORD_BCRYPT_ROUNDS = int(os.getenv("PASSWORD_BCRYPT_ROUNDS", 12))
+    PASSWORD_WERKZEUG_METHOD = os.getenv("PASSWORD_WERKZEUG_METHOD", "scrypt")
+    PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", os.cpu_count() or 2))
+    PASSWORD_HASH_MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", 32))  # beyond this, logins get a 503
+    PASSWORD_HASH_TIMEOUT = float(os.getenv("PASSWORD_HASH_TIMEOUT", 30))
+
+    # Authentication throttling: "<hits>/<seconds>" per client IP and per submitted email
+    THROTTLE_ENABLED = os.getenv("THROTTLE_ENABLED", "true").lower() == "true"
+    THROTTLE_BACKEND = os.getenv("THROTTLE_BACKEND", "memory")  # memory (per worker) or database (shared)
+    THROTTLE_RULES = {
+        "login_ip": os.getenv("THROTTLE_LOGIN_IP", "30/60"),
+        "login_email": os.getenv("THROTTLE_LOGIN_EMAIL", "10/300"),
+        "forgot_password_ip": os.getenv("THROTTLE_FORGOT_PASSWORD_IP", "10/300"),
+        "forgot_password_email": os.getenv("THROTTLE_FORGOT_PASSWORD_EMAIL", "3/900"),
+    }
+
+    # Reverse proxies in front of the app: how many hops of X-Forwarded-* to trust (werkzeug ProxyFix).
+    # 0 trusts none; then request.remote_addr, which keys the IP throttle and the audit trail, is the proxy
+    PROXY_FIX_X_FOR = int(os.getenv("PROXY_FIX_X_FOR", 0))
+    PROXY_FIX_X_PROTO = int(os.getenv("PROXY_FIX_X_PROTO", 0))
+    PROXY_FIX_X_HOST = int(os.getenv("PROXY_FIX_X_HOST", 0))
+
+    # Signed bearer tokens (utils/auth_tokens.py), alongside the session cookie
+    AUTH_TOKENS_ENABLED = os.getenv("AUTH_TOKENS_ENABLED", "false").lower() == "true"
+    AUTH_TOKEN_SECRET = os.getenv("AUTH_TOKEN_SECRET")  # shared by every worker; defaults to SECRET_KEY
+    AUTH_ACCESS_TOKEN_TTL = int(os.getenv("AUTH_ACCESS_TOKEN_TTL", 900))
+    AUTH_REFRESH_TOKEN_TTL = int(os.getenv("AUTH_REFRESH_TOKEN_TTL", 30 * 86400))
+    AUTH_REVOCATION_REFRESH = float(os.getenv("AUTH_REVOCATION_REFRESH", 5))  # max delay before other workers see a revocation
+
+    # Audit trail (utils/activity_log.py)
+    ACTIVITY_LOG_ENABLED = os.getenv("ACTIVITY_LOG_ENABLED", "true").lower() == "true"
+    ACTIVITY_BUFFER_SIZE = int(os.getenv("ACTIVITY_BUFFER_SIZE", 10000))  # beyond this the oldest entries are dropped
+    ACTIVITY_FLUSH_SIZE = int(os.getenv("ACTIVITY_FLUSH_SIZE", 500))
+    ACTIVITY_FLUSH_INTERVAL = float(os.getenv("ACTIVITY_FLUSH_INTERVAL", 2))  # bounds what a crash can lose
+    ACTIVITY_RETENTION_MONTHS = int(os.getenv("ACTIVITY_RETENTION_MONTHS", 12))  # `flask activity prune` keeps these plus the current month
+
+    # Authenticated user cache
+    IDENTITY_CACHE_TTL = float(os.getenv("IDENTITY_CACHE_TTL", 30))  # bounds staleness across hosts
+    IDENTITY_CACHE_SIZE = int(os.getenv("IDENTITY_CACHE_SIZE", 10000))
+    IDENTITY_STAMP_FILE = os.getenv("IDENTITY_STAMP_FILE")  # shared by the workers on a host; defaults to the instance folder
+
+    # Notifications
+    NOTIFICATION_UNREAD_CACHE_TTL = float(os.getenv("NOTIFICATION_UNREAD_CACHE_TTL", 5))  # max staleness across workers
+    NOTIFICATION_UNREAD_CACHE_SIZE = int(os.getenv("NOTIFICATION_UNREAD_CACHE_SIZE", 10000))
+    NOTIFICATION_COUNTER_RECONCILE_INTERVAL = int(os.getenv("NOTIFICATION_COUNTER_RECONCILE_INTERVAL", 3600))
+    NOTIFICATION_PURGE_INTERVAL = float(os.getenv("NOTIFICATION_PURGE_INTERVAL", 300))  # expired rows leave the unread badge; 0 leaves it to the CLI
+    NOTIFICATION_DIGEST_INTERVAL = int(os.getenv("NOTIFICATION_DIGEST_INTERVAL", 3600))  # 0 emails everything immediately
+    NOTIFICATION_DIGEST_BELOW_PRIORITY = int(os.getenv("NOTIFICATION_DIGEST_BELOW_PRIORITY", 0))  # lower priorities are digested; the default 0 is not
+    NOTIFICATION_STREAM_BACKEND = os.getenv("NOTIFICATION_STREAM_BACKEND", "auto")  # auto, postgres, file, none
+    NOTIFICATION_SIGNAL_FILE = os.getenv("NOTIFICATION_SIGNAL_FILE")  # file backend; defaults to the instance folder
+    NOTIFICATION_SIGNAL_POLL_INTERVAL = float(os.getenv("NOTIFICATION_SIGNAL_POLL_INTERVAL", 0.25))
+    NOTIFICATION_STREAM_HEARTBEAT = float(os.getenv("NOTIFICATION_STREAM_HEARTBEAT", 15))
+    NOTIFICATION_STREAM_MAX_AGE = float(os.getenv("NOTIFICATION_STREAM_MAX_AGE", 300))  # clients reconnect with Last-Event-ID
+
+    # Payment processing
+    PAYMENT_GATEWAY = os.getenv("PAYMENT_GATEWAY", "simulated")
+    PAYMENT_GATEWAY_LATENCY = float(os.getenv("PAYMENT_GATEWAY_LATENCY", 0))        # seconds, simulated gateway only
+    PAYMENT_GATEWAY_FAILURE_RATE = float(os.getenv("PAYMENT_GATEWAY_FAILURE_RATE", 0))  # 0..1, simulated gateway only
+    PAYMENT_WORKERS = int(os.getenv("PAYMENT_WORKERS", 4))  # 0 processes payments inline
+    PAYMENT_MAX_ATTEMPTS = int(os.getenv("PAYMENT_MAX_ATTEMPTS", 3))
+    PAYMENT_RETRY_BACKOFF = float(os.getenv("PAYMENT_RETRY_BACKOFF", 2))
+    PAYMENT_OUTBOX_POLL_INTERVAL = float(os.getenv("PAYMENT_OUTBOX_POLL_INTERVAL", 5))
+    PAYMENT_PROCESSING_LEASE = int(os.getenv("PAYMENT_PROCESSING_LEASE", 300))
+    PAYMENT_CALLBACK_SECRET = os.getenv("PAYMENT_CALLBACK_SECRET")
+    PAYMENT_GATEWAY_URL = os.getenv("PAYMENT_GATEWAY_URL")  # http gateway only
+    PAYMENT_GATEWAY_API_KEY = os.getenv("PAYMENT_GATEWAY_API_KEY")
+    PAYMENT_GATEWAY_CONNECT_TIMEOUT = float(os.getenv("PAYMENT_GATEWAY_CONNECT_TIMEOUT", 3.05))
+    PAYMENT_GATEWAY_READ_TIMEOUT = float(os.getenv("PAYMENT_GATEWAY_READ_TIMEOUT", 10))
+    PAYMENT_GATEWAY_RETRIES = int(os.getenv("PAYMENT_GATEWAY_RETRIES", 2))
+    PAYMENT_GATEWAY_BACKOFF = float(os.getenv("PAYMENT_GATEWAY_BACKOFF", 0.5))
+    PAYMENT_GATEWAY_BREAKER_THRESHOLD = int(os.getenv("PAYMENT_GATEWAY_BREAKER_THRESHOLD", 5))
+    PAYMENT_GATEWAY_BREAKER_RESET = float(os.getenv("PAYMENT_GATEWAY_BREAKER_RESET", 30))
     
+    # Database engine profiles (utils/db_engine.py)
+    WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", 1))  # gunicorn workers; gunicorn.conf.py reads the same variables
+    GUNICORN_THREADS = int(os.getenv("GUNICORN_THREADS", 8))  # threads per worker
+    GUNICORN_WORKER_CLASS = os.getenv("GUNICORN_WORKER_CLASS", "gthread")  # sync workers refuse notification streams
+    DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 0))  # 0 sizes the pool from the threads sharing it
+    DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", 5))
+    DB_MAX_CONNECTIONS = int(os.getenv("DB_MAX_CONNECTIONS", 0))  # server-side budget split across workers; 0 leaves pools uncapped
+    DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", 10))
+    DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", 1800))  # seconds; below any proxy or server idle timeout
+    DB_STATEMENT_TIMEOUT = int(os.getenv("DB_STATEMENT_TIMEOUT", 30000))  # milliseconds, PostgreSQL; 0 disables
+    SQLITE_BUSY_TIMEOUT = float(os.getenv("SQLITE_BUSY_TIMEOUT", 15))  # seconds a write waits for the lock
+    SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+    SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", 256 * 1024 * 1024))
+
     # Database configuration
     @property
     def SQLALCHEMY_DATABASE_URI(self):
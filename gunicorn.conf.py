@@ -0,0 +1,16 @@
+# gunicorn.conf.py
+# Loaded automatically by gunicorn started from this directory: `gunicorn wsgi:app`.
+# The database pool of each worker is sized from the same numbers (utils/db_engine.py).
+import os
+
+workers = int(os.getenv("WEB_CONCURRENCY", 1))
+# Threaded workers: a notification stream (SSE) holds its request thread for minutes
+worker_class = os.getenv("GUNICORN_WORKER_CLASS", "gthread")
+threads = int(os.getenv("GUNICORN_THREADS", 8))
+
+
+def post_fork(server, worker):
+    # Command-line flags override this file; hand the app what gunicorn actually runs with
+    os.environ["WEB_CONCURRENCY"] = str(server.cfg.workers)
+    os.environ["GUNICORN_THREADS"] = str(server.cfg.threads)
+    os.environ["GUNICORN_WORKER_CLASS"] = server.cfg.worker_class_str
@@ -93,6 +93,11 @@ def run_migrations_online():
     connectable = get_engine()
 
     with connectable.connect() as connection:
+        if connection.dialect.name == 'postgresql':
+            # Migrations may rewrite whole tables; the request-sized statement timeout does not apply
+            connection.exec_driver_sql("SET statement_timeout = 0")
+            connection.commit()
+
         context.configure(
             connection=connection,
             target_metadata=get_metadata(),
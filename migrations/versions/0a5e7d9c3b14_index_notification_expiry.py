@@ -0,0 +1,41 @@
+"""Index notification expiry
+
+Revision ID: 0a5e7d9c3b14
+Revises: f29c83d15b7e
+Create Date: 2026-10-19 14:47:12.805630
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0a5e7d9c3b14'
+down_revision = 'f29c83d15b7e'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Reads filter on expires_at > now, so give legacy rows the default 7-day lifetime
+    notifications = sa.table('notifications', sa.column('created_at', sa.DateTime), sa.column('expires_at', sa.DateTime))
+    bind = op.get_bind()
+    if bind.dialect.name == 'postgresql':
+        expiry = notifications.c.created_at + sa.text("interval '7 days'")
+    else:
+        expiry = sa.func.datetime(notifications.c.created_at, '+7 days')
+    op.execute(
+        notifications.update()
+        .where(notifications.c.expires_at.is_(None))
+        .values(expires_at=sa.func.coalesce(expiry, sa.func.current_timestamp()))
+    )
+
+    with op.batch_alter_table('notifications', schema=None) as batch_op:
+        batch_op.create_index('ix_notifications_recipient_id_expires_at', ['recipient_id', 'expires_at'], unique=False)
+        batch_op.create_index('ix_notifications_expires_at', ['expires_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('notifications', schema=None) as batch_op:
+        batch_op.drop_index('ix_notifications_expires_at')
+        batch_op.drop_index('ix_notifications_recipient_id_expires_at')
@@ -0,0 +1,30 @@
+"""Index the notification inbox
+
+Revision ID: 5b8e2c7a1d46
+Revises: 0a5e7d9c3b14
+Create Date: 2026-10-19 15:32:40.118204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5b8e2c7a1d46'
+down_revision = '0a5e7d9c3b14'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('notifications', schema=None) as batch_op:
+        batch_op.create_index(
+            'ix_notifications_recipient_id_is_read_created_at',
+            ['recipient_id', 'is_read', sa.text('created_at DESC')],
+            unique=False
+        )
+
+
+def downgrade():
+    with op.batch_alter_table('notifications', schema=None) as batch_op:
+        batch_op.drop_index('ix_notifications_recipient_id_is_read_created_at')
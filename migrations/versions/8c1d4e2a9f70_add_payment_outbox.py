@@ -0,0 +1,42 @@
+"""Add payment outbox
+
+Revision ID: 8c1d4e2a9f70
+Revises: 31b21d067adc
+Create Date: 2026-10-19 09:12:41.503118
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8c1d4e2a9f70'
+down_revision = '31b21d067adc'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('payment_outbox',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('payment_id', sa.Integer(), nullable=False),
+    sa.Column('status', sa.String(length=20), nullable=False),
+    sa.Column('attempts', sa.Integer(), nullable=False),
+    sa.Column('confirm_order', sa.Boolean(), nullable=False),
+    sa.Column('last_error', sa.Text(), nullable=True),
+    sa.Column('available_at', sa.DateTime(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['payment_id'], ['payments.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('payment_id')
+    )
+    with op.batch_alter_table('payment_outbox', schema=None) as batch_op:
+        batch_op.create_index('ix_payment_outbox_status_available_at', ['status', 'available_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('payment_outbox', schema=None) as batch_op:
+        batch_op.drop_index('ix_payment_outbox_status_available_at')
+
+    op.drop_table('payment_outbox')
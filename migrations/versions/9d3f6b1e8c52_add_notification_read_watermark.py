@@ -0,0 +1,26 @@
+"""Add the notification read watermark
+
+Revision ID: 9d3f6b1e8c52
+Revises: 5b8e2c7a1d46
+Create Date: 2026-10-19 16:05:13.472981
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9d3f6b1e8c52'
+down_revision = '5b8e2c7a1d46'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('notification_inboxes', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('last_read_at', sa.DateTime(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('notification_inboxes', schema=None) as batch_op:
+        batch_op.drop_column('last_read_at')
@@ -0,0 +1,44 @@
+"""Add activity logs
+
+Revision ID: a3d95c07e2b1
+Revises: f7a83c5e1b94
+Create Date: 2026-10-19 19:52:08.114530
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a3d95c07e2b1'
+down_revision = 'f7a83c5e1b94'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('activity_logs',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=True),
+    sa.Column('action_type', sa.String(length=50), nullable=False),
+    sa.Column('description', sa.Text(), nullable=True),
+    sa.Column('ip_address', sa.String(length=45), nullable=True),
+    sa.Column('user_agent', sa.Text(), nullable=True),
+    sa.Column('activity_data', sa.Text(), nullable=True),
+    sa.Column('timestamp', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='SET NULL'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('activity_logs', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_activity_logs_timestamp'), ['timestamp'], unique=False)
+        batch_op.create_index('ix_activity_logs_user_id_timestamp', ['user_id', 'timestamp'], unique=False)
+        batch_op.create_index('ix_activity_logs_action_type_timestamp', ['action_type', 'timestamp'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('activity_logs', schema=None) as batch_op:
+        batch_op.drop_index('ix_activity_logs_action_type_timestamp')
+        batch_op.drop_index('ix_activity_logs_user_id_timestamp')
+        batch_op.drop_index(batch_op.f('ix_activity_logs_timestamp'))
+
+    op.drop_table('activity_logs')
@@ -0,0 +1,30 @@
+"""Add notification digest scheduling
+
+Revision ID: a6c40e92d7f1
+Revises: 9d3f6b1e8c52
+Create Date: 2026-10-19 16:41:55.209318
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a6c40e92d7f1'
+down_revision = '9d3f6b1e8c52'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('notification_inboxes', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('digest_due_at', sa.DateTime(), nullable=True))
+        batch_op.add_column(sa.Column('digested_through', sa.DateTime(), nullable=True))
+        batch_op.create_index(batch_op.f('ix_notification_inboxes_digest_due_at'), ['digest_due_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('notification_inboxes', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_notification_inboxes_digest_due_at'))
+        batch_op.drop_column('digested_through')
+        batch_op.drop_column('digest_due_at')
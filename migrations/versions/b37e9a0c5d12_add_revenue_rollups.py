@@ -0,0 +1,45 @@
+"""Add revenue rollups
+
+Revision ID: b37e9a0c5d12
+Revises: 8c1d4e2a9f70
+Create Date: 2026-10-19 10:03:17.220945
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b37e9a0c5d12'
+down_revision = '8c1d4e2a9f70'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('revenue_rollups',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('method', sa.String(length=50), nullable=False),
+    sa.Column('cashier_id', sa.Integer(), nullable=False),
+    sa.Column('payment_count', sa.Integer(), nullable=False),
+    sa.Column('amount', sa.Float(), nullable=False),
+    sa.Column('tip_amount', sa.Float(), nullable=False),
+    sa.Column('tax_amount', sa.Float(), nullable=False),
+    sa.Column('discount', sa.Float(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['cashier_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('day', 'method', 'cashier_id', name='uq_revenue_rollups_day_method_cashier')
+    )
+    with op.batch_alter_table('payments', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_payments_paid_at'), ['paid_at'], unique=False)
+
+    # Run `flask revenue rebuild --start <first day> --end <yesterday>` to backfill history.
+
+
+def downgrade():
+    with op.batch_alter_table('payments', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_payments_paid_at'))
+
+    op.drop_table('revenue_rollups')
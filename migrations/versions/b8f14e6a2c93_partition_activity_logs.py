@@ -0,0 +1,148 @@
+"""Partition activity logs by month and add hourly rollups
+
+Revision ID: b8f14e6a2c93
+Revises: a3d95c07e2b1
+Create Date: 2026-10-19 21:17:45.902113
+
+"""
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b8f14e6a2c93'
+down_revision = 'a3d95c07e2b1'
+branch_labels = None
+depends_on = None
+
+INDEXES = (
+    ('ix_activity_logs_timestamp', ['timestamp']),
+    ('ix_activity_logs_user_id_timestamp', ['user_id', 'timestamp']),
+    ('ix_activity_logs_action_type_timestamp', ['action_type', 'timestamp']),
+)
+
+
+def _months(first, last):
+    year, month = first
+    while (year, month) <= last:
+        yield year, month
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+
+
+def _bounds(year, month):
+    return datetime(year, month, 1), datetime(year + month // 12, month % 12 + 1, 1)
+
+
+def _columns():
+    return [
+        sa.Column('id', sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=True),
+        sa.Column('action_type', sa.String(length=50), nullable=False),
+        sa.Column('description', sa.Text(), nullable=True),
+        sa.Column('ip_address', sa.String(length=45), nullable=True),
+        sa.Column('user_agent', sa.Text(), nullable=True),
+        sa.Column('activity_data', sa.Text(), nullable=True),
+        sa.Column('timestamp', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='SET NULL'),
+    ]
+
+
+COPIED = "id, user_id, action_type, description, ip_address, user_agent, activity_data, timestamp"
+
+
+def upgrade():
+    bind = op.get_bind()
+    dialect = bind.dialect.name
+
+    op.create_table('activity_rollups',
+    sa.Column('hour', sa.DateTime(), nullable=False),
+    sa.Column('action_type', sa.String(length=50), nullable=False),
+    sa.Column('count', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('hour', 'action_type')
+    )
+    hour = "date_trunc('hour', timestamp)" if dialect == 'postgresql' else "strftime('%Y-%m-%d %H:00:00.000000', timestamp)"
+    op.execute(
+        f"INSERT INTO activity_rollups (hour, action_type, count) "
+        f"SELECT {hour}, action_type, count(*) FROM activity_logs WHERE timestamp IS NOT NULL "
+        f"GROUP BY {hour}, action_type"
+    )
+
+    now = datetime.utcnow()
+    first = bind.execute(sa.text("SELECT min(timestamp) FROM activity_logs")).scalar()
+    if isinstance(first, str):
+        first = datetime.fromisoformat(first)
+    months = list(_months((first.year, first.month) if first else (now.year, now.month), (now.year, now.month)))
+
+    if dialect == 'postgresql':
+        for name, _ in INDEXES:
+            op.execute(f"DROP INDEX IF EXISTS {name}")
+        op.execute("ALTER TABLE activity_logs RENAME TO activity_logs_unpartitioned")
+        op.execute("ALTER TABLE activity_logs_unpartitioned RENAME CONSTRAINT activity_logs_pkey TO activity_logs_unpartitioned_pkey")
+        op.execute("ALTER SEQUENCE activity_logs_id_seq RENAME TO activity_logs_unpartitioned_id_seq")
+
+        op.create_table('activity_logs', *_columns(), sa.PrimaryKeyConstraint('id', 'timestamp'),
+                        postgresql_partition_by='RANGE (timestamp)')
+        for name, columns in INDEXES:
+            op.create_index(name, 'activity_logs', columns, unique=False)
+        for year, month in months:
+            start, end = _bounds(year, month)
+            op.execute(
+                f"CREATE TABLE activity_logs_y{year:04d}m{month:02d} PARTITION OF activity_logs "
+                f"FOR VALUES FROM ('{start.isoformat(' ')}') TO ('{end.isoformat(' ')}')"
+            )
+        op.execute(f"INSERT INTO activity_logs ({COPIED}) SELECT {COPIED} FROM activity_logs_unpartitioned WHERE timestamp IS NOT NULL")
+        op.execute("SELECT setval('activity_logs_id_seq', coalesce((SELECT max(id) FROM activity_logs), 0) + 1, false)")
+        op.drop_table('activity_logs_unpartitioned')
+
+    elif dialect == 'sqlite':
+        # Month shards; the parent table is left in place, empty
+        for year, month in months:
+            name = f"activity_logs_y{year:04d}m{month:02d}"
+            start, end = _bounds(year, month)
+            count = bind.execute(
+                sa.text("SELECT count(*) FROM activity_logs WHERE timestamp >= :start AND timestamp < :end"),
+                {"start": start, "end": end}
+            ).scalar()
+            if not count and (year, month) != (now.year, now.month):
+                continue
+            op.create_table(name, *_columns(), sa.PrimaryKeyConstraint('id'), sqlite_autoincrement=True)
+            for index, columns in INDEXES:
+                op.create_index(index.replace('activity_logs', name), name, columns, unique=False)
+            op.execute(sa.text("INSERT INTO sqlite_sequence (name, seq) VALUES (:name, :seq)").bindparams(
+                name=name, seq=(year * 100 + month) * 10 ** 9
+            ))
+            op.execute(sa.text(
+                f"INSERT INTO {name} ({COPIED}) SELECT {COPIED} FROM activity_logs "
+                f"WHERE timestamp >= :start AND timestamp < :end"
+            ).bindparams(start=start, end=end))
+        op.execute("DELETE FROM activity_logs")
+
+
+def downgrade():
+    bind = op.get_bind()
+    dialect = bind.dialect.name
+
+    if dialect == 'postgresql':
+        for name, _ in INDEXES:
+            op.execute(f"DROP INDEX IF EXISTS {name}")
+        op.execute("ALTER TABLE activity_logs RENAME TO activity_logs_partitioned")
+        op.execute("ALTER TABLE activity_logs_partitioned RENAME CONSTRAINT activity_logs_pkey TO activity_logs_partitioned_pkey")
+        op.execute("ALTER SEQUENCE activity_logs_id_seq RENAME TO activity_logs_partitioned_id_seq")
+        op.create_table('activity_logs', *_columns(), sa.PrimaryKeyConstraint('id'))
+        for name, columns in INDEXES:
+            op.create_index(name, 'activity_logs', columns, unique=False)
+        op.execute(f"INSERT INTO activity_logs ({COPIED}) SELECT {COPIED} FROM activity_logs_partitioned")
+        op.execute("SELECT setval('activity_logs_id_seq', coalesce((SELECT max(id) FROM activity_logs), 0) + 1, false)")
+        op.execute("DROP TABLE activity_logs_partitioned CASCADE")
+
+    elif dialect == 'sqlite':
+        shards = bind.execute(sa.text(
+            "SELECT name FROM sqlite_master WHERE type = 'table' AND name LIKE 'activity_logs_y%' ORDER BY name"
+        )).scalars().all()
+        for name in shards:
+            op.execute(f"INSERT INTO activity_logs ({COPIED}) SELECT {COPIED} FROM {name}")
+            op.drop_table(name)
+
+    op.drop_table('activity_rollups')
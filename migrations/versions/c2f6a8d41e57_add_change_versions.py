@@ -0,0 +1,29 @@
+"""Add change versions
+
+Revision ID: c2f6a8d41e57
+Revises: b8f14e6a2c93
+Create Date: 2026-10-19 21:14:37.520918
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c2f6a8d41e57'
+down_revision = 'b8f14e6a2c93'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('change_versions',
+    sa.Column('scope', sa.String(length=100), nullable=False),
+    sa.Column('version', sa.BigInteger(), nullable=False),
+    sa.Column('changed_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('scope')
+    )
+
+
+def downgrade():
+    op.drop_table('change_versions')
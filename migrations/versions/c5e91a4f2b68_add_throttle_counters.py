@@ -0,0 +1,34 @@
+"""Add throttle counters
+
+Revision ID: c5e91a4f2b68
+Revises: a6c40e92d7f1
+Create Date: 2026-10-19 17:20:08.663051
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c5e91a4f2b68'
+down_revision = 'a6c40e92d7f1'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('throttle_counters',
+    sa.Column('key', sa.String(length=255), nullable=False),
+    sa.Column('window_start', sa.BigInteger(), nullable=False),
+    sa.Column('hits', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('key', 'window_start')
+    )
+    with op.batch_alter_table('throttle_counters', schema=None) as batch_op:
+        batch_op.create_index('ix_throttle_counters_window_start', ['window_start'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('throttle_counters', schema=None) as batch_op:
+        batch_op.drop_index('ix_throttle_counters_window_start')
+
+    op.drop_table('throttle_counters')
@@ -0,0 +1,28 @@
+"""Add payment verification columns
+
+Revision ID: d4a7f1b83e65
+Revises: b37e9a0c5d12
+Create Date: 2026-10-19 11:26:02.917384
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd4a7f1b83e65'
+down_revision = 'b37e9a0c5d12'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('payments', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('verification_status', sa.String(length=20), nullable=True))
+        batch_op.add_column(sa.Column('verified_at', sa.DateTime(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('payments', schema=None) as batch_op:
+        batch_op.drop_column('verified_at')
+        batch_op.drop_column('verification_status')
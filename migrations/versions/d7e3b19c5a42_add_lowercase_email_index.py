@@ -0,0 +1,24 @@
+"""Add lowercase email index for the user directory
+
+Revision ID: d7e3b19c5a42
+Revises: c2f6a8d41e57
+Create Date: 2026-10-19 21:40:12.503817
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd7e3b19c5a42'
+down_revision = 'c2f6a8d41e57'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_users_email_lower', 'users', [sa.text('lower(email)')], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_users_email_lower', table_name='users')
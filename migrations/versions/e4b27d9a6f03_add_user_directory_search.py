@@ -0,0 +1,62 @@
+"""Add user directory search indexes
+
+Revision ID: e4b27d9a6f03
+Revises: c5e91a4f2b68
+Create Date: 2026-10-19 18:02:37.915524
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e4b27d9a6f03'
+down_revision = 'c5e91a4f2b68'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.create_index('ix_users_role_id', ['role', 'id'], unique=False)
+        batch_op.create_index('ix_users_status_id', ['status', 'id'], unique=False)
+
+    bind = op.get_bind()
+    if bind.dialect.name == 'postgresql':
+        op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        op.execute("CREATE INDEX IF NOT EXISTS ix_users_full_name_trgm ON users USING gin (full_name gin_trgm_ops)")
+    elif bind.dialect.name == 'sqlite':
+        op.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS users_fts USING fts5("
+            "full_name, content='users', content_rowid='id', tokenize='trigram')"
+        )
+        op.execute(
+            "CREATE TRIGGER IF NOT EXISTS users_fts_ai AFTER INSERT ON users BEGIN "
+            "INSERT INTO users_fts(rowid, full_name) VALUES (new.id, new.full_name); END"
+        )
+        op.execute(
+            "CREATE TRIGGER IF NOT EXISTS users_fts_ad AFTER DELETE ON users BEGIN "
+            "INSERT INTO users_fts(users_fts, rowid, full_name) VALUES ('delete', old.id, old.full_name); END"
+        )
+        op.execute(
+            "CREATE TRIGGER IF NOT EXISTS users_fts_au AFTER UPDATE OF full_name ON users BEGIN "
+            "INSERT INTO users_fts(users_fts, rowid, full_name) VALUES ('delete', old.id, old.full_name); "
+            "INSERT INTO users_fts(rowid, full_name) VALUES (new.id, new.full_name); END"
+        )
+        # Index the existing users
+        op.execute("INSERT INTO users_fts(users_fts) VALUES ('rebuild')")
+
+
+def downgrade():
+    bind = op.get_bind()
+    if bind.dialect.name == 'postgresql':
+        op.execute("DROP INDEX IF EXISTS ix_users_full_name_trgm")
+    elif bind.dialect.name == 'sqlite':
+        op.execute("DROP TRIGGER IF EXISTS users_fts_au")
+        op.execute("DROP TRIGGER IF EXISTS users_fts_ad")
+        op.execute("DROP TRIGGER IF EXISTS users_fts_ai")
+        op.execute("DROP TABLE IF EXISTS users_fts")
+
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.drop_index('ix_users_status_id')
+        batch_op.drop_index('ix_users_role_id')
@@ -0,0 +1,33 @@
+"""Add notification inboxes
+
+Revision ID: f29c83d15b7e
+Revises: e81b6c2f4a39
+Create Date: 2026-10-19 13:58:30.441902
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f29c83d15b7e'
+down_revision = 'e81b6c2f4a39'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Counters start empty and are reconciled lazily on first read
+    # (or all at once with `flask notifications reconcile-counters`).
+    op.create_table('notification_inboxes',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('unread_count', sa.Integer(), nullable=False),
+    sa.Column('reconciled_at', sa.DateTime(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('user_id')
+    )
+
+
+def downgrade():
+    op.drop_table('notification_inboxes')
@@ -4,18 +4,25 @@ from flask_sqlalchemy import SQLAlchemy
 db = SQLAlchemy()
 
 from .user import User
+from . import user_search
 from .table import Table
 from .reservation import Reservation
 from .menu import MenuCategory, MenuItem, Order, OrderItem
-from .payment import Payment
-from .activity_log import ActivityLog
-from .notification import Notification
+from .payment import Payment, PaymentOutbox
+from .revenue import RevenueRollup
+from .activity_log import ActivityLog, ActivityRollup
+from .notification import Notification, EmailOutbox, NotificationInbox
+from .throttle import ThrottleCounter
+from .auth_token import RevokedToken
+from .change_version import ChangeVersion
 
 from . import event_listeners  
+from utils.identity_cache import identity_cache
 
 login_manager = LoginManager()
 login_manager.login_view = 'auth_bp.login'
 
 @login_manager.user_loader
 def load_user(user_id):
-    return User.query.get(int(user_id))
\ No newline at end of file
+    # A cached snapshot; the full User row is only loaded if the route needs it
+    return identity_cache.load(int(user_id))
\ No newline at end of file
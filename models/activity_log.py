@@ -1,28 +1,62 @@
+import json
 from datetime import datetime
-from flask_sqlalchemy import SQLAlchemy
 from . import db
 
-db = SQLAlchemy()
 
 class ActivityLog(db.Model):
+    """One audit entry. Stored in monthly partitions (utils/activity_partitions.py).
+
+    On Postgres the table is range-partitioned by ``timestamp``, which must
+    therefore be part of the primary key. SQLite has no partitioning, so there
+    the entries live in ``activity_logs_yYYYYmMM`` shard tables with this
+    table's columns, and this table itself stays empty.
+    """
     __tablename__ = 'activity_logs'
     
-    id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    id = db.Column(db.Integer, db.Sequence('activity_logs_id_seq'), primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='SET NULL'), nullable=True)
     action_type = db.Column(db.String(50), nullable=False)
     description = db.Column(db.Text, nullable=True)
     ip_address = db.Column(db.String(45), nullable=True)
     user_agent = db.Column(db.Text, nullable=True)
     activity_data = db.Column(db.Text)
-    timestamp = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    timestamp = db.Column(db.DateTime, default=datetime.utcnow, primary_key=True, index=True)
+
+    # Audit queries filter by user or by action, newest first (routes/activity_routes.py)
+    __table_args__ = (
+        db.Index('ix_activity_logs_user_id_timestamp', 'user_id', 'timestamp'),
+        db.Index('ix_activity_logs_action_type_timestamp', 'action_type', 'timestamp'),
+        {'postgresql_partition_by': 'RANGE (timestamp)'},
+    )
+
+    user = db.relationship('User', lazy='select')
 
     def to_dict(self):
         return {
             "id": self.id,
+            "user_id": self.user_id,
             "user": self.user.full_name if self.user else None,
             "role": self.user.role.value if self.user else None,
             "action_type": self.action_type,
             "description": self.description,
             "timestamp": self.timestamp.isoformat(),
-            "ip_address": self.ip_address
+            "ip_address": self.ip_address,
+            "user_agent": self.user_agent,
+            "data": json.loads(self.activity_data) if self.activity_data else None,
+        }
+
+
+class ActivityRollup(db.Model):
+    """Entries per hour and action type, kept up to date by the activity log writer."""
+    __tablename__ = 'activity_rollups'
+
+    hour = db.Column(db.DateTime, primary_key=True)
+    action_type = db.Column(db.String(50), primary_key=True)
+    count = db.Column(db.Integer, nullable=False, default=0)
+
+    def to_dict(self):
+        return {
+            "hour": self.hour.isoformat(),
+            "action_type": self.action_type,
+            "count": self.count,
         }
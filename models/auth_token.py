@@ -0,0 +1,18 @@
+from datetime import datetime
+from . import db
+
+
+class RevokedToken(db.Model):
+    """Revocation list for signed API tokens (utils/auth_tokens.py).
+
+    A row either revokes one token by its ``jti``, or, with ``jti`` of the form
+    ``user:<id>``, every token of that user issued at or before ``revoked_at``.
+    Rows are only needed until the tokens they cover would have expired anyway,
+    which keeps the list small enough to hold in memory.
+    """
+    __tablename__ = 'revoked_tokens'
+
+    jti = db.Column(db.String(64), primary_key=True)
+    user_id = db.Column(db.Integer, nullable=True)
+    revoked_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
@@ -0,0 +1,17 @@
+from datetime import datetime
+from . import db
+
+
+class ChangeVersion(db.Model):
+    """A counter per cached scope, bumped whenever data in that scope changes.
+
+    Scopes are names like ``tables`` or ``orders:user:42`` (utils/conditional.py).
+    The flush listeners bump them in the same transaction as the change itself,
+    so a GET can validate ``If-None-Match`` by reading a few rows by primary key
+    instead of building the response.
+    """
+    __tablename__ = 'change_versions'
+
+    scope = db.Column(db.String(100), primary_key=True)
+    version = db.Column(db.BigInteger, default=0, nullable=False)
+    changed_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
@@ -1,8 +1,21 @@
-from sqlalchemy import event
+from collections import defaultdict
+from sqlalchemy import event, inspect, select
 from datetime import timedelta
 from . import db
-from .menu import Order, OrderItem  # Combined models file
+from .menu import MenuItem, Order, OrderItem  # Combined models file
 from .reservation import Reservation
+from .payment import Payment
+from .revenue import RevenueRollup
+from .notification import Notification
+from .table import Table
+from .user import User
+from utils.upsert import upsert_increment
+from utils.unread_counters import adjust_unread, mark_dirty, read_watermarks, unread_cache
+from utils.notification_stream import notification_hub
+from utils.identity_cache import identity_cache
+from utils.auth_tokens import token_revocations
+from utils.activity_log import record_activity
+from utils.conditional import MENU_ITEMS, TABLES, USERS, orders_of, reservations_on, touch
 
 # OrderItem after_insert event
 @event.listens_for(OrderItem, 'after_insert')
@@ -41,4 +54,259 @@ def validate_reservation_time(mapper, connection, target):
     for reservation in reservations:
         existing_end = reservation.reservation_time + timedelta(minutes=reservation.duration)
         if existing_end > new_start:
-            raise ValueError("Table already booked for this time slot.")
\ No newline at end of file
+            raise ValueError("Table already booked for this time slot.")
+
+# Payment revenue rollups
+_ROLLUP_AMOUNTS = ('amount', 'tip_amount', 'tax_amount', 'discount')
+
+# Load the previous value on assignment so rollups can subtract what a payment used to contribute
+for _name in ('status', 'paid_at', 'method', 'cashier_id') + _ROLLUP_AMOUNTS:
+    event.listen(getattr(Payment, _name), 'set', lambda target, value, oldvalue, initiator: None, active_history=True)
+
+
+def _payment_contribution(payment, previous=False):
+    """The rollup key and amounts a payment contributes, before or after this flush."""
+    state = inspect(payment)
+
+    def value(name):
+        if previous:
+            history = state.attrs[name].history
+            if history.deleted:
+                return history.deleted[0]
+            if history.added and state.persistent:
+                return None
+        return getattr(payment, name)
+
+    if value('status') != 'completed' or value('paid_at') is None:
+        return None
+    key = {
+        "day": value('paid_at').date(),
+        "method": value('method') or 'unknown',
+        "cashier_id": value('cashier_id')
+    }
+    amounts = {name: value(name) or 0.0 for name in _ROLLUP_AMOUNTS}
+    return key, amounts
+
+
+def _apply_rollup(connection, contribution, sign):
+    key, amounts = contribution
+    increments = {name: sign * amount for name, amount in amounts.items()}
+    increments["payment_count"] = sign
+    upsert_increment(connection, RevenueRollup.__table__, key, increments)
+
+
+@event.listens_for(db.session, 'after_flush')
+def update_revenue_rollups(session, flush_context):
+    """Keep revenue_rollups in step with completed payments, in the same transaction."""
+    changes = []
+    for obj in session.new:
+        if isinstance(obj, Payment):
+            changes.append((None, _payment_contribution(obj)))
+    for obj in session.dirty:
+        if isinstance(obj, Payment) and session.is_modified(obj, include_collections=False):
+            changes.append((_payment_contribution(obj, previous=True), _payment_contribution(obj)))
+    for obj in session.deleted:
+        if isinstance(obj, Payment):
+            changes.append((_payment_contribution(obj, previous=True), None))
+
+    changes = [(old, new) for old, new in changes if old != new]
+    if not changes:
+        return
+
+    connection = session.connection()
+    for old, new in changes:
+        if old:
+            _apply_rollup(connection, old, -1)
+        if new:
+            _apply_rollup(connection, new, 1)
+
+
+# Notification unread counters
+event.listen(Notification.is_read, 'set', lambda target, value, oldvalue, initiator: None, active_history=True)
+
+
+def _was_unread(notification):
+    history = inspect(notification).attrs.is_read.history
+    previous = history.deleted[0] if history.deleted else notification.is_read
+    return not previous
+
+
+@event.listens_for(db.session, 'after_flush')
+def update_unread_counters(session, flush_context):
+    """Keep notification_inboxes.unread_count in step with ORM changes to notifications."""
+    deltas = defaultdict(int)
+    # New notifications are created after any watermark, so only their flag matters
+    for obj in session.new:
+        if isinstance(obj, Notification) and not obj.is_read:
+            deltas[obj.recipient_id] += 1
+
+    changes = []
+    for obj in session.dirty:
+        if isinstance(obj, Notification):
+            was_unread, is_unread = _was_unread(obj), not obj.is_read
+            if was_unread != is_unread:
+                changes.append((obj, 1 if is_unread else -1))
+    for obj in session.deleted:
+        if isinstance(obj, Notification) and _was_unread(obj):
+            changes.append((obj, -1))
+    if changes:
+        # Rows at or below the recipient's watermark were already read; their flag does not count
+        watermarks = read_watermarks(session.connection(), {obj.recipient_id for obj, _ in changes})
+        for obj, delta in changes:
+            watermark = watermarks.get(obj.recipient_id)
+            if watermark is None or obj.created_at > watermark:
+                deltas[obj.recipient_id] += delta
+
+    deltas = {user_id: delta for user_id, delta in deltas.items() if delta}
+    if deltas:
+        adjust_unread(session.connection(), deltas)
+        mark_dirty(session, deltas)
+
+
+@event.listens_for(db.session, 'after_commit')
+def expire_unread_cache(session):
+    """Drop stale badges and wake the open notification streams of affected users."""
+    everyone = session.info.pop('unread_dirty_all', False)
+    user_ids = session.info.pop('unread_dirty', set())
+    if everyone:
+        unread_cache.invalidate()
+    else:
+        unread_cache.invalidate(user_ids)
+    if everyone or user_ids:
+        notification_hub.publish(None if everyone else user_ids)
+
+
+@event.listens_for(db.session, 'after_rollback')
+def discard_unread_changes(session):
+    session.info.pop('unread_dirty_all', None)
+    session.info.pop('unread_dirty', None)
+
+
+# Cached identities (utils/identity_cache.py)
+_IDENTITY_FIELDS = ('role', 'status', 'full_name')
+
+
+@event.listens_for(db.session, 'after_flush')
+def track_identity_changes(session, flush_context):
+    """Remember users whose cached snapshot goes stale when this transaction commits."""
+    changed = {
+        obj.id for obj in session.dirty
+        if isinstance(obj, User) and any(inspect(obj).attrs[name].history.has_changes() for name in _IDENTITY_FIELDS)
+    }
+    changed.update(obj.id for obj in session.deleted if isinstance(obj, User))
+    if changed:
+        session.info.setdefault('identity_dirty', set()).update(changed)
+        if token_revocations.enabled:
+            # Signed tokens carry the old claims: cut them off in the same transaction
+            token_revocations.revoke_user(session.connection(), changed)
+
+
+@event.listens_for(db.session, 'after_commit')
+def expire_cached_identities(session):
+    changed = session.info.pop('identity_dirty', set())
+    identity_cache.invalidate(changed)
+    if changed and token_revocations.enabled:
+        token_revocations.expire()
+
+
+@event.listens_for(db.session, 'after_rollback')
+def discard_identity_changes(session):
+    session.info.pop('identity_dirty', None)
+
+
+# Audit trail (utils/activity_log.py): (action prefix, owning user column) per audited model
+_AUDITED = {
+    Order: ('order', 'user_id'),
+    Payment: ('payment', 'cashier_id'),
+    Reservation: ('reservation', 'user_id'),
+}
+
+
+def _audit_entry(obj, action):
+    name, owner = _AUDITED[type(obj)]
+    data = {"id": obj.id, "owner_id": getattr(obj, owner), "status": obj.status}
+    if action == 'status_changed':
+        data["previous_status"] = inspect(obj).attrs.status.history.deleted[0]
+    return (f"{name}_{action}", f"{name.capitalize()} {obj.id} {action.replace('_', ' ')}", data)
+
+
+@event.listens_for(db.session, 'after_flush')
+def track_audited_changes(session, flush_context):
+    """Collect audit entries now; they are recorded only once the transaction commits."""
+    entries = [_audit_entry(obj, 'created') for obj in session.new if type(obj) in _AUDITED]
+    entries.extend(_audit_entry(obj, 'deleted') for obj in session.deleted if type(obj) in _AUDITED)
+    entries.extend(
+        _audit_entry(obj, 'status_changed') for obj in session.dirty
+        if type(obj) in _AUDITED and inspect(obj).attrs.status.history.deleted
+    )
+    if entries:
+        session.info.setdefault('audit_entries', []).extend(entries)
+
+
+@event.listens_for(db.session, 'after_commit')
+def record_audited_changes(session):
+    for action_type, description, data in session.info.pop('audit_entries', []):
+        record_activity(action_type, description=description, data=data)
+
+
+@event.listens_for(db.session, 'after_rollback')
+def discard_audited_changes(session):
+    session.info.pop('audit_entries', None)
+
+
+# Conditional GET versions (utils/conditional.py)
+# Fields the list serializers expose; other user changes (password, tokens) leave responses as they are
+_SERIALIZED_USER_FIELDS = (
+    'full_name', 'email', 'role', 'avatar_url', 'status', 'suspension_ends_at', 'last_login', 'gender',
+    'is_google_account'
+)
+
+# Load the previous value on assignment so a move invalidates the scope it left as well
+for _attribute in (Reservation.reservation_time, Order.user_id, OrderItem.order_id, Payment.order_id):
+    event.listen(_attribute, 'set', lambda target, value, oldvalue, initiator: None, active_history=True)
+
+
+def _old_and_new(obj, name):
+    history = inspect(obj).attrs[name].history
+    return {value for value in (*history.deleted, getattr(obj, name)) if value is not None}
+
+
+def _collect_scopes(obj, scopes, order_ids):
+    if isinstance(obj, Table):
+        scopes.add(TABLES)
+    elif isinstance(obj, MenuItem):
+        scopes.add(MENU_ITEMS)
+    elif isinstance(obj, User):
+        scopes.add(USERS)
+    elif isinstance(obj, Reservation):
+        scopes.update(reservations_on(value.date()) for value in _old_and_new(obj, 'reservation_time'))
+    elif isinstance(obj, Order):
+        scopes.update(orders_of(user_id) for user_id in _old_and_new(obj, 'user_id'))
+    elif isinstance(obj, (OrderItem, Payment)):
+        # Serialized inside their order; bumped through its owner
+        order_ids.update(_old_and_new(obj, 'order_id'))
+
+
+@event.listens_for(db.session, 'after_flush')
+def bump_change_versions(session, flush_context):
+    """Bump the version of every conditional GET scope this flush changes, in the same transaction."""
+    scopes, order_ids = set(), set()
+    for obj in session.new:
+        # A new user is not part of any response yet
+        if not isinstance(obj, User):
+            _collect_scopes(obj, scopes, order_ids)
+    for obj in session.deleted:
+        _collect_scopes(obj, scopes, order_ids)
+    for obj in session.dirty:
+        if isinstance(obj, User):
+            changed = any(inspect(obj).attrs[name].history.has_changes() for name in _SERIALIZED_USER_FIELDS)
+        else:
+            changed = session.is_modified(obj, include_collections=False)
+        if changed:
+            _collect_scopes(obj, scopes, order_ids)
+
+    if order_ids:
+        owners = session.connection().execute(select(Order.user_id).where(Order.id.in_(order_ids))).scalars()
+        scopes.update(orders_of(user_id) for user_id in owners if user_id is not None)
+    if scopes:
+        touch(session.connection(), scopes)
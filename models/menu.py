@@ -1,5 +1,8 @@
 from datetime import datetime, timedelta
 from . import db  # Import the shared db instance
+from utils.assets import asset_url
+from utils.serialization import compile_serializer, many, nested, optional
+from .payment import payment_serializer
 
 class MenuCategory(db.Model):
     __tablename__ = 'menu_categories'
@@ -49,7 +52,7 @@ class MenuItem(db.Model):
             "name": self.name,
             "description": self.description,
             "price": self.price,
-            "image_url": self.image_url,
+            "image_url": asset_url(self.image_url),
             "category_id": self.category_id,
             "is_available": self.is_available,
             "preparation_time": self.preparation_time,
@@ -122,4 +125,40 @@ class Order(db.Model):
             self.estimated_completion = self.created_at
 
     def __repr__(self):
-        return f'<Order {self.id}>'
\ No newline at end of file
+        return f'<Order {self.id}>'
+
+
+# Same fields as the to_dict methods above, for list responses (utils/serialization.py)
+menu_item_serializer = compile_serializer({
+    "id": "id",
+    "name": "name",
+    "description": "description",
+    "price": "price",
+    "image_url": lambda item: asset_url(item.image_url),
+    "category_id": "category_id",
+    "is_available": "is_available",
+    "preparation_time": "preparation_time",
+    "calories": "calories",
+})
+
+order_item_serializer = compile_serializer({
+    "id": "id",
+    "menu_item": nested("menu_item", menu_item_serializer),
+    "quantity": "quantity",
+    "status": "status",
+    "notes": "notes",
+    "chef": optional("chef.full_name"),
+})
+
+order_serializer = compile_serializer({
+    "id": "id",
+    "user_id": "user_id",
+    "waiter_id": "waiter_id",
+    "table_id": "table_id",
+    "status": "status",
+    "notes": "notes",
+    "created_at": "created_at",
+    "estimated_completion": "estimated_completion",
+    "items": many("items", order_item_serializer),
+    "payment": nested("payment", payment_serializer),
+})
@@ -1,4 +1,5 @@
 from datetime import datetime, timedelta
+from markupsafe import escape
 from . import db
 
 class Notification(db.Model):
@@ -20,68 +21,112 @@ class Notification(db.Model):
     sender = db.relationship('User', foreign_keys=[sender_id])
     recipient = db.relationship('User', foreign_keys=[recipient_id])
 
-    def to_dict(self):
+    __table_args__ = (
+        db.Index('ix_notifications_recipient_id_expires_at', 'recipient_id', 'expires_at'),
+        db.Index('ix_notifications_expires_at', 'expires_at'),
+        # Inbox pages: one user's (unread) notifications, newest first
+        db.Index('ix_notifications_recipient_id_is_read_created_at', 'recipient_id', 'is_read', db.text('created_at DESC')),
+    )
+
+    def to_dict(self, last_read_at=None):
+        """``last_read_at`` is the recipient's read watermark; anything created up to it reads as read."""
         return {
             "id": self.id,
             "sender": self.sender.full_name if self.sender else "System",
             "title": self.title,
             "message": self.message,
             "type": self.type,
-            "is_read": self.is_read,
+            "is_read": bool(self.is_read or (last_read_at is not None and self.created_at <= last_read_at)),
             "created_at": self.created_at.isoformat(),
             "priority": self.priority,
             "action_url": self.action_url
         }
 
-    # Add this helper method to the model
-    def send_email(self, recipient_email):
-        """Send email notification using SMTP"""
-        from flask import current_app
-        import smtplib
-        from email.mime.text import MIMEText
-        from email.mime.multipart import MIMEMultipart
-        
-        try:
-            # Get email config from app settings
-            smtp_server = current_app.config.get('SMTP_SERVER')
-            smtp_port = current_app.config.get('SMTP_PORT', 587)
-            smtp_user = current_app.config.get('SMTP_USER')
-            smtp_password = current_app.config.get('SMTP_PASSWORD')
-            from_email = current_app.config.get('MAIL_DEFAULT_SENDER', 'notifications@yourapp.com')
-            
-            if not all([smtp_server, smtp_user, smtp_password]):
-                current_app.logger.error("Email configuration incomplete")
-                return False
-            
-            # Create email message
-            msg = MIMEMultipart()
-            msg['From'] = from_email
-            msg['To'] = recipient_email
-            msg['Subject'] = f"Notification: {self.title}"
-            
-            # Create HTML content
-            html = f"""
+    def render_email(self):
+        """Subject and HTML body for this notification's email"""
+        action = f'<p><a href="{escape(self.action_url)}">View in app</a></p>' if self.action_url else ''
+        html = f"""
             <html>
                 <body>
-                    <h2>{self.title}</h2>
-                    <p>{self.message}</p>
-                    {f'<p><a href="{self.action_url}">View in app</a></p>' if self.action_url else ''}
+                    <h2>{escape(self.title)}</h2>
+                    <p>{escape(self.message)}</p>
+                    {action}
                     <p>Sent at: {self.created_at.strftime('%Y-%m-%d %H:%M')}</p>
                 </body>
             </html>
             """
-            
-            msg.attach(MIMEText(html, 'html'))
-            
-            # Send email
-            with smtplib.SMTP(smtp_server, smtp_port) as server:
-                server.starttls()
-                server.login(smtp_user, smtp_password)
-                server.send_message(msg)
-                
-            current_app.logger.info(f"Notification email sent to {recipient_email}")
-            return True
-        
-        except Exception as e:
-            current_app.logger.error(f"Failed to send notification email: {str(e)}")
-            return False
\ No newline at end of file
+        return f"Notification: {self.title}", html
+
+    def queue_email(self, recipient_email):
+        """Stage an email for the background sender in the current session.
+
+        Nothing is sent here; the caller commits and the EmailSender delivers it.
+        """
+        from flask import current_app
+
+        if not current_app.config.get('SMTP_SERVER'):
+            current_app.logger.error("Email configuration incomplete")
+            return None
+
+        if self.created_at is None:
+            self.created_at = datetime.utcnow()
+        subject, html = self.render_email()
+        email = EmailOutbox(
+            notification=self,
+            recipient_email=recipient_email,
+            subject=subject,
+            html_body=html
+        )
+        db.session.add(email)
+        return email
+
+
+class EmailOutbox(db.Model):
+    """Outgoing email waiting for the background sender (utils/mailer.py)."""
+    __tablename__ = 'email_outbox'
+
+    id = db.Column(db.Integer, primary_key=True)
+    notification_id = db.Column(db.Integer, db.ForeignKey('notifications.id', ondelete='SET NULL'), nullable=True)
+    recipient_email = db.Column(db.String(150), nullable=False)
+    subject = db.Column(db.String(255), nullable=False)
+    html_body = db.Column(db.Text, nullable=False)
+    status = db.Column(db.String(20), default='pending', nullable=False)  # pending, sending, sent, failed
+    attempts = db.Column(db.Integer, default=0, nullable=False)
+    last_error = db.Column(db.Text, nullable=True)
+    lease_token = db.Column(db.String(36), nullable=True, index=True)
+    next_attempt_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    claimed_at = db.Column(db.DateTime, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    sent_at = db.Column(db.DateTime, nullable=True)
+
+    notification = db.relationship('Notification', backref=db.backref('emails', lazy='dynamic', passive_deletes=True))
+
+    __table_args__ = (
+        db.Index('ix_email_outbox_status_next_attempt_at', 'status', 'next_attempt_at'),
+    )
+
+
+class NotificationInbox(db.Model):
+    """Per-user notification state, so the unread badge is a key lookup.
+
+    ``unread_count`` is adjusted in the same transaction as every change to a
+    user's notifications and periodically recomputed (``reconciled_at``) to
+    repair drift from races or out-of-band edits.
+
+    ``last_read_at`` is the "mark all read" watermark: a notification is read
+    when its own ``is_read`` flag is set (read individually) or when it was
+    created at or before the watermark.
+
+    ``digest_due_at`` is set when a low-priority notification is waiting for
+    the user's next digest email; ``digested_through`` is where the last digest
+    stopped (utils/notification_digest.py).
+    """
+    __tablename__ = 'notification_inboxes'
+
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete='CASCADE'), primary_key=True)
+    unread_count = db.Column(db.Integer, default=0, nullable=False)
+    reconciled_at = db.Column(db.DateTime, nullable=True)
+    last_read_at = db.Column(db.DateTime, nullable=True)
+    digest_due_at = db.Column(db.DateTime, nullable=True, index=True)
+    digested_through = db.Column(db.DateTime, nullable=True)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -1,6 +1,7 @@
 from datetime import datetime
 from flask_sqlalchemy import SQLAlchemy
 from . import db
+from utils.serialization import compile_serializer
 
 class Payment(db.Model):
     __tablename__ = 'payments'
@@ -12,10 +13,12 @@ class Payment(db.Model):
     method = db.Column(db.String(50))
     status = db.Column(db.String(20), default='pending')
     transaction_id = db.Column(db.String(100), nullable=True, unique=True)
-    paid_at = db.Column(db.DateTime, default=datetime.utcnow)
+    paid_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
     tip_amount = db.Column(db.Float, default=0.0)
     tax_amount = db.Column(db.Float, default=0.0)
     discount = db.Column(db.Float, default=0.0)
+    verification_status = db.Column(db.String(20), nullable=True)  # verified, missing, duplicate, mismatch
+    verified_at = db.Column(db.DateTime, nullable=True)
 
     cashier = db.relationship('User', backref='payments', foreign_keys=[cashier_id])
 
@@ -31,8 +34,10 @@ class Payment(db.Model):
             "paid_at": self.paid_at.isoformat() if self.paid_at else None,
             "tip_amount": self.tip_amount,
             "tax_amount": self.tax_amount,
-            "discount": self.discount
+            "discount": self.discount,
+            "verification_status": self.verification_status
         }
+
     def verify_payment(self):
         """Verify payment status with payment processor"""
         if self.method == 'mpesa':
@@ -41,11 +46,49 @@ class Payment(db.Model):
             return verify_card_payment(self.transaction_id)
         return True  # For cash payments
 
-        # Payment verification stubs
+# Payment verification through the configured gateway
 def verify_mpesa_payment(transaction_id):
-            # In real implementation, check with M-Pesa API
-            return True
+    from utils.payment_gateway import get_gateway
+    return get_gateway().verify('mpesa', transaction_id)
 
 def verify_card_payment(transaction_id):
-            # In real implementation, check with payment gateway
-            return True
\ No newline at end of file
+    from utils.payment_gateway import get_gateway
+    return get_gateway().verify('card', transaction_id)
+
+
+# Same fields as Payment.to_dict, for list responses (utils/serialization.py)
+payment_serializer = compile_serializer({
+    "id": "id",
+    "order_id": "order_id",
+    "cashier_id": "cashier_id",
+    "amount": "amount",
+    "method": "method",
+    "status": "status",
+    "transaction_id": "transaction_id",
+    "paid_at": "paid_at",
+    "tip_amount": "tip_amount",
+    "tax_amount": "tax_amount",
+    "discount": "discount",
+    "verification_status": "verification_status",
+})
+
+
+class PaymentOutbox(db.Model):
+    """Pending gateway work for a payment, drained by the background payment worker."""
+    __tablename__ = 'payment_outbox'
+
+    id = db.Column(db.Integer, primary_key=True)
+    payment_id = db.Column(db.Integer, db.ForeignKey('payments.id', ondelete='CASCADE'), nullable=False, unique=True)
+    status = db.Column(db.String(20), default='pending', nullable=False)  # pending, processing, done, failed
+    attempts = db.Column(db.Integer, default=0, nullable=False)
+    confirm_order = db.Column(db.Boolean, default=False, nullable=False)  # checkout payments also settle the order status
+    last_error = db.Column(db.Text, nullable=True)
+    available_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    payment = db.relationship('Payment', backref=db.backref('outbox', uselist=False, passive_deletes=True))
+
+    __table_args__ = (
+        db.Index('ix_payment_outbox_status_available_at', 'status', 'available_at'),
+    )
@@ -1,6 +1,9 @@
 from datetime import datetime
 from sqlalchemy.orm import validates
 from . import db
+from .table import table_serializer
+from .user import user_serializer
+from utils.serialization import compile_serializer, nested
 
 class Reservation(db.Model):
     __tablename__ = 'reservations'
@@ -66,4 +69,17 @@ class Reservation(db.Model):
             existing_end = r.reservation_time + timedelta(minutes=r.duration)
             if existing_end > new_start:
                 return False
-        return True
\ No newline at end of file
+        return True
+
+
+# Same fields as Reservation.to_dict, for list responses (utils/serialization.py)
+reservation_serializer = compile_serializer({
+    "id": "id",
+    "user": nested("user", user_serializer),
+    "table": nested("table", table_serializer),
+    "reservation_time": "reservation_time",
+    "duration": "duration",
+    "guests": "guests",
+    "status": "status",
+    "special_requests": "special_requests",
+})
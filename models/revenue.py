@@ -0,0 +1,38 @@
+from datetime import datetime
+from . import db
+
+
+class RevenueRollup(db.Model):
+    """Completed payment totals per day, method and cashier.
+
+    Maintained incrementally by the Payment flush listener and rebuilt with
+    ``flask revenue rebuild`` for backfills. Days are UTC, keyed on ``paid_at``.
+    """
+    __tablename__ = 'revenue_rollups'
+
+    id = db.Column(db.Integer, primary_key=True)
+    day = db.Column(db.Date, nullable=False)
+    method = db.Column(db.String(50), nullable=False)
+    cashier_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    payment_count = db.Column(db.Integer, default=0, nullable=False)
+    amount = db.Column(db.Float, default=0.0, nullable=False)
+    tip_amount = db.Column(db.Float, default=0.0, nullable=False)
+    tax_amount = db.Column(db.Float, default=0.0, nullable=False)
+    discount = db.Column(db.Float, default=0.0, nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    __table_args__ = (
+        db.UniqueConstraint('day', 'method', 'cashier_id', name='uq_revenue_rollups_day_method_cashier'),
+    )
+
+    def to_dict(self):
+        return {
+            "day": self.day.isoformat(),
+            "method": self.method,
+            "cashier_id": self.cashier_id,
+            "payment_count": self.payment_count,
+            "amount": self.amount,
+            "tip_amount": self.tip_amount,
+            "tax_amount": self.tax_amount,
+            "discount": self.discount
+        }
@@ -1,4 +1,5 @@
 from . import db
+from utils.serialization import compile_serializer
 
 class Table(db.Model):
     __tablename__ = 'tables'
@@ -29,3 +30,15 @@ class Table(db.Model):
             "qr_code": self.qr_code,
             "description": self.description
         }
+
+
+# Same fields as Table.to_dict, for list responses (utils/serialization.py)
+table_serializer = compile_serializer({
+    "id": "id",
+    "number": "number",
+    "capacity": "capacity",
+    "location": "location",
+    "status": "status",
+    "qr_code": "qr_code",
+    "description": "description",
+})
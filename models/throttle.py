@@ -0,0 +1,18 @@
+from . import db
+
+
+class ThrottleCounter(db.Model):
+    """Hits per throttle key and fixed window, shared by every worker.
+
+    Used by the ``database`` backend of utils/throttle.py. Rows older than two
+    windows are no longer read and are deleted opportunistically.
+    """
+    __tablename__ = 'throttle_counters'
+
+    key = db.Column(db.String(255), primary_key=True)
+    window_start = db.Column(db.BigInteger, primary_key=True)  # unix seconds
+    hits = db.Column(db.Integer, default=0, nullable=False)
+
+    __table_args__ = (
+        db.Index('ix_throttle_counters_window_start', 'window_start'),
+    )
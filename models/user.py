@@ -1,9 +1,11 @@
 from enum import Enum
 from datetime import datetime
 from flask_login import UserMixin
-from werkzeug.security import generate_password_hash, check_password_hash
 
 from . import db   # use the shared `db` from models/__init__.py
+from utils.passwords import hash_password, verify_password, needs_rehash
+from utils.assets import asset_url
+from utils.serialization import compile_serializer
 
 
 class RoleEnum(str, Enum):
@@ -31,6 +33,13 @@ class User(db.Model, UserMixin):
     last_login        = db.Column(db.DateTime, nullable=True)
     gender            = db.Column(db.String(10), nullable=True)
 
+    # Admin directory filters, newest first (utils/user_search.py)
+    __table_args__ = (
+        db.Index('ix_users_role_id', 'role', 'id'),
+        db.Index('ix_users_status_id', 'status', 'id'),
+        db.Index('ix_users_email_lower', db.func.lower(email)),
+    )
+
     # One User → Many Reservations
     reservations = db.relationship(
         'Reservation',
@@ -50,12 +59,17 @@ class User(db.Model, UserMixin):
         lazy='dynamic')
 
     def set_password(self, password: str):
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = hash_password(password)
 
     def check_password(self, password: str) -> bool:
-        if not self.password_hash:
+        return verify_password(self.password_hash, password)
+
+    def upgrade_password_hash(self, password: str) -> bool:
+        """Rehash a just-verified password if the hashing policy changed. The caller commits."""
+        if not self.password_hash or not needs_rehash(self.password_hash):
             return False
-        return check_password_hash(self.password_hash, password)
+        self.set_password(password)
+        return True
 
     def to_dict(self) -> dict:
         return {
@@ -63,10 +77,25 @@ class User(db.Model, UserMixin):
             "full_name": self.full_name,
             "email": self.email,
             "role": self.role.value,
-            "avatar_url": self.avatar_url,
+            "avatar_url": asset_url(self.avatar_url),
             "status": self.status,
             "suspension_ends_at": self.suspension_ends_at.isoformat() if self.suspension_ends_at else None,
             "last_login": self.last_login.isoformat() if self.last_login else None,
             "gender": self.gender,
             "is_google_account": self.is_google_account,
         }
+
+
+# Same fields as User.to_dict, for list responses (utils/serialization.py)
+user_serializer = compile_serializer({
+    "id": "id",
+    "full_name": "full_name",
+    "email": "email",
+    "role": "role.value",
+    "avatar_url": lambda user: asset_url(user.avatar_url),
+    "status": "status",
+    "suspension_ends_at": "suspension_ends_at",
+    "last_login": "last_login",
+    "gender": "gender",
+    "is_google_account": "is_google_account",
+})
@@ -0,0 +1,42 @@
+"""Name-search indexes for the admin user directory (utils/user_search.py).
+
+Attached to the ``users`` table so ``db.create_all()`` and the migration build
+the same thing: a ``pg_trgm`` GIN index on Postgres, and an external-content
+FTS5 trigram table kept in sync by triggers on SQLite. SQLite batch migrations
+that rebuild ``users`` drop its triggers, so they must recreate them.
+"""
+
+from sqlalchemy import DDL, event
+
+from .user import User
+
+POSTGRES_DDL = (
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX IF NOT EXISTS ix_users_full_name_trgm ON users USING gin (full_name gin_trgm_ops)",
+)
+
+SQLITE_DDL = (
+    "CREATE VIRTUAL TABLE IF NOT EXISTS users_fts USING fts5("
+    "full_name, content='users', content_rowid='id', tokenize='trigram')",
+    "CREATE TRIGGER IF NOT EXISTS users_fts_ai AFTER INSERT ON users BEGIN "
+    "INSERT INTO users_fts(rowid, full_name) VALUES (new.id, new.full_name); END",
+    "CREATE TRIGGER IF NOT EXISTS users_fts_ad AFTER DELETE ON users BEGIN "
+    "INSERT INTO users_fts(users_fts, rowid, full_name) VALUES ('delete', old.id, old.full_name); END",
+    "CREATE TRIGGER IF NOT EXISTS users_fts_au AFTER UPDATE OF full_name ON users BEGIN "
+    "INSERT INTO users_fts(users_fts, rowid, full_name) VALUES ('delete', old.id, old.full_name); "
+    "INSERT INTO users_fts(rowid, full_name) VALUES (new.id, new.full_name); END",
+)
+
+SQLITE_DROP = (
+    "DROP TRIGGER IF EXISTS users_fts_au",
+    "DROP TRIGGER IF EXISTS users_fts_ad",
+    "DROP TRIGGER IF EXISTS users_fts_ai",
+    "DROP TABLE IF EXISTS users_fts",
+)
+
+for _statement in POSTGRES_DDL:
+    event.listen(User.__table__, 'after_create', DDL(_statement).execute_if(dialect='postgresql'))
+for _statement in SQLITE_DDL:
+    event.listen(User.__table__, 'after_create', DDL(_statement).execute_if(dialect='sqlite'))
+for _statement in SQLITE_DROP:
+    event.listen(User.__table__, 'before_drop', DDL(_statement).execute_if(dialect='sqlite'))
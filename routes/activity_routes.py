@@ -0,0 +1,68 @@
+from datetime import datetime, timedelta
+
+from flask import Blueprint, request, jsonify
+from flask_login import login_required
+from sqlalchemy.exc import SQLAlchemyError
+
+from utils.activity_partitions import encode_cursor, query_activity, resolve_cursor, rollups
+from utils.auth_decorators import admin_required
+from utils.paging import page_limit, page_response
+
+activity_routes = Blueprint("activity_routes", __name__, url_prefix="/api/activity")
+
+
+def _datetime_arg(name):
+    value = request.args.get(name)
+    return datetime.fromisoformat(value) if value else None
+
+
+# -------------------- LIST ACTIVITY (ADMIN) ---------------------
+@activity_routes.route("", methods=["GET"], strict_slashes=False)
+@login_required
+@admin_required
+def get_activity():
+    try:
+        user_id = request.args.get('user_id', type=int)
+        action_type = request.args.get('action_type', '').strip() or None
+        since = _datetime_arg('since')
+        until = _datetime_arg('until')
+        limit = page_limit(50, 200)
+        before = request.args.get('before')
+
+        # Keyset paging: continue strictly after the last entry of the previous page
+        cursor = None
+        if before:
+            cursor = resolve_cursor(before)
+            if cursor is None:
+                return jsonify({"error": "Invalid cursor"}), 400
+
+        # Only the monthly partitions overlapping the window are read
+        entries = query_activity(
+            user_id=user_id, action_type=action_type, since=since, until=until, cursor=cursor, limit=limit
+        )
+
+        return page_response(entries, limit, lambda entry: entry.to_dict(), cursor=encode_cursor)
+
+    except ValueError:
+        return jsonify({"error": "Invalid filter"}), 400
+    except SQLAlchemyError as e:
+        return jsonify({"error": "Database error: " + str(e)}), 500
+
+
+# -------------------- HOURLY ROLLUPS (ADMIN) --------------------
+@activity_routes.route("/rollups", methods=["GET"], strict_slashes=False)
+@login_required
+@admin_required
+def get_activity_rollups():
+    try:
+        until = _datetime_arg('until') or datetime.utcnow()
+        since = _datetime_arg('since') or until - timedelta(days=1)
+        if until - since > timedelta(days=93):
+            return jsonify({"error": "Range too large (max 93 days)"}), 400
+        action_type = request.args.get('action_type', '').strip() or None
+        return jsonify([rollup.to_dict() for rollup in rollups(since, until, action_type)])
+
+    except ValueError:
+        return jsonify({"error": "Invalid filter"}), 400
+    except SQLAlchemyError as e:
+        return jsonify({"error": "Database error: " + str(e)}), 500
@@ -0,0 +1,43 @@
+import mimetypes
+import os
+
+from flask import Blueprint, Response, abort, current_app, request, send_file
+
+from utils.assets import precompressed, resolve, static_path
+
+asset_bp = Blueprint('asset_bp', __name__, url_prefix='/assets')
+
+IMMUTABLE = "public, max-age=31536000, immutable"
+REVALIDATE = "public, no-cache"
+
+
+# serve a (fingerprinted) static file
+@asset_bp.route('/<path:filename>', methods=['GET', 'HEAD'])
+def serve_asset(filename):
+    relative, immutable = resolve(filename)
+    path = static_path(relative)
+    if path is None or not os.path.isfile(path):
+        abort(404)
+
+    variant, encoding = precompressed(path, request.accept_encodings)
+    mimetype = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+    headers = {
+        "Cache-Control": IMMUTABLE if immutable else REVALIDATE,
+        "Vary": "Accept-Encoding",
+    }
+    if encoding:
+        headers["Content-Encoding"] = encoding
+
+    # Behind a front-end server, hand the bytes (and Range/ETag handling) off to it
+    offload = current_app.config.get('ASSET_OFFLOAD')
+    if offload == 'nginx':
+        prefix = current_app.config.get('ASSET_ACCEL_PREFIX', '/protected-static/')
+        internal = prefix + os.path.relpath(variant, os.path.realpath(current_app.static_folder)).replace(os.sep, '/')
+        return Response(status=200, mimetype=mimetype, headers={**headers, "X-Accel-Redirect": internal})
+    if offload == 'sendfile':
+        return Response(status=200, mimetype=mimetype, headers={**headers, "X-Sendfile": variant})
+
+    # Served by the worker: strong ETag, Last-Modified and Range requests via Werkzeug
+    response = send_file(variant, mimetype=mimetype, conditional=True, etag=True, max_age=None)
+    response.headers.update(headers)
+    return response
@@ -1,8 +1,13 @@
-from flask import Blueprint, request, jsonify, redirect, url_for, session
-from werkzeug.security import generate_password_hash
+from flask import Blueprint, request, jsonify, redirect, url_for, session, abort
 from models.user import db, User, RoleEnum
 from flask_login import login_user, logout_user, login_required, current_user
 from utils.google_oauth import oauth
+from utils.passwords import HashingBusy
+from utils.throttle import throttle
+from utils.assets import asset_url
+from utils.auth_tokens import InvalidToken, bearer_token, decode, expires_at, issue_tokens, token_revocations
+from utils.identity_cache import identity_cache
+from utils.activity_log import record_activity
 from datetime import datetime
 import secrets
 from flask_mail import Message
@@ -25,46 +30,60 @@ def register():
     new_user = User(
         full_name=full_name,
         email=email,
-        password_hash=generate_password_hash(password),
         role=RoleEnum.CUSTOMER
     )
+    new_user.set_password(password)
     db.session.add(new_user)
     db.session.commit()
     return jsonify({"message": "Registration successful"}), 201
 
-@auth_bp.route('/login', methods=['POST'])
-def login():
-    if not request.is_json:
-        return jsonify({"error": "Request must be JSON"}), 415
-
-    data = request.get_json()
+def _authenticate(data):
+    """The active user for the submitted credentials, or (None, error response)."""
     email = data.get('email')
     password = data.get('password')
 
     if not email or not password:
-        return jsonify({"error": "Email and password are required"}), 400
+        return None, (jsonify({"error": "Email and password are required"}), 400)
 
     user = User.query.filter_by(email=email).first()
     if not user:
-        return jsonify({"error": "Invalid credentials"}), 401
+        return None, (jsonify({"error": "Invalid credentials"}), 401)
 
     if not user.password_hash:
-        return jsonify({"error": "User must sign in via Google"}), 401
+        return None, (jsonify({"error": "User must sign in via Google"}), 401)
 
     if not user.check_password(password):
-        return jsonify({"error": "Invalid credentials"}), 401
+        record_activity('login_failed', user.id, "Wrong password")
+        return None, (jsonify({"error": "Invalid credentials"}), 401)
+
+    # Transparently move old hashes onto the current policy
+    if user.upgrade_password_hash(password):
+        db.session.commit()
     
     if user.status == "banned":
-        return jsonify({"error": "Account is banned"}), 403
+        return None, (jsonify({"error": "Account is banned"}), 403)
 
     if user.status == "suspended":
         if user.suspension_ends_at and user.suspension_ends_at > datetime.utcnow():
-            return jsonify({"error": f"Account is suspended until {user.suspension_ends_at}"}), 403
+            return None, (jsonify({"error": f"Account is suspended until {user.suspension_ends_at}"}), 403)
         else:
             user.status = "active"
             db.session.commit()
 
+    return user, None
+
+@auth_bp.route('/login', methods=['POST'])
+@throttle('login')
+def login():
+    if not request.is_json:
+        return jsonify({"error": "Request must be JSON"}), 415
+
+    user, error = _authenticate(request.get_json())
+    if error:
+        return error
+
     login_user(user)
+    record_activity('login', user.id, "Signed in", {"method": "password"})
     
     # Create response with user data
     response = jsonify({
@@ -74,12 +93,68 @@ def login():
             "full_name": user.full_name,
             "email": user.email,
             "role": user.role.value,  # Use .value for Enum serialization
-            "avatar_url": user.avatar_url
+            "avatar_url": asset_url(user.avatar_url)
         }
     })
     
     return response, 200
 
+@auth_bp.route('/token', methods=['POST'])
+@throttle('login')
+def issue_token():
+    if not token_revocations.enabled:
+        abort(404)
+    if not request.is_json:
+        return jsonify({"error": "Request must be JSON"}), 415
+
+    user, error = _authenticate(request.get_json())
+    if error:
+        return error
+    record_activity('login', user.id, "Signed in", {"method": "token"})
+    return jsonify(issue_tokens(user)), 200
+
+@auth_bp.route('/token/refresh', methods=['POST'])
+def refresh_token():
+    if not token_revocations.enabled:
+        abort(404)
+    data = request.get_json(silent=True) or {}
+    try:
+        claims = decode(data.get('refresh_token') or '', 'refresh', check_revoked=False)
+    except InvalidToken:
+        return jsonify({"error": "Invalid refresh token"}), 401
+
+    user_id = int(claims['sub'])
+    if token_revocations.is_cut_off(claims):
+        return jsonify({"error": "Invalid refresh token"}), 401
+    # Single use: a second presentation means the token was copied
+    if not token_revocations.revoke(claims['jti'], user_id, expires_at(claims)):
+        with db.engine.begin() as connection:
+            token_revocations.revoke_user(connection, [user_id])
+        token_revocations.expire()
+        return jsonify({"error": "Invalid refresh token"}), 401
+
+    user = identity_cache.load(user_id)
+    if user is None or user.status == "banned":
+        return jsonify({"error": "Invalid refresh token"}), 401
+    if user.status == "suspended" and user.suspension_ends_at and user.suspension_ends_at > datetime.utcnow():
+        return jsonify({"error": f"Account is suspended until {user.suspension_ends_at}"}), 403
+    return jsonify(issue_tokens(user)), 200
+
+@auth_bp.route('/token/revoke', methods=['POST'])
+def revoke_token():
+    if not token_revocations.enabled:
+        abort(404)
+    data = request.get_json(silent=True) or {}
+    for token, token_type in ((bearer_token(request), 'access'), (data.get('refresh_token'), 'refresh')):
+        if not token:
+            continue
+        try:
+            claims = decode(token, token_type, check_revoked=False)
+        except InvalidToken:
+            continue
+        token_revocations.revoke(claims['jti'], int(claims['sub']), expires_at(claims))
+    return jsonify({"message": "Token revoked"}), 200
+
 @auth_bp.route('/google/login')
 def google_login():
     redirect_uri = url_for('auth_bp.google_callback', _external=True)
@@ -108,9 +183,11 @@ def google_callback():
 
     # 4) Log in and redirect
     login_user(user)
+    record_activity('login', user.id, "Signed in", {"method": "google"})
     return redirect("http://localhost:3000/dashboard")
 
 @auth_bp.route('/forgot-password', methods=['POST'])
+@throttle('forgot_password')
 def forgot_password():
     data = request.get_json()
     email = data.get('email')
@@ -152,15 +229,23 @@ def reset_password():
     if not user:
         return jsonify({"error": "Invalid or expired token"}), 400
 
-    user.password_hash = generate_password_hash(new_password)
+    user.set_password(new_password)
     user.reset_token = None  # Invalidate token after use
     db.session.commit()
 
     return jsonify({"message": "Password has been reset successfully"}), 200
 
+@auth_bp.errorhandler(HashingBusy)
+def hashing_busy(error):
+    # Shed the burst rather than queueing every login behind the hashing pool
+    response = jsonify({"error": "Too many sign-in attempts in progress, please retry"})
+    response.headers['Retry-After'] = '1'
+    return response, 503
+
 @auth_bp.route('/logout')
 @login_required
 def logout():
+    record_activity('logout', current_user.id, "Signed out")
     logout_user()
     response = jsonify({"message": "Logged out"})
     response.set_cookie('session', '', expires=0)  # Clear session cookie
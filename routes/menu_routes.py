@@ -4,7 +4,11 @@ from models import db, Payment, Order, OrderItem, MenuCategory, MenuItem  # Impo
 from flask_login import login_required, current_user
 from contextlib import contextmanager
 from datetime import datetime
-from sqlalchemy.orm import joinedload
+from sqlalchemy.orm import joinedload, selectinload
+from models.menu import menu_item_serializer, order_serializer
+from models.user import User
+from utils.serialization import json_response, streamed_json_response
+from utils.conditional import MENU_ITEMS, USERS, conditional, orders_of
 
 menu_routes = Blueprint("menu_routes", __name__, url_prefix="/api/menu")
 
@@ -99,13 +103,14 @@ def delete_category(category_id):
 
 # -----------------------GET LIST OF ITEMS IN A CATEGORY-------------
 @menu_routes.route("/items", methods=["GET"])
+@conditional(lambda: [MENU_ITEMS])
 def get_menu_items():
     category_id = request.args.get("category_id")
     query = MenuItem.query
     if category_id:
         query = query.filter_by(category_id=category_id)
     items = query.order_by(MenuItem.name).all()
-    return jsonify([item.to_dict() for item in items])
+    return json_response([menu_item_serializer(item) for item in items])
 
 
 # -------------------------------GET A SPECIFIC ITEM-----------------
@@ -184,8 +189,15 @@ def delete_menu_item(item_id):
 # ========== ORDER ENDPOINTS ==========
 
 # --------------------- GET THE LIST OF ORDERS ----------------
+def _order_scopes():
+    # One user's orders are versioned; the unfiltered list changes with every order anywhere
+    user_id = request.args.get("user_id", type=int)
+    return [orders_of(user_id), MENU_ITEMS, USERS] if user_id is not None else None
+
+
 @menu_routes.route("/orders", methods=["GET"])
 @login_required
+@conditional(_order_scopes)
 def get_orders():
     user_id = request.args.get("user_id")
     status = request.args.get("status")
@@ -194,8 +206,13 @@ def get_orders():
         query = query.filter_by(user_id=user_id)
     if status:
         query = query.filter_by(status=status)
-    orders = query.order_by(Order.created_at.desc()).all()
-    return jsonify([order.to_dict() for order in orders])
+    # Everything the serializer touches, in three queries per batch instead of several per order
+    query = query.options(
+        selectinload(Order.items).joinedload(OrderItem.menu_item),
+        selectinload(Order.items).joinedload(OrderItem.chef).load_only(User.full_name),
+        joinedload(Order.payment),
+    ).order_by(Order.created_at.desc())
+    return streamed_json_response(query, order_serializer)
 
 
 # ----------------------------------GET A SPECFIC ORDERS----------
@@ -215,7 +232,8 @@ def get_order(order_id):
 
 
 # ------------------------CREATE AN ORDER--------------------
-from routes.payment_routes import process_payment
+from utils.payment_gateway import process_payment
+from utils.payment_worker import payment_processor, enqueue_payment, apply_payment_result
 
 @menu_routes.route("/orders", methods=["POST"])
 @login_required
@@ -252,9 +270,10 @@ def create_order():
 
             # Payment processing ONLY if payment data exists
             payment_data = data.get("payment")
+            outbox_id = None
             if payment_data:
                 payment = Payment(
-                    order_id=order.id,
+                    order=order,
                     cashier_id=current_user.id,
                     amount=payment_data["amount"],
                     method=payment_data["method"],
@@ -265,16 +284,15 @@ def create_order():
                     discount=payment_data.get("discount", 0.0)
                 )
                 session.add(payment)
-                session.flush()  # Ensure payment ID is available
 
-                # Process payment
-                payment_success = process_payment(payment_data)
-                if payment_success:
-                    payment.status = 'completed'
-                    order.status = 'confirmed'
+                # Settle cash now; gateway payments confirm the order from the outbox worker
+                if payment.method == "cash":
+                    apply_payment_result(payment, process_payment(payment), confirm_order=True)
+                    session.flush()
                 else:
-                    payment.status = 'failed'
-                    order.status = 'payment_failed'
+                    outbox = enqueue_payment(payment, confirm_order=True)
+                    session.flush()
+                    outbox_id = outbox.id  # read before the scope closes the session
 
             # Build response while session is still open
             order_dict = order.to_dict()
@@ -282,6 +300,8 @@ def create_order():
             if payment_data:
                 order_dict['payment'] = payment.to_dict()
 
+        if outbox_id is not None:
+            payment_processor.submit(outbox_id)
         return jsonify(order_dict), 201
     except Exception as e:
         return jsonify({"error": str(e)}), 400
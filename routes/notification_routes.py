@@ -1,10 +1,20 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, Response, request, jsonify, current_app, stream_with_context
 from flask_login import login_required, current_user
 from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.orm import joinedload
 from models import db
 from models import Notification, User
+from models.user import RoleEnum
+from utils.auth_decorators import admin_required
+from utils.notification_fanout import broadcast, SEGMENTS
+from utils.notification_digest import is_digested, schedule_digest
+from utils.unread_counters import unread_count_for, unread_criteria, read_watermark, mark_all_read
+from utils.notification_stream import notification_hub
+from utils.paging import page_limit, page_response
+import json
+import time
 from datetime import datetime, timedelta
+from utils.mailer import email_sender
 
 notification_routes = Blueprint("notification_routes", __name__, url_prefix="/api/notifications")
 
@@ -15,22 +25,39 @@ def get_notifications():
     try:
         # Get query parameters
         unread_only = request.args.get('unread', 'false').lower() == 'true'
-        limit = int(request.args.get('limit', 20))
+        limit = page_limit(20, 100)
+        before = request.args.get('before', type=int)
         
-        # Base query with eager loading
+        # Only the sender's name is serialized, so load nothing else of the user;
+        # expired rows are hidden until the purge job removes them
         query = Notification.query.options(
-            joinedload(Notification.sender),
-            joinedload(Notification.recipient)
-        ).filter_by(recipient_id=current_user.id)
+            joinedload(Notification.sender).load_only(User.full_name)
+        ).filter(
+            Notification.recipient_id == current_user.id,
+            Notification.expires_at > datetime.utcnow()
+        )
         
-        # Apply filters
+        # Apply filters; with a watermark, unread is a created_at range over the inbox index
+        last_read_at = read_watermark(current_user.id)
         if unread_only:
-            query = query.filter_by(is_read=False)
+            query = query.filter(unread_criteria(last_read_at))
+
+        # Keyset paging: continue strictly after the last notification of the previous page
+        if before is not None:
+            cursor_created_at = db.session.query(Notification.created_at).filter_by(
+                id=before, recipient_id=current_user.id
+            ).scalar()
+            if cursor_created_at is None:
+                return jsonify({"error": "Invalid cursor"}), 400
+            query = query.filter(db.or_(
+                Notification.created_at < cursor_created_at,
+                db.and_(Notification.created_at == cursor_created_at, Notification.id < before)
+            ))
         
         # Order and limit
-        notifications = query.order_by(Notification.created_at.desc()).limit(limit).all()
+        notifications = query.order_by(Notification.created_at.desc(), Notification.id.desc()).limit(limit).all()
         
-        return jsonify([n.to_dict() for n in notifications])
+        return page_response(notifications, limit, lambda n: n.to_dict(last_read_at))
     
     except SQLAlchemyError as e:
         return jsonify({"error": "Database error: " + str(e)}), 500
@@ -40,16 +67,72 @@ def get_notifications():
 @login_required
 def get_unread_count():
     try:
-        count = Notification.query.filter_by(
-            recipient_id=current_user.id,
-            is_read=False
-        ).count()
-        
-        return jsonify({"unread_count": count})
+        return jsonify({"unread_count": unread_count_for(current_user.id)})
     
     except SQLAlchemyError as e:
         return jsonify({"error": "Database error: " + str(e)}), 500
 
+# -------------------- NOTIFICATION STREAM (SSE) -----------------
+@notification_routes.route("/stream", methods=["GET"], strict_slashes=False)
+@login_required
+def stream_notifications():
+    """Server-sent events: new notifications and unread-count changes, pushed on commit"""
+    if current_app.config.get('GUNICORN_WORKER_CLASS') == 'sync':
+        # One open stream would occupy the worker's only thread for minutes
+        return jsonify({"error": "Notification streams are unavailable; poll /unread-count instead"}), 503
+    user_id = current_user.id
+    heartbeat = current_app.config.get('NOTIFICATION_STREAM_HEARTBEAT', 15)
+    max_age = current_app.config.get('NOTIFICATION_STREAM_MAX_AGE', 300)
+    try:
+        last_id = int(request.headers.get('Last-Event-ID') or request.args.get('last_id') or 0)
+    except ValueError:
+        return jsonify({"error": "Invalid last event id"}), 400
+
+    def fetch_new(after_id):
+        query = Notification.query.options(joinedload(Notification.sender)).filter(
+            Notification.recipient_id == user_id,
+            Notification.id > after_id,
+            Notification.expires_at > datetime.utcnow()
+        )
+        return query.order_by(Notification.id).limit(50).all()
+
+    def sse(event, data, event_id=None):
+        prefix = f"id: {event_id}\n" if event_id is not None else ""
+        return f"{prefix}event: {event}\ndata: {json.dumps(data)}\n\n"
+
+    def events():
+        subscription = notification_hub.subscribe(user_id)
+        try:
+            cursor = last_id
+            if not cursor:
+                newest = db.session.query(db.func.max(Notification.id)).filter_by(recipient_id=user_id).scalar()
+                cursor = newest or 0
+            yield "retry: 5000\n\n"
+            yield sse("unread", {"unread_count": unread_count_for(user_id)})
+            db.session.close()  # never hold a connection while idle
+
+            deadline = time.monotonic() + max_age
+            woken = bool(last_id)  # a reconnecting client may have missed events
+            while time.monotonic() < deadline:
+                if not woken:
+                    yield ": keep-alive\n\n"
+                else:
+                    last_read_at = read_watermark(user_id)
+                    for notification in fetch_new(cursor):
+                        cursor = notification.id
+                        yield sse("notification", notification.to_dict(last_read_at), event_id=notification.id)
+                    yield sse("unread", {"unread_count": unread_count_for(user_id)})
+                    db.session.close()
+                woken = subscription.wait(min(heartbeat, max(deadline - time.monotonic(), 0)))
+        finally:
+            notification_hub.unsubscribe(subscription)
+
+    return Response(
+        stream_with_context(events()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 # -------------------- MARK AS READ -----------------------------
 @notification_routes.route("/<int:notification_id>/read", methods=["PATCH"],strict_slashes=False)
 @login_required
@@ -64,7 +147,7 @@ def mark_as_read(notification_id):
             notification.is_read = True
             db.session.commit()
         
-        return jsonify(notification.to_dict())
+        return jsonify(notification.to_dict(read_watermark(current_user.id)))
     
     except SQLAlchemyError as e:
         db.session.rollback()
@@ -75,11 +158,9 @@ def mark_as_read(notification_id):
 @login_required
 def mark_all_as_read():
     try:
-        updated = Notification.query.filter_by(
-            recipient_id=current_user.id,
-            is_read=False
-        ).update({"is_read": True})
-        
+        # Moving the watermark reads everything so far without touching the notification rows
+        updated = unread_count_for(current_user.id)
+        mark_all_read(current_user.id)
         db.session.commit()
         return jsonify({"message": f"{updated} notifications marked as read"})
     
@@ -111,12 +192,20 @@ def create_notification():
         )
         
         db.session.add(notification)
-        db.session.commit()
-        
-        # Send email notification if applicable
+
+        # Queue the email in the same transaction; the background sender delivers it
         recipient = User.query.get(data['recipient_id'])
-        if recipient and recipient.email and recipient.email_notifications:
-            notification.send_email(recipient.email)
+        email_pending = bool(recipient and recipient.email and recipient.email_notifications)
+        if email_pending:
+            if is_digested(notification.priority):
+                schedule_digest(recipient.id)  # low priority: goes out with the next digest
+            else:
+                notification.queue_email(recipient.email)
+
+        db.session.commit()
+        if email_pending:
+            # Also for a digest: the sender's poll is what queues it once the window ends
+            email_sender.wake()
         
         # Explicitly load sender relationship
         notification = Notification.query.options(db.joinedload(Notification.sender)).get(notification.id)
@@ -127,6 +216,48 @@ def create_notification():
         db.session.rollback()
         return jsonify({"error": str(e)}), 500
 
+# -------------------- BROADCAST NOTIFICATION --------------------
+@notification_routes.route("/broadcast", methods=["POST"], strict_slashes=False)
+@login_required
+@admin_required
+def broadcast_notification():
+    data = request.get_json() or {}
+
+    if not all(field in data for field in ['title', 'message']):
+        return jsonify({"error": "Missing required fields"}), 400
+
+    roles = data.get('roles') or []
+    segment = data.get('segment')
+    if not roles and not segment:
+        return jsonify({"error": "Specify roles and/or a segment"}), 400
+
+    valid_roles = {role.value for role in RoleEnum}
+    if any(role not in valid_roles for role in roles):
+        return jsonify({"error": "Invalid role"}), 400
+    if segment and segment not in SEGMENTS:
+        return jsonify({"error": f"Unknown segment; expected one of {sorted(SEGMENTS)}"}), 400
+
+    try:
+        created = broadcast(
+            sender_id=current_user.id,
+            title=data['title'],
+            message=data['message'],
+            roles=roles,
+            segment=segment,
+            type=data.get('type', 'app'),
+            priority=data.get('priority', 0),
+            action_url=data.get('action_url')
+        )
+        db.session.commit()
+        if created:
+            email_sender.wake()
+
+        return jsonify({"message": f"Notification sent to {created} recipients", "recipients": created}), 201
+
+    except SQLAlchemyError as e:
+        db.session.rollback()
+        return jsonify({"error": "Database error: " + str(e)}), 500
+
 # -------------------- DELETE NOTIFICATION -----------------------
 @notification_routes.route("/<int:notification_id>", methods=["DELETE"],strict_slashes=False)
 @login_required
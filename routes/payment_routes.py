@@ -1,10 +1,16 @@
-from datetime import datetime
-from flask import Blueprint, request, jsonify
+from datetime import datetime, timedelta
+from flask import Blueprint, request, jsonify, url_for, current_app
 from sqlalchemy.exc import SQLAlchemyError
 from models import db, Payment
+from models.payment import payment_serializer
+from utils.serialization import streamed_json_response
 from flask_login import login_required, current_user
-import random
-import string
+from utils.payment_gateway import process_payment
+from utils.payment_worker import payment_processor, enqueue_payment, apply_payment_result
+from utils.revenue import daily_report
+from utils.auth_decorators import admin_required
+import hashlib
+import hmac
 
 payment_routes = Blueprint("payment_routes", __name__, url_prefix="/api/payments")
 
@@ -14,8 +20,27 @@ payment_routes = Blueprint("payment_routes", __name__, url_prefix="/api/payments
 @login_required
 def get_payments():
     try:
-        payments = Payment.query.all()
-        return jsonify([payment.to_dict() for payment in payments])
+        return streamed_json_response(Payment.query.order_by(Payment.id), payment_serializer)
+    except SQLAlchemyError as e:
+        return jsonify({"error": "Database error: " + str(e)}), 500
+
+# --------------------- DAILY REVENUE REPORT ----------------
+@payment_routes.route("/reports/daily", methods=["GET"])
+@login_required
+@admin_required
+def get_daily_revenue():
+    today = datetime.utcnow().date()
+    try:
+        end = datetime.fromisoformat(request.args["end"]).date() if "end" in request.args else today
+        start = datetime.fromisoformat(request.args["start"]).date() if "start" in request.args else end - timedelta(days=6)
+    except ValueError:
+        return jsonify({"error": "Invalid date format"}), 400
+    if start > end:
+        return jsonify({"error": "start must not be after end"}), 400
+
+    try:
+        rows = daily_report(start, end, today=today)
+        return jsonify({"start": start.isoformat(), "end": end.isoformat(), "rows": rows})
     except SQLAlchemyError as e:
         return jsonify({"error": "Database error: " + str(e)}), 500
 
@@ -58,25 +83,71 @@ def create_payment():
             tax_amount=data.get("tax_amount", 0.0),
             discount=data.get("discount", 0.0)
         )
-        
         db.session.add(payment)
+
+        # Cash is settled at the till; gateway payments are handed to the outbox
+        if payment.method == "cash":
+            apply_payment_result(payment, process_payment(payment))
+            db.session.commit()
+            return jsonify(payment.to_dict()), 201
+
+        outbox = enqueue_payment(payment)
         db.session.commit()
-        
-        # Process payment after successful creation
-        success = process_payment(payment)
-        if success:
-            payment.status = 'completed'
-        else:
-            payment.status = 'failed'
-        
-        db.session.commit()
-        
-        return jsonify(payment.to_dict()), 201
+        payment_processor.submit(outbox.id)
+
+        response = payment.to_dict()
+        response["status_url"] = url_for("payment_routes.get_payment_status", payment_id=payment.id)
+        return jsonify(response), 202
         
     except Exception as e:
         db.session.rollback()
         return jsonify({"error": str(e)}), 400
 
+# ---------------------------POLL A payment's STATUS------------
+@payment_routes.route("/<int:payment_id>/status", methods=["GET"])
+@login_required
+def get_payment_status(payment_id):
+    payment = Payment.query.get_or_404(payment_id)
+    return jsonify({
+        "id": payment.id,
+        "status": payment.status,
+        "transaction_id": payment.transaction_id,
+        "order_status": payment.order.status if payment.order else None
+    })
+
+# ---------------------------GATEWAY CALLBACK------------
+@payment_routes.route("/callback", methods=["POST"])
+def payment_callback():
+    """Asynchronous result notification from the payment gateway"""
+    secret = current_app.config.get("PAYMENT_CALLBACK_SECRET")
+    if not secret:
+        return jsonify({"error": "Callbacks are not enabled"}), 403
+
+    expected = hmac.new(secret.encode(), request.get_data(), hashlib.sha256).hexdigest()
+    signature = request.headers.get("X-Gateway-Signature", "")
+    if not hmac.compare_digest(expected, signature):
+        return jsonify({"error": "Invalid signature"}), 403
+
+    data = request.get_json(silent=True) or {}
+    if not data.get("transaction_id") or data.get("status") not in ("completed", "failed"):
+        return jsonify({"error": "Missing required fields"}), 400
+
+    try:
+        payment = Payment.query.filter_by(transaction_id=data["transaction_id"]).first()
+        if not payment:
+            return jsonify({"error": "Unknown transaction"}), 404
+
+        # Callbacks may be redelivered; only the first one settles the payment
+        if payment.status == "pending":
+            confirm_order = payment.outbox.confirm_order if payment.outbox else False
+            apply_payment_result(payment, data["status"] == "completed", confirm_order=confirm_order)
+            db.session.commit()
+
+        return jsonify({"id": payment.id, "status": payment.status})
+    except SQLAlchemyError as e:
+        db.session.rollback()
+        return jsonify({"error": "Database error: " + str(e)}), 500
+
 # ---------------------------UPDATE A payment------------
 @payment_routes.route("/<int:payment_id>", methods=["PUT"])
 @payment_routes.route("/<int:payment_id>/", methods=["PUT"])
@@ -142,31 +213,3 @@ def delete_payment(payment_id):
     except SQLAlchemyError as e:
         db.session.rollback()
         return jsonify({"error": "Database error: " + str(e)}), 500
-
-# ------------------------PAYMENT PROCESSING--------------------
-def process_payment(payment):
-    """Process payment through appropriate gateway"""
-    try:
-        if payment.method == "mpesa":
-            return process_mpesa_payment(payment)
-        elif payment.method in ["credit_card", "debit_card"]:
-            return process_card_payment(payment)
-        elif payment.method == "cash":
-            return True  # Cash payments always succeed
-        return False
-    except Exception:
-        return False
-
-def process_mpesa_payment(payment):
-    """Process M-Pesa payment and generate transaction ID"""
-    # In production: Call M-Pesa API and get real transaction ID
-    payment.transaction_id = f"MPESA_{random.randint(100000, 999999)}"
-    # Simulate processing delay
-    return True
-
-def process_card_payment(payment):
-    """Process card payment and generate transaction ID"""
-    # In production: Call payment gateway API
-    payment.transaction_id = f"CARD_{''.join(random.choices(string.ascii_uppercase + string.digits, k=12))}"
-    # Simulate processing delay
-    return True
\ No newline at end of file
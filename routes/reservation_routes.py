@@ -2,7 +2,10 @@ from flask import Blueprint, request, jsonify
 from sqlalchemy.exc import SQLAlchemyError
 from datetime import datetime
 from models import db
-from models.reservation import Reservation
+from models.reservation import Reservation, reservation_serializer
+from sqlalchemy.orm import joinedload
+from utils.serialization import json_response, streamed_json_response
+from utils.conditional import TABLES, USERS, conditional, reservations_on
 from utils.auth_decorators import admin_required
 from flask_login import login_required
 
@@ -43,8 +46,17 @@ def create_reservation():
         db.session.rollback()
         return jsonify({"error": str(e)}), 400
 
+def _reservation_scopes():
+    # Versioned per day, so only the by-date listing is conditional
+    try:
+        day = datetime.fromisoformat(request.args["date"]).date()
+    except (KeyError, ValueError):
+        return None
+    return [reservations_on(day), USERS, TABLES]
+
 @reservation_routes.route("", methods=["GET"])
 @login_required
+@conditional(_reservation_scopes)
 def get_reservations():
     status = request.args.get("status")
     user_id = request.args.get("user_id")
@@ -62,8 +74,10 @@ def get_reservations():
         except ValueError:
             return jsonify({"error": "Invalid date format"}), 400
 
-    reservations = query.order_by(Reservation.reservation_time).all()
-    return jsonify([r.to_dict() for r in reservations])
+    query = query.options(
+        joinedload(Reservation.user), joinedload(Reservation.table)
+    ).order_by(Reservation.reservation_time)
+    return streamed_json_response(query, reservation_serializer)
 
 @reservation_routes.route("/<int:reservation_id>", methods=["GET"])
 @login_required
@@ -157,8 +171,10 @@ def upcoming_reservations():
     if user_id:
         query = query.filter_by(user_id=user_id)
 
-    reservations = query.order_by(Reservation.reservation_time).all()
-    return jsonify([r.to_dict() for r in reservations])
+    reservations = query.options(
+        joinedload(Reservation.user), joinedload(Reservation.table)
+    ).order_by(Reservation.reservation_time).all()
+    return json_response([reservation_serializer(r) for r in reservations])
 
 @reservation_routes.route("/count", methods=["GET"])
 @login_required
@@ -1,5 +1,8 @@
 from flask import Blueprint, request, jsonify
 from models import db, Table, Reservation
+from models.table import table_serializer
+from utils.serialization import json_response
+from utils.conditional import TABLES, conditional
 from sqlalchemy.exc import IntegrityError
 from utils.auth_decorators import admin_required
 from flask_login import login_required, current_user
@@ -34,9 +37,10 @@ def create_table():
 # Get all tables (Admins, Waiters, etc.)
 @table_bp.route('/tables', methods=['GET'])
 @login_required
+@conditional(lambda: [TABLES])
 def get_all_tables():
     tables = Table.query.all()
-    return jsonify([t.to_dict() for t in tables]), 200
+    return json_response([table_serializer(t) for t in tables])
 
 
 # Get single table by ID
@@ -94,6 +98,7 @@ def update_table_status(table_id):
 # Get all available tables
 @table_bp.route('/tables/available', methods=['GET'])
 @login_required
+@conditional(lambda: [TABLES])
 def get_available_tables():
     tables = Table.query.filter_by(status='available').all()
     return jsonify([t.to_dict() for t in tables]), 200
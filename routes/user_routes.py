@@ -1,14 +1,16 @@
 from flask import Blueprint, request, jsonify, current_app
 from flask_login import login_required, current_user
-import os
-from werkzeug.utils import secure_filename
 from models.user import db,User, RoleEnum
 from sqlalchemy import func
 from utils.auth_decorators import admin_required
+from utils.avatars import avatar_processor, AvatarUnavailable, InvalidImage
+from utils.assets import asset_url
+from utils.user_search import search_users, STATUSES
+from utils.paging import page_limit, page_response
 
 user_bp = Blueprint('user_bp', __name__, url_prefix='/api/user')
 
-ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg'}
+ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'webp'}
 
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
@@ -22,12 +24,28 @@ def upload_avatar():
 
     file = request.files['avatar']
     if file and allowed_file(file.filename):
-        filename = secure_filename(f"{current_user.id}_{file.filename}")
-        path = os.path.join(current_app.config['UPLOAD_FOLDER'], filename)
-        file.save(path)
-        current_user.avatar_url = f"/static/avatars/{filename}"
+        data = file.read(current_app.config.get('AVATAR_MAX_BYTES', 10 * 1024 * 1024) + 1)
+        if len(data) > current_app.config.get('AVATAR_MAX_BYTES', 10 * 1024 * 1024):
+            return jsonify({"error": "File too large"}), 413
+
+        # Resized, re-encoded and stripped of metadata in the avatar process pool
+        try:
+            names = avatar_processor.process(data)
+        except InvalidImage:
+            return jsonify({"error": "Invalid image"}), 400
+        except AvatarUnavailable:
+            response = jsonify({"error": "Avatar processing is busy, please try again"})
+            response.headers['Retry-After'] = '5'
+            return response, 503
+
+        urls = {size: {ext: f"/static/avatars/{name}" for ext, name in by_ext.items()} for size, by_ext in names.items()}
+        user = current_user.model
+        user.avatar_url = urls[max(urls)]['webp']
         db.session.commit()
-        return jsonify({"avatar_url": current_user.avatar_url}), 200
+        return jsonify({
+            "avatar_url": asset_url(user.avatar_url),
+            "avatar_urls": {size: {ext: asset_url(url) for ext, url in by_ext.items()} for size, by_ext in urls.items()}
+        }), 200
 
     return jsonify({"error": "Invalid file type"}), 400
 
@@ -45,6 +63,26 @@ def get_all_users():
     users = User.query.all()
     return jsonify([user.to_dict() for user in users])
 
+# search the user directory by name, email prefix, role and status
+@user_bp.route('/search', methods=['GET'])
+@login_required
+@admin_required
+def search_user_directory():
+    name = request.args.get('name', '').strip()
+    email = request.args.get('email', '').strip()
+    role = request.args.get('role', '').strip().upper() or None
+    status = request.args.get('status', '').strip().lower() or None
+    before = request.args.get('before', type=int)
+    limit = page_limit(25, 100)
+
+    if role and role not in [r.value for r in RoleEnum]:
+        return jsonify({"error": "Invalid role"}), 400
+    if status and status not in STATUSES:
+        return jsonify({"error": "Invalid status"}), 400
+
+    users = search_users(name=name, email=email, role=role, status=status, before=before, limit=limit)
+    return page_response(users, limit, lambda user: user.to_dict()), 200
+
 @user_bp.route('/<int:user_id>', methods=['GET'])
 @login_required
 @admin_required
@@ -105,19 +143,20 @@ def change_user_status(user_id):
 def update_user():
     data = request.get_json()
     allowed_fields = ['email', 'gender', 'avatar_url']
+    user = current_user.model  # current_user is a read-only cached identity
     
     for field in allowed_fields:
         if field in data:
-            setattr(current_user, field, data[field])
+            setattr(user, field, data[field])
 
     db.session.commit()
-    return jsonify({"message": "Account updated successfully", "user": current_user.to_dict()}), 200
+    return jsonify({"message": "Account updated successfully", "user": user.to_dict()}), 200
 
 # delete current user's account
 @user_bp.route('/delete', methods=['DELETE'])
 @login_required
 def delete_account():
-    db.session.delete(current_user)
+    db.session.delete(current_user.model)
     db.session.commit()
     return jsonify({"message": "Account deleted successfully"}), 200
 
@@ -279,7 +318,7 @@ def unsuspend_user(user_id):
 @user_bp.route('/welcome', methods=['GET'])
 @login_required
 def welcome_user():
-    user = current_user
+    user = current_user.model
 
     first_time = user.last_login is None
     full_name = user.full_name
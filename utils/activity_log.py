@@ -0,0 +1,144 @@
+# utils/activity_log.py
+"""Audit trail written off the request path.
+
+``record_activity`` only appends a ready-made row to a bounded in-memory ring
+buffer. A per-process background thread bulk-inserts the buffer into the
+monthly ``activity_logs`` partitions and the hourly rollups
+(utils/activity_partitions.py): every ACTIVITY_FLUSH_INTERVAL seconds, or
+sooner once ACTIVITY_FLUSH_SIZE entries are waiting. Requests never wait on
+the database for auditing.
+
+Loss is bounded. A crash loses at most what arrived since the last flush. A
+database outage keeps failed batches in the buffer until ACTIVITY_BUFFER_SIZE
+entries are held, and from then on the oldest are dropped and counted. A clean
+shutdown flushes what is left.
+"""
+
+import atexit
+import json
+import os
+import threading
+from collections import deque
+from datetime import datetime
+
+from flask import g, has_request_context, request
+from models import db
+from utils.activity_partitions import forget_partitions, write_batch
+
+
+def _actor_id():
+    """The user Flask-Login already loaded for this request, if any; never triggers a lookup."""
+    if not has_request_context():
+        return None
+    user = g.get('_login_user')
+    return user.id if user is not None and user.is_authenticated else None
+
+
+class ActivityRecorder:
+    def __init__(self):
+        self.app = None
+        self.enabled = True
+        self.flush_size = 500
+        self.interval = 2.0
+        self.dropped = 0
+        self._buffer = deque(maxlen=10000)
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._pid = None
+
+    def init_app(self, app):
+        self.app = app
+        self.enabled = app.config.get('ACTIVITY_LOG_ENABLED', True)
+        self.flush_size = app.config.get('ACTIVITY_FLUSH_SIZE', 500)
+        self.interval = app.config.get('ACTIVITY_FLUSH_INTERVAL', 2.0)
+        self._buffer = deque(maxlen=app.config.get('ACTIVITY_BUFFER_SIZE', 10000))
+        app.extensions['activity_recorder'] = self
+        atexit.register(self.flush)
+
+    # ---------------------------------------------------------------- thread
+    def _ensure_started(self):
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            # A forked worker must not write out the parent's entries a second time
+            self._buffer.clear()
+            self._thread = threading.Thread(target=self._run, name='activity-log', daemon=True)
+            self._thread.start()
+            self._pid = os.getpid()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception:
+                self.app.logger.exception("Activity log flush failed")
+
+    # ---------------------------------------------------------------- buffer
+    def record(self, action_type, user_id=None, description=None, data=None):
+        if not self.enabled:
+            return
+        self._ensure_started()
+        ip_address = user_agent = None
+        if has_request_context():
+            ip_address = request.remote_addr
+            user_agent = request.user_agent.string[:512] or None
+        row = {
+            "user_id": user_id if user_id is not None else _actor_id(),
+            "action_type": action_type,
+            "description": description,
+            "ip_address": ip_address,
+            "user_agent": user_agent,
+            "activity_data": json.dumps(data, default=str) if data is not None else None,
+            "timestamp": datetime.utcnow(),
+        }
+        with self._lock:
+            if len(self._buffer) == self._buffer.maxlen:
+                self.dropped += 1
+            self._buffer.append(row)
+            pending = len(self._buffer)
+        if pending >= self.flush_size:
+            self._wakeup.set()
+
+    def flush(self):
+        """Bulk-insert everything buffered; returns the number of rows written."""
+        if self._pid != os.getpid():
+            return 0  # nothing recorded here; a forked copy of the buffer belongs to the parent
+        with self._lock:
+            batch = list(self._buffer)
+            self._buffer.clear()
+            dropped, self.dropped = self.dropped, 0
+        if dropped:
+            self.app.logger.warning("Activity log buffer overflowed; %d entries dropped", dropped)
+        if not batch:
+            return 0
+        try:
+            with self.app.app_context(), db.engine.begin() as connection:
+                for start in range(0, len(batch), self.flush_size):
+                    write_batch(connection, batch[start:start + self.flush_size])
+        except Exception:
+            forget_partitions()
+            # Keep the batch ahead of newer entries; the ring drops the oldest if it is full
+            with self._lock:
+                pending = batch + list(self._buffer)
+                self.dropped += max(0, len(pending) - self._buffer.maxlen)
+                self._buffer.clear()
+                self._buffer.extend(pending[-self._buffer.maxlen:])
+            raise
+        return len(batch)
+
+
+activity_recorder = ActivityRecorder()
+
+
+def record_activity(action_type, user_id=None, description=None, data=None):
+    """Queue an audit entry; ``user_id`` defaults to the authenticated user of the request."""
+    activity_recorder.record(action_type, user_id=user_id, description=description, data=data)
+
+
+def init_activity_log(app):
+    activity_recorder.init_app(app)
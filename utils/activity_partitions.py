@@ -0,0 +1,345 @@
+# utils/activity_partitions.py
+"""Monthly partitions, retention and hourly rollups for ``activity_logs``.
+
+On Postgres ``activity_logs`` is range-partitioned by ``timestamp``, with one
+partition per month (``activity_logs_y2026m10``). Inserts go to the parent,
+and the planner skips partitions outside a query's ``timestamp`` range.
+
+SQLite has no partitioning, so the same month tables exist as independent
+shards. The writer routes each entry to its shard, and ``query_activity``
+walks the shards newest first, stopping once a page is full. Each shard's
+AUTOINCREMENT sequence starts at ``YYYYMM * 10**9``. That keeps ids unique
+across shards, and an id names the shard holding it.
+
+The activity log writer creates missing partitions before inserting into them.
+It also adds each batch to ``activity_rollups`` in the same transaction, so the
+rollups remain after ``flask activity prune`` drops old partitions, one
+``DROP TABLE`` per month, never row by row.
+"""
+
+import re
+import threading
+from collections import Counter
+from datetime import datetime
+
+import click
+from flask import current_app
+from flask.cli import AppGroup
+from sqlalchemy import (
+    Column, DateTime, ForeignKey, Index, Integer, MetaData, String, Table, Text, delete, insert, select, text
+)
+from sqlalchemy.orm import aliased, joinedload, selectinload
+from sqlalchemy.schema import CreateIndex, CreateTable
+
+from models import db, ActivityLog, ActivityRollup, User
+from utils.upsert import upsert_increment
+
+PARENT = ActivityLog.__tablename__
+PARTITION_NAME = re.compile(r'^%s_y(\d{4})m(\d{2})$' % PARENT)
+SHARD_ID_BASE = 10 ** 9
+CURSOR_TIME_FORMAT = '%Y%m%d%H%M%S%f'
+
+_shards = MetaData()
+_ensured = set()
+_lock = threading.Lock()
+
+
+# ----------------------------------------------------------------- months
+def month_of(value):
+    return value.year, value.month
+
+
+def month_bounds(month):
+    year, number = month
+    start = datetime(year, number, 1)
+    end = datetime(year + number // 12, number % 12 + 1, 1)
+    return start, end
+
+
+def add_months(month, count):
+    index = month[0] * 12 + month[1] - 1 + count
+    return index // 12, index % 12 + 1
+
+
+def partition_name(month):
+    return f"{PARENT}_y{month[0]:04d}m{month[1]:02d}"
+
+
+def hour_of(value):
+    return value.replace(minute=0, second=0, microsecond=0)
+
+
+# ------------------------------------------------------------- partitions
+def _shard_table(month):
+    """The SQLite shard for ``month``: ActivityLog's columns with a standalone AUTOINCREMENT id."""
+    name = partition_name(month)
+    if name in _shards.tables:
+        return _shards.tables[name]
+    with _lock:
+        if name in _shards.tables:
+            return _shards.tables[name]
+        return Table(
+            name, _shards,
+            Column('id', Integer, primary_key=True),
+            Column('user_id', Integer, ForeignKey(User.__table__.c.id, ondelete='SET NULL'), nullable=True),
+            Column('action_type', String(50), nullable=False),
+            Column('description', Text, nullable=True),
+            Column('ip_address', String(45), nullable=True),
+            Column('user_agent', Text, nullable=True),
+            Column('activity_data', Text),
+            Column('timestamp', DateTime, nullable=False),
+            Index(f'ix_{name}_timestamp', 'timestamp'),
+            Index(f'ix_{name}_user_id_timestamp', 'user_id', 'timestamp'),
+            Index(f'ix_{name}_action_type_timestamp', 'action_type', 'timestamp'),
+            sqlite_autoincrement=True,
+        )
+
+
+def ensure_partition(connection, month):
+    """Create the partition for ``month`` if it does not exist yet; cached per process."""
+    dialect = connection.dialect.name
+    if (dialect, month) in _ensured:
+        return
+    name = partition_name(month)
+    if dialect == 'postgresql':
+        start, end = month_bounds(month)
+        connection.execute(text(
+            f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF {PARENT} "
+            f"FOR VALUES FROM ('{start.isoformat(' ')}') TO ('{end.isoformat(' ')}')"
+        ))
+    elif dialect == 'sqlite':
+        table = _shard_table(month)
+        connection.execute(CreateTable(table, if_not_exists=True))
+        for index in table.indexes:
+            connection.execute(CreateIndex(index, if_not_exists=True))
+        connection.execute(
+            text(
+                "INSERT INTO sqlite_sequence (name, seq) SELECT :name, :seq "
+                "WHERE NOT EXISTS (SELECT 1 FROM sqlite_sequence WHERE name = :name)"
+            ),
+            {"name": name, "seq": (month[0] * 100 + month[1]) * SHARD_ID_BASE},
+        )
+    _ensured.add((dialect, month))
+
+
+def forget_partitions():
+    """Drop the per-process cache, e.g. after a transaction that created partitions rolled back."""
+    _ensured.clear()
+
+
+def insert_target(connection, month):
+    """The table that rows for ``month`` are inserted into."""
+    if connection.dialect.name == 'sqlite':
+        return _shard_table(month)
+    return ActivityLog.__table__
+
+
+def list_partitions(connection):
+    """Months that have a partition, oldest first."""
+    if connection.dialect.name == 'postgresql':
+        names = connection.execute(text(
+            "SELECT child.relname FROM pg_inherits "
+            "JOIN pg_class parent ON parent.oid = pg_inherits.inhparent "
+            "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+            "WHERE parent.relname = :parent"
+        ), {"parent": PARENT}).scalars()
+    elif connection.dialect.name == 'sqlite':
+        names = connection.execute(text(
+            "SELECT name FROM sqlite_master WHERE type = 'table' AND name LIKE :pattern"
+        ), {"pattern": f"{PARENT}_y%"}).scalars()
+    else:
+        return []
+    months = []
+    for name in names:
+        match = PARTITION_NAME.match(name)
+        if match:
+            months.append((int(match.group(1)), int(match.group(2))))
+    return sorted(months)
+
+
+def drop_partitions_before(connection, month):
+    """Drop every partition older than ``month``; returns the months dropped."""
+    dropped = [m for m in list_partitions(connection) if m < month]
+    for old in dropped:
+        connection.execute(text(f"DROP TABLE IF EXISTS {partition_name(old)}"))
+        _ensured.discard((connection.dialect.name, old))
+    return dropped
+
+
+# ---------------------------------------------------------------- writing
+def write_batch(connection, rows):
+    """Insert audit rows into their partitions and add them to the hourly rollups."""
+    by_month = {}
+    for row in rows:
+        by_month.setdefault(month_of(row['timestamp']), []).append(row)
+    for month, month_rows in by_month.items():
+        ensure_partition(connection, month)
+        connection.execute(insert(insert_target(connection, month)), month_rows)
+
+    counts = Counter((hour_of(row['timestamp']), row['action_type']) for row in rows)
+    for (hour, action_type), count in counts.items():
+        upsert_increment(
+            connection, ActivityRollup.__table__, {"hour": hour, "action_type": action_type}, {"count": count}
+        )
+
+
+# ---------------------------------------------------------------- reading
+def _filtered(entity, user_id, action_type, since, until):
+    # Only name and role of the user are serialized. A shard alias cannot adapt the
+    # relationship's join, so there users are fetched by id in one extra query instead
+    loader = joinedload if entity is ActivityLog else selectinload
+    query = db.session.query(entity).options(loader(entity.user).load_only(User.full_name, User.role))
+    # Equality filters lead the (user_id, timestamp) and (action_type, timestamp) indexes
+    if user_id is not None:
+        query = query.filter(entity.user_id == user_id)
+    if action_type:
+        query = query.filter(entity.action_type == action_type)
+    if since:
+        query = query.filter(entity.timestamp >= since)
+    if until:
+        query = query.filter(entity.timestamp < until)
+    return query
+
+
+def _after_cursor(query, entity, cursor):
+    timestamp, before = cursor
+    return query.filter(db.or_(
+        entity.timestamp < timestamp,
+        db.and_(entity.timestamp == timestamp, entity.id < before)
+    ))
+
+
+def _shard_entity(month):
+    return aliased(ActivityLog, _shard_table(month), adapt_on_names=True)
+
+
+def encode_cursor(entry):
+    """The ``before`` value continuing after ``entry``: its timestamp and id, so no lookup is needed."""
+    return f"{entry.timestamp:{CURSOR_TIME_FORMAT}}-{entry.id}"
+
+
+def resolve_cursor(before):
+    """(timestamp, id) named by ``before``, or None if it is malformed or does not exist.
+
+    A bare id, as handed out before cursors carried the timestamp, is looked up.
+    """
+    timestamp, _, entry_id = before.partition('-')
+    if entry_id:
+        try:
+            return datetime.strptime(timestamp, CURSOR_TIME_FORMAT), int(entry_id)
+        except ValueError:
+            return None
+    try:
+        before = int(before)
+    except ValueError:
+        return None
+    if db.session.get_bind().dialect.name != 'sqlite':
+        timestamp = db.session.query(ActivityLog.timestamp).filter(ActivityLog.id == before).scalar()
+        return (timestamp, before) if timestamp is not None else None
+    months = list_partitions(db.session.connection())
+    encoded = divmod(before // SHARD_ID_BASE, 100)
+    for month in sorted(months, key=lambda m: m != encoded):
+        entity = _shard_entity(month)
+        timestamp = db.session.query(entity.timestamp).filter(entity.id == before).scalar()
+        if timestamp is not None:
+            return timestamp, before
+    return None
+
+
+def query_activity(user_id=None, action_type=None, since=None, until=None, cursor=None, limit=50):
+    """One page of audit entries matching the filters, newest first.
+
+    ``cursor`` is the (timestamp, id) of the last entry of the previous page.
+    """
+    if db.session.get_bind().dialect.name != 'sqlite':
+        # Native partitions: the timestamp bounds let the planner prune
+        query = _filtered(ActivityLog, user_id, action_type, since, until)
+        if cursor:
+            query = _after_cursor(query, ActivityLog, cursor)
+        return query.order_by(ActivityLog.timestamp.desc(), ActivityLog.id.desc()).limit(limit).all()
+
+    # Shards: walk only the months in range, newest first, until the page is full
+    newest = min(filter(None, [until, cursor and cursor[0]]), default=None)
+    entries = []
+    for month in reversed(list_partitions(db.session.connection())):
+        start, end = month_bounds(month)
+        if (newest and start > newest) or (since and end <= since):
+            continue
+        entity = _shard_entity(month)
+        query = _filtered(entity, user_id, action_type, since, until)
+        if cursor:
+            query = _after_cursor(query, entity, cursor)
+        entries.extend(query.order_by(entity.timestamp.desc(), entity.id.desc()).limit(limit - len(entries)).all())
+        if len(entries) == limit:
+            break
+    return entries
+
+
+def rollups(since, until, action_type=None):
+    query = ActivityRollup.query.filter(ActivityRollup.hour >= since, ActivityRollup.hour < until)
+    if action_type:
+        query = query.filter(ActivityRollup.action_type == action_type)
+    return query.order_by(ActivityRollup.hour, ActivityRollup.action_type).all()
+
+
+def rebuild_rollups(month):
+    """Recompute the rollups of ``month`` from its partition; returns the number of entries counted.
+
+    Safe while the activity log writers of running workers keep adding batches.
+    The rollups are locked before the partition is counted, so a batch either
+    commits before the count and is in it, or waits and is added on top of it.
+    """
+    start, end = month_bounds(month)
+    connection = db.session.connection()
+    if month not in list_partitions(connection):
+        return 0
+    table = ActivityRollup.__table__
+    if connection.dialect.name == 'postgresql':
+        # Conflicts with the writers' upserts, not with readers
+        connection.execute(text(f"LOCK TABLE {table.name} IN SHARE ROW EXCLUSIVE MODE"))
+    # On SQLite this first write takes the database's write lock, and the count below reads
+    # the snapshot it started, which no other writer can change before the commit
+    connection.execute(delete(table).where(table.c.hour >= start, table.c.hour < end))
+    source = insert_target(connection, month)
+    counts = Counter()
+    rows = connection.execute(
+        select(source.c.timestamp, source.c.action_type)
+        .where(source.c.timestamp >= start, source.c.timestamp < end)
+        .execution_options(yield_per=5000)
+    )
+    for timestamp, action_type in rows:
+        counts[(hour_of(timestamp), action_type)] += 1
+    if counts:
+        connection.execute(insert(table), [
+            {"hour": hour, "action_type": action_type, "count": count}
+            for (hour, action_type), count in counts.items()
+        ])
+    db.session.commit()
+    return sum(counts.values())
+
+
+def init_activity_partitions(app):
+    app.cli.add_command(activity_cli)
+
+
+# ------------------------------------------------------------------ CLI
+activity_cli = AppGroup('activity', help="Audit trail maintenance.")
+
+
+@activity_cli.command('prune')
+@click.option('--keep-months', type=int, help="Whole months to keep besides the current one.")
+def prune_command(keep_months):
+    """Drop activity log partitions past the retention period (rollups are kept)."""
+    keep_months = keep_months if keep_months is not None else current_app.config.get('ACTIVITY_RETENTION_MONTHS', 12)
+    oldest_kept = add_months(month_of(datetime.utcnow()), -keep_months)
+    with db.engine.begin() as connection:
+        dropped = drop_partitions_before(connection, oldest_kept)
+    click.echo(f"Dropped {len(dropped)} partition(s) older than {oldest_kept[0]:04d}-{oldest_kept[1]:02d}")
+
+
+@activity_cli.command('rebuild-rollups')
+@click.option('--month', 'month', required=True, type=click.DateTime(formats=['%Y-%m']), help="Month (UTC) to recount.")
+def rebuild_rollups_command(month):
+    """Recount the hourly rollups of one month from its partition."""
+    counted = rebuild_rollups(month_of(month))
+    click.echo(f"Rebuilt rollups from {counted} activity log entr{'y' if counted == 1 else 'ies'}")
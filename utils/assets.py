@@ -0,0 +1,151 @@
+# utils/assets.py
+"""Fingerprinted URLs and precompressed variants for files under the static folder.
+
+``asset_url("/static/avatars/x.png")`` returns ``/assets/avatars/x.<hash>.png``.
+The hash is a digest of the file's content, so the URL changes whenever the
+file does. routes/asset_routes.py can then serve it as immutable. Names the
+avatar pipeline already derives from content (``<digest>-<size>.<ext>``) are
+used as they are. Anything that is not a local static file (external image
+URLs, missing files) is returned unchanged.
+
+``flask assets compress`` writes ``.gz`` siblings, and ``.br`` ones when the
+optional ``brotli`` package is installed. The asset route serves them to
+clients that accept them.
+"""
+
+import gzip
+import hashlib
+import os
+import re
+import threading
+
+import click
+from flask import current_app
+from flask.cli import AppGroup
+
+try:
+    import brotli
+except ImportError:  # optional: only gzip variants are produced without it
+    brotli = None
+
+FINGERPRINT_LENGTH = 12
+FINGERPRINTED = re.compile(r'^(?P<stem>.+)\.(?P<fingerprint>[0-9a-f]{%d})(?P<ext>\.[A-Za-z0-9]+)$' % FINGERPRINT_LENGTH)
+CONTENT_ADDRESSED = re.compile(r'(^|/)[0-9a-f]{32}-\d+\.[A-Za-z0-9]+$')
+COMPRESSIBLE = {'.css', '.js', '.json', '.map', '.svg', '.txt', '.html', '.xml', '.ico'}
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+_fingerprints = {}
+_paths = {}
+_lock = threading.Lock()
+
+
+def fingerprint(path):
+    """Content digest of ``path``, recomputed only when its size or mtime changes."""
+    stat = os.stat(path)
+    key = (stat.st_size, stat.st_mtime_ns)
+    cached = _fingerprints.get(path)
+    if cached and cached[0] == key:
+        return cached[1]
+    digest = hashlib.sha256()
+    with open(path, 'rb') as fh:
+        for chunk in iter(lambda: fh.read(1 << 16), b''):
+            digest.update(chunk)
+    value = digest.hexdigest()[:FINGERPRINT_LENGTH]
+    with _lock:
+        _fingerprints[path] = (key, value)
+    return value
+
+
+def static_path(relative):
+    """Absolute path of ``relative`` inside the static folder, or None if it escapes it."""
+    # realpath() walks every path component; list endpoints call this once per row
+    key = (current_app.static_folder, relative)
+    if key in _paths:
+        return _paths[key]
+    root = os.path.realpath(current_app.static_folder)
+    path = os.path.realpath(os.path.join(root, relative))
+    path = path if path.startswith(root + os.sep) else None
+    with _lock:
+        if len(_paths) >= 4096:
+            _paths.clear()
+        _paths[key] = path
+    return path
+
+
+def is_immutable(relative):
+    return bool(CONTENT_ADDRESSED.search(relative))
+
+
+def asset_url(url):
+    """The long-cacheable /assets URL for a ``/static/...`` URL; anything else is returned as is."""
+    if not url or not url.startswith('/static/'):
+        return url
+    relative = url[len('/static/'):]
+    path = static_path(relative)
+    if path is None or not os.path.isfile(path):
+        return url
+    if is_immutable(relative):
+        return f"/assets/{relative}"
+    stem, ext = os.path.splitext(relative)
+    return f"/assets/{stem}.{fingerprint(path)}{ext}"
+
+
+def resolve(requested):
+    """Split a requested asset name into (static-relative path, whether it may be cached forever)."""
+    match = FINGERPRINTED.match(requested)
+    if match:
+        relative = match.group('stem') + match.group('ext')
+        path = static_path(relative)
+        current = path is not None and os.path.isfile(path) and fingerprint(path) == match.group('fingerprint')
+        return relative, current
+    return requested, is_immutable(requested)
+
+
+def precompressed(path, accept_encodings):
+    """(variant path, encoding) of the best precompressed sibling the client accepts."""
+    for encoding, suffix in ENCODINGS:
+        if accept_encodings[encoding] and os.path.isfile(path + suffix):
+            if os.stat(path + suffix).st_mtime_ns >= os.stat(path).st_mtime_ns:
+                return path + suffix, encoding
+    return path, None
+
+
+def compress_static(folder, min_size=1024):
+    """Write .gz (and .br) siblings for compressible files; returns the number written."""
+    written = 0
+    for directory, _, files in os.walk(folder):
+        for name in files:
+            path = os.path.join(directory, name)
+            if os.path.splitext(name)[1].lower() not in COMPRESSIBLE or os.path.getsize(path) < min_size:
+                continue
+            with open(path, 'rb') as fh:
+                data = fh.read()
+            variants = [('.gz', lambda raw: gzip.compress(raw, compresslevel=9, mtime=0))]
+            if brotli is not None:
+                variants.append(('.br', lambda raw: brotli.compress(raw, quality=11)))
+            for suffix, compress in variants:
+                target = path + suffix
+                if os.path.exists(target) and os.stat(target).st_mtime_ns >= os.stat(path).st_mtime_ns:
+                    continue
+                packed = compress(data)
+                if len(packed) < len(data):
+                    with open(target, 'wb') as fh:
+                        fh.write(packed)
+                    written += 1
+    return written
+
+
+def init_assets(app):
+    app.cli.add_command(assets_cli)
+
+
+# ------------------------------------------------------------------ CLI
+assets_cli = AppGroup('assets', help="Static asset maintenance.")
+
+
+@assets_cli.command('compress')
+@click.option('--min-size', default=1024, show_default=True, help="Skip files smaller than this many bytes.")
+def compress_command(min_size):
+    """Precompress static files so they can be served without compressing per request."""
+    written = compress_static(current_app.static_folder, min_size=min_size)
+    click.echo(f"Wrote {written} compressed variant(s){'' if brotli else ' (gzip only; install brotli for .br)'}")
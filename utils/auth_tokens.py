@@ -0,0 +1,217 @@
+# utils/auth_tokens.py
+"""Signed bearer tokens, an alternative to the session cookie for API clients.
+
+``POST /api/auth/token`` returns a short-lived access token and a long-lived
+refresh token. Both are HS256 JWTs. The access token carries the
+id, role, status and name claims that ``CachedUser`` exposes. The request
+loader builds ``current_user`` straight from those claims, so neither
+``admin_required`` nor the owner checks in the routes need the database, and
+any worker holding the secret can serve the request.
+
+Refresh tokens are single use: ``/api/auth/token/refresh`` revokes the one
+presented and issues a new pair. Presenting an already-rotated refresh token
+means it leaked, so every token of that user is revoked.
+
+Revocations live in ``revoked_tokens``. A row either names one token (by
+``jti``) or cuts off every token a user was issued up to a point in time.
+Changing a user's role, status or name writes such a cutoff in the same
+transaction. Each worker keeps the list in memory and reloads it every
+AUTH_REVOCATION_REFRESH seconds, which bounds how long another worker may
+accept a revoked access token.
+"""
+
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from flask import current_app
+from jose import JWTError, jwt
+from sqlalchemy import delete, insert, select
+from sqlalchemy.exc import IntegrityError
+
+from models import db, RevokedToken
+from models.user import RoleEnum
+from utils.identity_cache import CachedUser, UserSnapshot
+from utils.upsert import upsert_values
+
+ALGORITHM = 'HS256'
+
+
+class InvalidToken(Exception):
+    pass
+
+
+def _epoch(value):
+    return value.replace(tzinfo=timezone.utc).timestamp()
+
+
+def _user_key(user_id):
+    return f"user:{user_id}"
+
+
+class RevocationList:
+    def __init__(self):
+        self.enabled = False
+        self.refresh_interval = 5.0
+        self.horizon = timedelta(days=30)
+        self._tokens = frozenset()
+        self._cutoffs = {}
+        self._loaded_at = None
+        self._pruned_at = 0.0
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.enabled = app.config.get('AUTH_TOKENS_ENABLED', False)
+        self.refresh_interval = app.config.get('AUTH_REVOCATION_REFRESH', 5.0)
+        self.horizon = timedelta(seconds=app.config.get('AUTH_REFRESH_TOKEN_TTL', 30 * 86400))
+
+    def _load(self):
+        now = datetime.utcnow()
+        table = RevokedToken.__table__
+        rows = db.session.execute(
+            select(table.c.jti, table.c.revoked_at).where(table.c.expires_at > now)
+        ).all()
+        tokens, cutoffs = set(), {}
+        for jti, revoked_at in rows:
+            if jti.startswith('user:'):
+                cutoffs[jti] = _epoch(revoked_at)
+            else:
+                tokens.add(jti)
+        with self._lock:
+            self._tokens, self._cutoffs = frozenset(tokens), cutoffs
+            self._loaded_at = time.monotonic()
+
+    def expire(self):
+        """Reload on the next check; called after this worker commits a revocation."""
+        self._loaded_at = None
+
+    def _current(self):
+        if self._loaded_at is None or time.monotonic() - self._loaded_at > self.refresh_interval:
+            self._load()
+
+    def is_cut_off(self, claims):
+        """Whether every token of the user up to this one's issue time was revoked."""
+        self._current()
+        cutoff = self._cutoffs.get(_user_key(claims['sub']))
+        return cutoff is not None and claims['iat'] <= cutoff
+
+    def is_revoked(self, claims):
+        self._current()
+        return claims['jti'] in self._tokens or self.is_cut_off(claims)
+
+    # --------------------------------------------------------------- writes
+    def revoke(self, jti, user_id, expires_at):
+        """Revoke one token; returns False if it already was (the insert is the claim)."""
+        try:
+            # Own short transaction: concurrent refreshes with the same token race on this insert
+            with db.engine.begin() as connection:
+                connection.execute(
+                    insert(RevokedToken.__table__).values(
+                        jti=jti, user_id=user_id, revoked_at=datetime.utcnow(), expires_at=expires_at
+                    )
+                )
+                self._prune(connection)
+        except IntegrityError:
+            return False
+        self.expire()
+        return True
+
+    def revoke_user(self, connection, user_ids):
+        """Cut off every token issued so far to ``user_ids``."""
+        now = datetime.utcnow()
+        for user_id in user_ids:
+            upsert_values(
+                connection, RevokedToken.__table__, {"jti": _user_key(user_id)},
+                {"user_id": user_id, "revoked_at": now, "expires_at": now + self.horizon}
+            )
+        self._prune(connection)
+
+    def _prune(self, connection):
+        if time.time() - self._pruned_at > 60:
+            table = RevokedToken.__table__
+            connection.execute(delete(table).where(table.c.expires_at < datetime.utcnow()))
+            self._pruned_at = time.time()
+
+
+token_revocations = RevocationList()
+
+
+# ------------------------------------------------------------------ tokens
+def _secret():
+    return current_app.config.get('AUTH_TOKEN_SECRET') or current_app.config['SECRET_KEY']
+
+
+def _encode(claims, ttl):
+    now = time.time()
+    claims = {
+        **claims,
+        # Sub-second iat so a token issued right after a cutoff is not caught by it
+        "iat": round(now, 3),
+        "exp": int(now + ttl),
+        "jti": uuid.uuid4().hex,
+    }
+    return jwt.encode(claims, _secret(), algorithm=ALGORITHM)
+
+
+def issue_tokens(user):
+    """A fresh (access, refresh) pair for ``user`` (a ``User`` or ``CachedUser``)."""
+    access_ttl = current_app.config.get('AUTH_ACCESS_TOKEN_TTL', 900)
+    refresh_ttl = current_app.config.get('AUTH_REFRESH_TOKEN_TTL', 30 * 86400)
+    access = _encode({
+        "sub": str(user.id),
+        "type": "access",
+        "role": RoleEnum(user.role).value,
+        "status": user.status,
+        "name": user.full_name,
+    }, access_ttl)
+    refresh = _encode({"sub": str(user.id), "type": "refresh"}, refresh_ttl)
+    return {
+        "access_token": access,
+        "refresh_token": refresh,
+        "token_type": "Bearer",
+        "expires_in": access_ttl,
+    }
+
+
+def decode(token, expected_type, check_revoked=True):
+    """Verified claims of ``token``; raises InvalidToken."""
+    try:
+        claims = jwt.decode(token, _secret(), algorithms=[ALGORITHM])
+    except JWTError as e:
+        raise InvalidToken(str(e)) from None
+    if claims.get('type') != expected_type or not claims.get('jti') or not claims.get('sub'):
+        raise InvalidToken("Wrong token type")
+    if check_revoked and token_revocations.is_revoked(claims):
+        raise InvalidToken("Token has been revoked")
+    return claims
+
+
+def expires_at(claims):
+    return datetime.utcfromtimestamp(claims['exp'])
+
+
+def user_from_claims(claims):
+    return CachedUser(UserSnapshot(int(claims['sub']), RoleEnum(claims['role']), claims['status'], claims['name']))
+
+
+def bearer_token(request):
+    header = request.headers.get('Authorization', '')
+    scheme, _, token = header.partition(' ')
+    return token.strip() if scheme.lower() == 'bearer' and token.strip() else None
+
+
+def load_user_from_request(request):
+    token = bearer_token(request)
+    if token is None:
+        return None
+    try:
+        return user_from_claims(decode(token, 'access'))
+    except (InvalidToken, KeyError, ValueError):
+        return None
+
+
+def init_auth_tokens(app):
+    token_revocations.init_app(app)
+    if token_revocations.enabled:
+        app.login_manager.request_loader(load_user_from_request)
@@ -0,0 +1,141 @@
+# utils/avatars.py
+"""Avatar image pipeline.
+
+Uploads are decoded once and cropped square into each of AVATAR_SIZES. Every
+size is re-encoded as WebP with a JPEG fallback. Re-encoding drops EXIF, GPS
+and other metadata, after the EXIF orientation has been applied. Files are
+named after the SHA-256 of the upload (``<digest>-<size>.<ext>``): identical
+uploads share files and never need processing twice, and a name's content
+never changes, so it can be cached forever.
+
+Decoding and resizing are CPU-bound, so they run in a small process pool using
+the ``spawn`` start method. Forking a process that holds database connections
+and threads is not safe. The request thread only hashes the bytes and waits.
+Spawned workers re-import the main module, so scripts that run the app
+directly need the usual ``if __name__ == '__main__':`` guard.
+"""
+
+import hashlib
+import io
+import multiprocessing
+import os
+import threading
+import warnings
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+from concurrent.futures.process import BrokenProcessPool
+
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+FORMATS = (('webp', 'WEBP'), ('jpg', 'JPEG'))
+
+# Pillow warns above this many pixels and raises at twice it; render_avatar turns
+# the warning into an error, so anything larger is refused
+Image.MAX_IMAGE_PIXELS = 50_000_000
+
+
+class InvalidImage(ValueError):
+    pass
+
+
+class AvatarUnavailable(RuntimeError):
+    """The pool did not produce the avatar: it timed out or a worker died."""
+
+
+def avatar_filenames(digest, sizes):
+    return {size: {ext: f"{digest}-{size}.{ext}" for ext, _ in FORMATS} for size in sizes}
+
+
+def _write_atomic(path, data):
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, 'wb') as fh:
+        fh.write(data)
+    os.replace(tmp, path)
+
+
+def render_avatar(data, folder, digest, sizes, quality):
+    """Decode ``data`` and write every size and format into ``folder``. Runs in a pool process."""
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter('error', Image.DecompressionBombWarning)
+            image = Image.open(io.BytesIO(data))
+            # JPEG can decode straight at a reduced scale, far cheaper for large phone photos
+            image.draft('RGB', (max(sizes) * 2, max(sizes) * 2))
+            image = ImageOps.exif_transpose(image)
+            image.load()
+    except (UnidentifiedImageError, Image.DecompressionBombError, Image.DecompressionBombWarning,
+            OSError, SyntaxError) as e:
+        raise InvalidImage(str(e)) from None
+
+    image = image.convert('RGBA' if image.mode in ('RGBA', 'LA', 'P') else 'RGB')
+    for size in sorted(sizes, reverse=True):
+        image = ImageOps.fit(image, (size, size), Image.LANCZOS)
+        if image.mode == 'RGBA':
+            # JPEG has no alpha: composite onto white rather than letting transparency turn black
+            flat = Image.new('RGB', image.size, (255, 255, 255))
+            flat.paste(image, mask=image.getchannel('A'))
+        else:
+            flat = image
+        for ext, fmt in FORMATS:
+            out = io.BytesIO()
+            if fmt == 'WEBP':
+                image.save(out, fmt, quality=quality, method=4)
+            else:
+                flat.save(out, fmt, quality=quality, optimize=True, progressive=True)
+            _write_atomic(os.path.join(folder, f"{digest}-{size}.{ext}"), out.getvalue())
+    return avatar_filenames(digest, sizes)
+
+
+class AvatarProcessor:
+    def __init__(self):
+        self.folder = None
+        self.sizes = (64, 128, 256)
+        self.quality = 82
+        self.workers = 2
+        self.timeout = 30.0
+        self._executor = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.folder = app.config['UPLOAD_FOLDER']
+        self.sizes = tuple(app.config.get('AVATAR_SIZES', self.sizes))
+        self.quality = app.config.get('AVATAR_QUALITY', self.quality)
+        self.workers = app.config.get('AVATAR_WORKERS', self.workers)
+        self.timeout = app.config.get('AVATAR_TIMEOUT', self.timeout)
+        app.extensions['avatar_processor'] = self
+
+    def _pool(self):
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._executor = ProcessPoolExecutor(
+                        max_workers=self.workers,
+                        mp_context=multiprocessing.get_context('spawn')
+                    )
+                    self._pid = os.getpid()
+        return self._executor
+
+    def process(self, data):
+        """Store ``data`` as a content-addressed avatar; returns {size: {ext: filename}}."""
+        digest = hashlib.sha256(data).hexdigest()[:32]
+        names = avatar_filenames(digest, self.sizes)
+        if all(os.path.exists(os.path.join(self.folder, name)) for by_ext in names.values() for name in by_ext.values()):
+            return names  # already processed: identical upload
+        try:
+            future = self._pool().submit(render_avatar, data, self.folder, digest, self.sizes, self.quality)
+            return future.result(timeout=self.timeout)
+        except TimeoutError:
+            future.cancel()
+            raise AvatarUnavailable("Avatar processing timed out") from None
+        except BrokenProcessPool:
+            # A worker died (e.g. killed for memory); start a fresh pool on the next upload
+            with self._lock:
+                self._pid = None
+            raise AvatarUnavailable("Avatar processing failed") from None
+
+
+avatar_processor = AvatarProcessor()
+
+
+def init_avatars(app):
+    avatar_processor.init_app(app)
@@ -0,0 +1,109 @@
+# utils/conditional.py
+"""Conditional GET for read endpoints, answered without building the response.
+
+Each cacheable response depends on a few *scopes*: ``tables``, ``menu_items``,
+``users``, ``reservations:<day>`` and ``orders:user:<id>``. Whenever a change
+touches a scope, the flush listeners in models/event_listeners.py bump that
+scope's row in ``change_versions``, in the same transaction as the change.
+
+A view wrapped in ``conditional`` reads those rows by primary key in one query
+and derives a weak ETag and a Last-Modified date from them. If the client
+already holds that version, it gets ``304 Not Modified`` and the view never
+runs.
+
+The versions are read before the view queries its data. If a change commits in
+between, the ETag is older than the body, and the next request simply gets a
+full response. The reverse, a stale body under a fresh ETag, cannot happen.
+
+Writes that bypass the ORM must call ``touch`` themselves. Last-Modified only
+has one-second resolution, so If-None-Match wins when a client sends both.
+"""
+
+import hashlib
+from datetime import datetime
+from functools import wraps
+
+from flask import current_app, make_response, request
+from sqlalchemy import select
+
+from models import db, ChangeVersion
+from utils.upsert import upsert_increment
+
+TABLES = 'tables'
+MENU_ITEMS = 'menu_items'
+USERS = 'users'
+
+
+def reservations_on(day):
+    return f"reservations:{day.isoformat()}"
+
+
+def orders_of(user_id):
+    return f"orders:user:{user_id}"
+
+
+def touch(connection, scopes):
+    """Bump the versions of ``scopes`` inside the caller's transaction."""
+    now = datetime.utcnow()
+    # Always the same order, so two writers never wait on each other's rows crosswise
+    for scope in sorted(set(scopes)):
+        upsert_increment(
+            connection, ChangeVersion.__table__, {"scope": scope}, {"version": 1}, values={"changed_at": now}
+        )
+
+
+def current_version(scopes):
+    """(weak ETag, Last-Modified or None) of the data in ``scopes``."""
+    scopes = sorted(set(scopes))
+    table = ChangeVersion.__table__
+    rows = {
+        scope: (version, changed_at)
+        for scope, version, changed_at in db.session.execute(
+            select(table.c.scope, table.c.version, table.c.changed_at).where(table.c.scope.in_(scopes))
+        )
+    }
+    digest = hashlib.blake2b(digest_size=12)
+    for scope in scopes:
+        version, changed_at = rows.get(scope, (0, None))
+        digest.update(f"{scope}={version}@{changed_at};".encode())
+    # Rows that predate the counters have no date, so only a date covering every scope is usable
+    last_modified = max(changed_at for _, changed_at in rows.values()) if len(rows) == len(scopes) else None
+    return digest.hexdigest(), last_modified
+
+
+def _not_modified(etag, last_modified):
+    if request.if_none_match:
+        return request.if_none_match.contains_weak(etag)
+    if last_modified is not None and request.if_modified_since is not None:
+        return last_modified.replace(microsecond=0) <= request.if_modified_since.replace(tzinfo=None)
+    return False
+
+
+def conditional(scopes):
+    """Answer 304 while nothing in ``scopes(*args, **kwargs)`` changed.
+
+    ``scopes`` receives the view arguments and may read ``request``; returning
+    nothing serves the request unconditionally.
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            names = scopes(*args, **kwargs)
+            if not names:
+                return f(*args, **kwargs)
+            etag, last_modified = current_version(names)
+            if _not_modified(etag, last_modified):
+                response = current_app.response_class(status=304)
+            else:
+                response = make_response(f(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+            response.set_etag(etag, weak=True)
+            if last_modified is not None:
+                response.last_modified = last_modified
+            # Per-user data: browsers may keep it, but must revalidate every time
+            response.cache_control.private = True
+            response.cache_control.no_cache = True
+            return response
+        return decorated_function
+    return decorator
@@ -0,0 +1,195 @@
+# utils/db_engine.py
+"""Engine settings per database backend, picked by the scheme of the URL.
+
+SQLite (file databases)
+    The database runs in WAL mode, so readers and the writer never block each
+    other. That matters now that streamed list responses keep their read open
+    while the client downloads. ``synchronous=NORMAL`` is still safe against
+    corruption in WAL mode; a power loss can only cost the last commits.
+    Reads go through a memory map, and a busy timeout makes a connection wait
+    for the write lock instead of failing at once with ``database is locked``.
+
+    SQLite allows one writer at a time. Within a worker, a write transaction
+    first takes a process-wide lock, from its first INSERT/UPDATE/DELETE or
+    DDL statement until its commit or rollback. Threads therefore queue up in
+    turn instead of polling the database lock from SQLite's busy handler.
+    Between workers, the busy timeout still applies.
+
+PostgreSQL
+    The pool is sized for the threads that share it: the worker's gunicorn
+    threads plus the background workers (payment workers and poller, email
+    sender, audit log writer). Connections are pinged before use and recycled
+    after DB_POOL_RECYCLE seconds. Every statement runs under
+    ``statement_timeout``. If DB_MAX_CONNECTIONS is set, each of the
+    WEB_CONCURRENCY workers gets an equal share of it.
+
+Explicit SQLALCHEMY_ENGINE_OPTIONS take precedence over the profile.
+"""
+
+import logging
+import os
+import sqlite3
+import threading
+
+from sqlalchemy.engine import make_url
+
+logger = logging.getLogger(__name__)
+
+WRITE_STATEMENTS = ('INSERT', 'UPDATE', 'DELETE', 'REPLACE', 'CREATE', 'DROP', 'ALTER')
+
+_writer_locks = {}
+_registry_lock = threading.Lock()
+
+
+def _writer_lock(database):
+    with _registry_lock:
+        return _writer_locks.setdefault(os.path.realpath(database), threading.Lock())
+
+
+def _forget_writer_locks():
+    # A forked worker must not inherit a lock some thread of the parent was holding
+    global _registry_lock
+    _registry_lock = threading.Lock()
+    _writer_locks.clear()
+
+
+os.register_at_fork(after_in_child=_forget_writer_locks)
+
+
+# ----------------------------------------------------------------- SQLite
+class _WriterCursor(sqlite3.Cursor):
+    def execute(self, sql, parameters=()):
+        self.connection.before_statement(sql)
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            self.connection.after_statement()
+
+    def executemany(self, sql, seq_of_parameters):
+        self.connection.before_statement(sql)
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            self.connection.after_statement()
+
+
+class SerializedWriterConnection(sqlite3.Connection):
+    """sqlite3 connection that holds the database's writer lock for the length of a write transaction.
+
+    pysqlite opens transactions implicitly, right before the first data-modifying
+    statement, so reads never take the lock. ``pragmas`` run on every new connection.
+    """
+    pragmas = ()
+
+    def __init__(self, database, *args, **kwargs):
+        super().__init__(database, *args, **kwargs)
+        self._writer_lock = _writer_lock(database)
+        self._lock_timeout = kwargs.get('timeout', 5.0)
+        self._holds_writer_lock = False
+        for pragma in self.pragmas:
+            self.execute(f"PRAGMA {pragma}")
+
+    def cursor(self, factory=_WriterCursor):
+        return super().cursor(factory)
+
+    def before_statement(self, sql):
+        if not self._holds_writer_lock and sql.lstrip()[:7].upper().startswith(WRITE_STATEMENTS):
+            # On timeout, go ahead anyway: SQLite's own busy timeout is the last word
+            self._holds_writer_lock = self._writer_lock.acquire(timeout=self._lock_timeout)
+
+    def after_statement(self):
+        # DDL outside a transaction commits on its own; so does a write that failed to start one
+        if not self.in_transaction:
+            self._release()
+
+    def _release(self):
+        if self._holds_writer_lock:
+            self._holds_writer_lock = False
+            self._writer_lock.release()
+
+    def commit(self):
+        try:
+            super().commit()
+        finally:
+            if not self.in_transaction:
+                self._release()
+
+    def rollback(self):
+        try:
+            super().rollback()
+        finally:
+            self._release()
+
+    def close(self):
+        try:
+            super().close()
+        finally:
+            self._release()
+
+
+def _sqlite_profile(config):
+    pragmas = (
+        "journal_mode=WAL",
+        f"synchronous={config.get('SQLITE_SYNCHRONOUS', 'NORMAL')}",
+        f"mmap_size={int(config.get('SQLITE_MMAP_SIZE', 256 * 1024 * 1024))}",
+    )
+    factory = type('SQLiteConnection', (SerializedWriterConnection,), {"pragmas": pragmas})
+    return {
+        "connect_args": {"timeout": config.get('SQLITE_BUSY_TIMEOUT', 15.0), "factory": factory},
+    }
+
+
+# ------------------------------------------------------------- PostgreSQL
+def pool_limits(config):
+    """(pool_size, max_overflow) for one worker process."""
+    pool_size = config.get('DB_POOL_SIZE') or (
+        config.get('GUNICORN_THREADS', 1)
+        # payment workers and their outbox poller, the email sender and the audit log writer
+        + config.get('PAYMENT_WORKERS', 4) + 3
+    )
+    max_overflow = config.get('DB_MAX_OVERFLOW', 5)
+    budget = config.get('DB_MAX_CONNECTIONS')
+    if budget:
+        share = max(1, budget // max(1, config.get('WEB_CONCURRENCY', 1)))
+        pool_size = min(pool_size, share)
+        max_overflow = max(0, min(max_overflow, share - pool_size))
+        if pool_size + max_overflow < config.get('GUNICORN_THREADS', 1):
+            logger.warning(
+                "DB_MAX_CONNECTIONS leaves %d connections per worker for %d threads",
+                pool_size + max_overflow, config.get('GUNICORN_THREADS', 1)
+            )
+    return pool_size, max_overflow
+
+
+def _postgres_profile(config):
+    pool_size, max_overflow = pool_limits(config)
+    options = {
+        "pool_size": pool_size,
+        "max_overflow": max_overflow,
+        "pool_timeout": config.get('DB_POOL_TIMEOUT', 10.0),
+        "pool_recycle": config.get('DB_POOL_RECYCLE', 1800),
+        "pool_pre_ping": True,
+    }
+    statement_timeout = config.get('DB_STATEMENT_TIMEOUT', 30000)
+    if statement_timeout:
+        options["connect_args"] = {"options": f"-c statement_timeout={int(statement_timeout)}"}
+    return options
+
+
+def engine_profile(config):
+    """Engine options for the database at SQLALCHEMY_DATABASE_URI."""
+    url = make_url(config['SQLALCHEMY_DATABASE_URI'])
+    backend = url.get_backend_name()
+    if backend == 'sqlite' and url.database not in (None, '', ':memory:'):
+        return _sqlite_profile(config)
+    if backend == 'postgresql':
+        return _postgres_profile(config)
+    return {}
+
+
+def init_db_engine(app):
+    """Apply the profile; must run before ``db.init_app`` creates the engine."""
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+        **engine_profile(app.config),
+        **app.config.get('SQLALCHEMY_ENGINE_OPTIONS', {}),
+    }
@@ -0,0 +1,175 @@
+# utils/gateway_client.py
+
+import random
+import threading
+import time
+import uuid
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+class GatewayError(Exception):
+    """The gateway rejected the request (4xx); retrying will not help."""
+
+
+class GatewayUnavailable(GatewayError):
+    """The gateway is down, too slow, or the circuit breaker is open."""
+
+
+class CircuitBreaker:
+    """Fails fast after ``failure_threshold`` consecutive failed calls.
+
+    Once open, calls are rejected without touching the network until
+    ``reset_timeout`` seconds have passed; then a single probe call is let
+    through (half-open) and its outcome closes or re-opens the circuit.
+    """
+
+    CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half_open'
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = None
+        self._probing = False
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._state()
+
+    def _state(self):
+        if self._opened_at is None:
+            return self.CLOSED
+        if self._clock() - self._opened_at >= self.reset_timeout:
+            return self.HALF_OPEN
+        return self.OPEN
+
+    def allow(self):
+        with self._lock:
+            state = self._state()
+            if state == self.CLOSED:
+                return True
+            if state == self.HALF_OPEN and not self._probing:
+                self._probing = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._probing or self._failures >= self.failure_threshold:
+                self._opened_at = self._clock()
+            self._probing = False
+
+
+class GatewayClient:
+    """Shared HTTP client for payment gateways.
+
+    One ``requests.Session`` per client keeps connections alive across calls,
+    with a pool sized to the number of payment workers. Every call has a
+    connect/read timeout, transient failures (connection errors, timeouts, 5xx,
+    429) are retried with full-jitter exponential backoff, and repeated
+    failures open the circuit breaker so callers fail fast instead of pinning
+    workers on a degraded gateway.
+    """
+
+    RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+    def __init__(self, base_url, api_key=None, connect_timeout=3.05, read_timeout=10.0,
+                 retries=2, backoff=0.5, pool_size=10, breaker=None):
+        self.base_url = base_url.rstrip('/')
+        self.timeout = (connect_timeout, read_timeout)
+        self.retries = retries
+        self.backoff = backoff
+        self.breaker = breaker or CircuitBreaker()
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.session.headers['Accept'] = 'application/json'
+        if api_key:
+            self.session.headers['Authorization'] = f"Bearer {api_key}"
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(
+            base_url=config['PAYMENT_GATEWAY_URL'],
+            api_key=config.get('PAYMENT_GATEWAY_API_KEY'),
+            connect_timeout=config.get('PAYMENT_GATEWAY_CONNECT_TIMEOUT', 3.05),
+            read_timeout=config.get('PAYMENT_GATEWAY_READ_TIMEOUT', 10.0),
+            retries=config.get('PAYMENT_GATEWAY_RETRIES', 2),
+            backoff=config.get('PAYMENT_GATEWAY_BACKOFF', 0.5),
+            pool_size=max(config.get('PAYMENT_WORKERS', 4), 1),
+            breaker=CircuitBreaker(
+                failure_threshold=config.get('PAYMENT_GATEWAY_BREAKER_THRESHOLD', 5),
+                reset_timeout=config.get('PAYMENT_GATEWAY_BREAKER_RESET', 30.0),
+            ),
+        )
+
+    def request(self, method, path, idempotency_key=None, timeout=None, **kwargs):
+        """Send a request and return the decoded JSON body.
+
+        Non-idempotent calls (POST) are only retried when an ``idempotency_key``
+        is given, so a retried charge can never be applied twice.
+        """
+        if not self.breaker.allow():
+            raise GatewayUnavailable("Payment gateway circuit is open")
+
+        headers = kwargs.pop('headers', {})
+        if idempotency_key:
+            headers['Idempotency-Key'] = idempotency_key
+        retries = self.retries if (method.upper() == 'GET' or idempotency_key) else 0
+        url = f"{self.base_url}/{path.lstrip('/')}"
+        try:
+            return self._send(method, url, headers, retries, timeout, **kwargs)
+        except GatewayError:
+            raise
+        except Exception as e:
+            # Anything else (a broken body, invalid JSON) must settle the breaker too,
+            # or a half-open probe that raised it would keep the circuit shut for good
+            self.breaker.record_failure()
+            raise GatewayUnavailable(f"Payment gateway call failed: {e!r}") from e
+
+    def _send(self, method, url, headers, retries, timeout, **kwargs):
+        error = None
+        for attempt in range(retries + 1):
+            if attempt:
+                time.sleep(random.uniform(0, self.backoff * (2 ** (attempt - 1))))
+            try:
+                response = self.session.request(method, url, headers=headers, timeout=timeout or self.timeout, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                error = e
+                continue
+
+            if response.status_code in self.RETRY_STATUSES:
+                error = GatewayUnavailable(f"Gateway returned {response.status_code}")
+                continue
+
+            # The gateway answered; a 4xx is our problem, not a sign of degradation
+            self.breaker.record_success()
+            if response.status_code >= 400:
+                raise GatewayError(f"Gateway rejected request ({response.status_code}): {response.text[:200]}")
+            return response.json()
+
+        self.breaker.record_failure()
+        raise GatewayUnavailable(f"Payment gateway unavailable: {error}")
+
+    def get(self, path, **kwargs):
+        return self.request('GET', path, **kwargs)
+
+    def post(self, path, json=None, idempotency_key=None, **kwargs):
+        return self.request('POST', path, json=json, idempotency_key=idempotency_key or str(uuid.uuid4()), **kwargs)
+
+    def close(self):
+        self.session.close()
@@ -0,0 +1,131 @@
+# utils/gateway_stub.py
+"""Local stand-in for the payment gateway HTTP API.
+
+Run it next to the app for manual testing:
+
+    python -m utils.gateway_stub --port 8089 --latency 0.2 --error-rate 0.1
+    PAYMENT_GATEWAY=http PAYMENT_GATEWAY_URL=http://127.0.0.1:8089 flask run
+
+or start it in-process with ``start_stub_server()``.
+"""
+
+import argparse
+import json
+import random
+import string
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class GatewayStubState:
+    def __init__(self, latency=0.0, decline_rate=0.0, error_rate=0.0, pending_rate=0.0):
+        self.latency = latency
+        self.decline_rate = decline_rate
+        self.error_rate = error_rate
+        self.pending_rate = pending_rate
+        self.transactions = {}
+        self.idempotency = {}
+        self.lock = threading.Lock()
+
+    def charge(self, prefix, idempotency_key):
+        with self.lock:
+            if idempotency_key and idempotency_key in self.idempotency:
+                return self.idempotency[idempotency_key]
+
+        roll = random.random()
+        if roll < self.decline_rate:
+            status = 'failed'
+        elif roll < self.decline_rate + self.pending_rate:
+            status = 'pending'
+        else:
+            status = 'completed'
+        transaction_id = f"{prefix}_{''.join(random.choices(string.ascii_uppercase + string.digits, k=12))}"
+        result = {"transaction_id": transaction_id, "status": status}
+
+        with self.lock:
+            self.transactions[transaction_id] = result
+            if idempotency_key:
+                self.idempotency[idempotency_key] = result
+        return result
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # keep-alive, so client connection pooling is exercised
+    server_version = 'GatewayStub/1.0'
+
+    ROUTES = {'mpesa': ('payments', 'MPESA'), 'card': ('charges', 'CARD')}
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, body):
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _simulate(self):
+        state = self.server.state
+        if state.latency:
+            time.sleep(state.latency)
+        if state.error_rate and random.random() < state.error_rate:
+            self._send(503, {"error": "Gateway temporarily unavailable"})
+            return False
+        return True
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        self.rfile.read(length)
+        parts = self.path.strip('/').split('/')
+        if len(parts) != 2 or self.ROUTES.get(parts[0], (None,))[0] != parts[1]:
+            return self._send(404, {"error": "Not found"})
+        if not self._simulate():
+            return
+        prefix = self.ROUTES[parts[0]][1]
+        self._send(200, self.server.state.charge(prefix, self.headers.get('Idempotency-Key')))
+
+    def do_GET(self):
+        parts = self.path.strip('/').split('/')
+        if len(parts) != 3 or self.ROUTES.get(parts[0], (None,))[0] != parts[1]:
+            return self._send(404, {"error": "Not found"})
+        if not self._simulate():
+            return
+        result = self.server.state.transactions.get(parts[2])
+        if result is None:
+            return self._send(404, {"error": "Unknown transaction"})
+        self._send(200, result)
+
+
+def start_stub_server(host='127.0.0.1', port=0, **options):
+    """Start the stub on a background thread. Returns ``(server, base_url)``.
+
+    ``port=0`` picks a free port; call ``server.shutdown()`` when done.
+    """
+    server = ThreadingHTTPServer((host, port), _Handler)
+    server.daemon_threads = True
+    server.state = GatewayStubState(**options)
+    threading.Thread(target=server.serve_forever, name='gateway-stub', daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}"
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8089)
+    parser.add_argument('--latency', type=float, default=0.0, help="seconds added to every call")
+    parser.add_argument('--decline-rate', type=float, default=0.0, help="share of charges declined")
+    parser.add_argument('--pending-rate', type=float, default=0.0, help="share of charges left pending")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="share of calls answered with 503")
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer((args.host, args.port), _Handler)
+    server.daemon_threads = True
+    server.state = GatewayStubState(args.latency, args.decline_rate, args.error_rate, args.pending_rate)
+    print(f"Gateway stub listening on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
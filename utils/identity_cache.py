@@ -0,0 +1,150 @@
+# utils/identity_cache.py
+"""Process-local cache of the authenticated user's identity.
+
+``load_user`` runs on every authenticated request. It returns a ``CachedUser``
+built from an immutable ``UserSnapshot`` (id, role, status, full_name) held in
+a bounded TTL/LRU cache. The full ``User`` row is loaded only when a route
+touches something else.
+
+Commits that change a user's role, status or name invalidate the entry in this
+worker (models/event_listeners.py) and bump a stamp file. Every worker on the
+host checks the stamp before trusting its cache and flushes it when the stamp
+has moved. Workers on other hosts fall back to IDENTITY_CACHE_TTL.
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+from flask_login import UserMixin
+from sqlalchemy import select
+
+from models import db, User
+
+UserSnapshot = namedtuple('UserSnapshot', ['id', 'role', 'status', 'full_name'])
+
+
+class CachedUser(UserMixin):
+    """``current_user`` backed by a snapshot, loading the ``User`` row on first use.
+
+    Reads of anything outside the snapshot fall through to the model. Writes and
+    ``db.session.delete`` must go through ``model`` explicitly.
+    """
+
+    def __init__(self, snapshot):
+        object.__setattr__(self, '_snapshot', snapshot)
+        object.__setattr__(self, '_model', None)
+
+    id = property(lambda self: self._snapshot.id)
+    role = property(lambda self: self._snapshot.role)
+    status = property(lambda self: self._snapshot.status)
+    full_name = property(lambda self: self._snapshot.full_name)
+
+    @property
+    def model(self):
+        """The ``User`` row in the current session, loaded on first access."""
+        if self._model is None:
+            object.__setattr__(self, '_model', db.session.get(User, self._snapshot.id))
+        return self._model
+
+    def __getattr__(self, name):
+        return getattr(self.model, name)
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"CachedUser is read-only; set {name!r} on current_user.model")
+
+    def __repr__(self):
+        return f"<CachedUser {self._snapshot.id} {self._snapshot.role.value}>"
+
+
+class IdentityCache:
+    def __init__(self, ttl=30.0, max_entries=10000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.stamp_path = None
+        self._stamp = None
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.ttl = app.config.get('IDENTITY_CACHE_TTL', 30.0)
+        self.max_entries = app.config.get('IDENTITY_CACHE_SIZE', 10000)
+        self.stamp_path = app.config.get('IDENTITY_STAMP_FILE') or os.path.join(app.instance_path, 'identity-stamp')
+        os.makedirs(os.path.dirname(self.stamp_path), exist_ok=True)
+        self._stamp = self._read_stamp()
+
+    # ------------------------------------------------------------ stamp file
+    def _read_stamp(self):
+        try:
+            stat = os.stat(self.stamp_path)
+        except (FileNotFoundError, TypeError):
+            return None
+        return stat.st_size, stat.st_mtime_ns
+
+    def _bump_stamp(self):
+        fd = os.open(self.stamp_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            if os.fstat(fd).st_size >= 4096:
+                os.ftruncate(fd, 0)
+            os.write(fd, b'.')
+        finally:
+            os.close(fd)
+
+    def _check_stamp(self):
+        stamp = self._read_stamp()
+        if stamp != self._stamp:
+            with self._lock:
+                self._entries.clear()
+                self._stamp = stamp
+
+    # ----------------------------------------------------------------- cache
+    def get(self, user_id):
+        self._check_stamp()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return None
+            snapshot, expires = entry
+            if expires < time.monotonic():
+                del self._entries[user_id]
+                return None
+            self._entries.move_to_end(user_id)
+            return snapshot
+
+    def set(self, user_id, snapshot):
+        with self._lock:
+            self._entries[user_id] = (snapshot, time.monotonic() + self.ttl)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_ids):
+        """Forget ``user_ids`` here and tell the other workers to flush their caches."""
+        if not user_ids:
+            return
+        with self._lock:
+            for user_id in user_ids:
+                self._entries.pop(user_id, None)
+        if self.stamp_path:
+            self._bump_stamp()
+
+    def load(self, user_id):
+        """The ``CachedUser`` for ``user_id``, or None if there is no such user."""
+        snapshot = self.get(user_id)
+        if snapshot is None:
+            row = db.session.execute(
+                select(User.id, User.role, User.status, User.full_name).where(User.id == user_id)
+            ).first()
+            if row is None:
+                return None
+            snapshot = UserSnapshot(*row)
+            self.set(user_id, snapshot)
+        return CachedUser(snapshot)
+
+
+identity_cache = IdentityCache()
+
+
+def init_identity_cache(app):
+    identity_cache.init_app(app)
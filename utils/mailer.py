@@ -0,0 +1,253 @@
+# utils/mailer.py
+"""Background delivery of the email outbox.
+
+Requests only insert ``EmailOutbox`` rows; ``EmailSender`` drains them in
+batches over a single authenticated SMTP session that is reused until it has
+been idle for SMTP_IDLE_TIMEOUT seconds. The sender thread starts with the app
+and polls every EMAIL_POLL_INTERVAL seconds, so retries and any backlog left by
+a restart go out without waiting for new mail; commits wake it early.
+
+For local testing point SMTP_SERVER at a stand-in such as
+``python -m aiosmtpd -n -l localhost:8025`` with SMTP_USE_TLS=false;
+benchmarks/email_delivery.py runs the sender against one in-process.
+"""
+
+import os
+import random
+import smtplib
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+
+import click
+from flask.cli import AppGroup
+
+from models import db, EmailOutbox
+from utils.notification_digest import queue_due_digests
+
+
+class EmailSender:
+    def __init__(self, app=None):
+        self.app = None
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stop = threading.Event()
+        self._smtp = None
+        self._smtp_last_used = 0.0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        app.extensions['email_sender'] = self
+        app.cli.add_command(email_cli)
+        if app.config.get('EMAIL_SENDER_ENABLED', True):
+            # Poll from the start, and again in every worker forked after this;
+            # not under `flask <command>`, where the outbox table may not exist yet
+            if click.get_current_context(silent=True) is None:
+                self._ensure_started()
+            app.before_request(self._ensure_started)
+
+    # ---------------------------------------------------------------- thread
+    def _ensure_started(self):
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='email-sender', daemon=True)
+            self._thread.start()
+            self._pid = os.getpid()
+
+    def wake(self):
+        """Signal that new rows were committed to the outbox."""
+        if not self.app.config.get('EMAIL_SENDER_ENABLED', True):
+            return  # a standalone `flask email worker` drains the outbox
+        self._ensure_started()
+        self._wakeup.set()
+
+    def shutdown(self):
+        self._stop.set()
+        self._wakeup.set()
+
+    def _run(self):
+        interval = self.app.config.get('EMAIL_POLL_INTERVAL', 10)
+        while not self._stop.is_set():
+            self._wakeup.wait(interval)
+            self._wakeup.clear()
+            try:
+                self.drain()
+            except Exception:
+                self.app.logger.exception("Email outbox drain failed")
+            self._close_if_idle()
+        self._disconnect()
+
+    # ------------------------------------------------------------------ SMTP
+    def _connect(self):
+        config = self.app.config
+        smtp = smtplib.SMTP(config['SMTP_SERVER'], config.get('SMTP_PORT', 587), timeout=config.get('SMTP_TIMEOUT', 10))
+        if config.get('SMTP_USE_TLS', True):
+            smtp.starttls()
+        if config.get('SMTP_USER') and config.get('SMTP_PASSWORD'):
+            smtp.login(config['SMTP_USER'], config['SMTP_PASSWORD'])
+        return smtp
+
+    def _connection(self):
+        """The open SMTP session, reconnecting only when it has gone away."""
+        if self._smtp is not None and time.monotonic() - self._smtp_last_used > self.app.config.get('SMTP_NOOP_AFTER', 30):
+            try:
+                if self._smtp.noop()[0] != 250:
+                    self._disconnect()
+            except smtplib.SMTPException:
+                self._disconnect()
+        if self._smtp is None:
+            self._smtp = self._connect()
+        self._smtp_last_used = time.monotonic()
+        return self._smtp
+
+    def _disconnect(self):
+        if self._smtp is not None:
+            try:
+                self._smtp.quit()
+            except Exception:
+                pass
+            self._smtp = None
+
+    def _close_if_idle(self):
+        if self._smtp is not None and time.monotonic() - self._smtp_last_used > self.app.config.get('SMTP_IDLE_TIMEOUT', 60):
+            self._disconnect()
+
+    def _send(self, email):
+        msg = MIMEMultipart()
+        msg['From'] = self.app.config.get('MAIL_DEFAULT_SENDER', 'notifications@yourapp.com')
+        msg['To'] = email.recipient_email
+        msg['Subject'] = email.subject
+        msg.attach(MIMEText(email.html_body, 'html'))
+        try:
+            self._connection().send_message(msg)
+        except smtplib.SMTPServerDisconnected:
+            # The server dropped an idle session; reconnect once and retry
+            self._smtp = None
+            self._connection().send_message(msg)
+
+    # ---------------------------------------------------------------- outbox
+    def _claim(self, batch_size):
+        now = datetime.utcnow()
+        lease = timedelta(seconds=self.app.config.get('EMAIL_SENDING_LEASE', 300))
+        EmailOutbox.query.filter(
+            EmailOutbox.status == 'sending',
+            EmailOutbox.claimed_at < now - lease
+        ).update({"status": "pending", "lease_token": None}, synchronize_session=False)
+
+        due = (
+            db.session.query(EmailOutbox.id)
+            .filter(EmailOutbox.status == 'pending', EmailOutbox.next_attempt_at <= now)
+            .order_by(EmailOutbox.next_attempt_at)
+            .limit(batch_size)
+            .subquery()
+        )
+        token = str(uuid.uuid4())
+        EmailOutbox.query.filter(
+            EmailOutbox.id.in_(db.select(due.c.id)),
+            EmailOutbox.status == 'pending'
+        ).update({"status": "sending", "lease_token": token, "claimed_at": now}, synchronize_session=False)
+        db.session.commit()
+        return EmailOutbox.query.filter_by(lease_token=token, status='sending').order_by(EmailOutbox.id).all()
+
+    def _record_failure(self, email, error, permanent=False):
+        email.attempts += 1
+        email.last_error = str(error)
+        email.lease_token = None
+        if permanent or email.attempts >= self.app.config.get('EMAIL_MAX_ATTEMPTS', 5):
+            email.status = 'failed'
+            self.app.logger.error(f"Giving up on email {email.id} to {email.recipient_email}: {error}")
+        else:
+            backoff = self.app.config.get('EMAIL_RETRY_BACKOFF', 30) * (2 ** (email.attempts - 1))
+            email.status = 'pending'
+            email.next_attempt_at = datetime.utcnow() + timedelta(seconds=backoff * random.uniform(0.5, 1.5))
+
+    def send_batch(self, batch_size=None):
+        """Send one claimed batch. Returns the number of emails claimed."""
+        batch = self._claim(batch_size or self.app.config.get('EMAIL_BATCH_SIZE', 50))
+        if not batch:
+            return 0
+
+        for index, email in enumerate(batch):
+            try:
+                self._send(email)
+            except (smtplib.SMTPRecipientsRefused, smtplib.SMTPSenderRefused) as e:
+                self._record_failure(email, e, permanent=True)
+            except smtplib.SMTPResponseException as e:
+                self._record_failure(email, e, permanent=e.smtp_code >= 500)
+            except (smtplib.SMTPException, OSError) as e:
+                # Connection-level failure: back off the rest of the batch too
+                self._disconnect()
+                for remaining in batch[index:]:
+                    self._record_failure(remaining, e)
+                break
+            else:
+                email.status = 'sent'
+                email.sent_at = datetime.utcnow()
+                email.lease_token = None
+        db.session.commit()
+        return len(batch)
+
+    def drain(self):
+        """Queue closed digests, then send every due email. Returns the number of emails processed."""
+        processed = 0
+        batch_size = self.app.config.get('EMAIL_BATCH_SIZE', 50)
+        with self.app.app_context():
+            if not self.app.config.get('SMTP_SERVER'):
+                return 0
+            try:
+                queue_due_digests()
+            except Exception:
+                db.session.rollback()
+                raise
+            while True:
+                try:
+                    count = self.send_batch(batch_size)
+                except Exception:
+                    db.session.rollback()
+                    raise
+                processed += count
+                if count < batch_size:
+                    return processed
+
+
+email_sender = EmailSender()
+
+
+def init_email_sender(app):
+    email_sender.init_app(app)
+
+
+# ------------------------------------------------------------------ CLI
+email_cli = AppGroup('email', help="Email outbox delivery.")
+
+
+@email_cli.command('drain')
+def drain_command():
+    """Send all due emails and exit."""
+    click.echo(f"Processed {email_sender.drain()} email(s)")
+
+
+@email_cli.command('worker')
+@click.option('--interval', default=5.0, show_default=True, help="Seconds between outbox polls.")
+def worker_command(interval):
+    """Run a standalone email sender until interrupted."""
+    click.echo("Email worker started")
+    try:
+        while True:
+            if not email_sender.drain():
+                email_sender._close_if_idle()
+                time.sleep(interval)
+    except KeyboardInterrupt:
+        email_sender._disconnect()
+        click.echo("Email worker stopped")
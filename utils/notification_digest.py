@@ -0,0 +1,138 @@
+# utils/notification_digest.py
+"""Digest emails for low-priority notifications.
+
+Notifications below NOTIFICATION_DIGEST_BELOW_PRIORITY are not emailed one by
+one. They only set the recipient's ``digest_due_at``, the end of the current
+window. When that passes, one email covering the user's unread low-priority
+notifications since ``digested_through`` goes into the email outbox. Nothing is
+tracked per notification.
+
+The default threshold is 0, so notifications of the default priority 0 are
+still emailed at once. Only senders that opt in with a negative priority, such
+as ``LOW_PRIORITY``, are digested.
+Due digests are queued by the email sender on each poll (``EmailSender.drain``),
+so they go out even when no other email is sent.
+"""
+
+from datetime import datetime, timedelta
+
+from flask import current_app
+from jinja2 import Environment, select_autoescape
+from sqlalchemy import select, true, update
+
+from models import db, EmailOutbox, Notification, NotificationInbox, User
+from utils.unread_counters import unread_criteria
+from utils.upsert import upsert_fill
+
+# Compiled once at import; rendering a digest is then a plain function call
+_jinja = Environment(autoescape=select_autoescape(default=True, default_for_string=True))
+DIGEST_TEMPLATE = _jinja.from_string("""
+<html>
+    <body>
+        <h2>Hi {{ name }}, you have {{ total }} new notification{{ 's' if total != 1 }}</h2>
+        <ul>
+        {% for n in notifications %}
+            <li>
+                <strong>{{ n.title }}</strong> <small>{{ n.created_at.strftime('%Y-%m-%d %H:%M') }}</small><br>
+                {{ n.message }}
+                {% if n.action_url %}<br><a href="{{ n.action_url }}">View in app</a>{% endif %}
+            </li>
+        {% endfor %}
+        </ul>
+        {% if total > notifications|length %}<p>and {{ total - notifications|length }} more in the app.</p>{% endif %}
+    </body>
+</html>
+""")
+
+MAX_ITEMS = 50
+LOW_PRIORITY = -1  # below the default of 0: opts a notification into the digest
+
+
+def is_digested(priority):
+    """Whether a notification of ``priority`` waits for the digest instead of emailing now."""
+    config = current_app.config
+    if not config.get('NOTIFICATION_DIGEST_INTERVAL', 3600):
+        return False
+    return int(priority or 0) < config.get('NOTIFICATION_DIGEST_BELOW_PRIORITY', 0)
+
+
+def _due_at(now):
+    return now + timedelta(seconds=current_app.config.get('NOTIFICATION_DIGEST_INTERVAL', 3600))
+
+
+def schedule_digest(user_id, now=None, session=None):
+    """Make sure the user has a digest scheduled; an open window is left as is."""
+    session = session or db.session
+    upsert_fill(
+        session.connection(), NotificationInbox.__table__, {"user_id": user_id},
+        {"digest_due_at": _due_at(now or datetime.utcnow())}
+    )
+
+
+def schedule_digests_for(audience, now=None, session=None):
+    """``schedule_digest`` for every opted-in user matching ``audience``, in one UPDATE.
+
+    Broadcasts call this after ``increment_unread_for``, so the inbox rows exist.
+    """
+    session = session or db.session
+    recipients = select(User.id).where(audience, User.email_notifications == true())
+    session.execute(
+        update(NotificationInbox)
+        .where(NotificationInbox.user_id.in_(recipients), NotificationInbox.digest_due_at.is_(None))
+        .values(digest_due_at=_due_at(now or datetime.utcnow()))
+        .execution_options(synchronize_session=False)
+    )
+
+
+def render_digest(name, notifications, total):
+    subject = f"{total} new notification{'s' if total != 1 else ''}"
+    return subject, DIGEST_TEMPLATE.render(name=name, notifications=notifications, total=total)
+
+
+def queue_due_digests(now=None, batch_size=100):
+    """Queue one email per user whose digest window has closed. Returns the number queued."""
+    now = now or datetime.utcnow()
+    below = current_app.config.get('NOTIFICATION_DIGEST_BELOW_PRIORITY', 0)
+    queued = 0
+    while True:
+        due = db.session.execute(
+            select(NotificationInbox, User.email, User.full_name, User.email_notifications)
+            .join(User, User.id == NotificationInbox.user_id)
+            .where(NotificationInbox.digest_due_at <= now)
+            .order_by(NotificationInbox.digest_due_at)
+            .limit(batch_size)
+        ).all()
+        if not due:
+            return queued
+
+        for inbox, email, name, wants_email in due:
+            # Close the window first; if another worker got there, skip the user
+            claimed = db.session.execute(
+                update(NotificationInbox)
+                .where(NotificationInbox.user_id == inbox.user_id, NotificationInbox.digest_due_at == inbox.digest_due_at)
+                .values(digest_due_at=None, digested_through=now)
+                .execution_options(synchronize_session=False)
+            ).rowcount
+            if not claimed or not wants_email or not email:
+                continue
+
+            pending = Notification.query.filter(
+                Notification.recipient_id == inbox.user_id,
+                Notification.priority < below,
+                Notification.created_at <= now,
+                Notification.expires_at > now,
+                unread_criteria(inbox.last_read_at)
+            )
+            if inbox.digested_through is not None:
+                pending = pending.filter(Notification.created_at > inbox.digested_through)
+            total = pending.count()
+            if not total:
+                continue  # everything was read in the app already
+            notifications = pending.order_by(Notification.created_at.desc()).limit(MAX_ITEMS).all()
+            subject, html = render_digest(name, notifications, total)
+            db.session.add(EmailOutbox(recipient_email=email, subject=subject, html_body=html))
+            queued += 1
+
+        db.session.commit()
+        if len(due) < batch_size:
+            return queued
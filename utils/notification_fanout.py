@@ -0,0 +1,99 @@
+# utils/notification_fanout.py
+
+from datetime import datetime, time, timedelta
+
+from flask import current_app
+from sqlalchemy import and_, exists, insert, literal, select, true
+
+from models import db, Notification, EmailOutbox, User, Reservation
+from models.user import RoleEnum
+from utils.notification_digest import is_digested, schedule_digests_for
+from utils.unread_counters import increment_unread_for
+
+
+def _reservations_tonight(now):
+    """Customers holding a live reservation between now and midnight (UTC)."""
+    midnight = datetime.combine(now.date() + timedelta(days=1), time.min)
+    return exists().where(
+        Reservation.user_id == User.id,
+        Reservation.status.in_(["pending", "confirmed"]),
+        Reservation.reservation_time >= now,
+        Reservation.reservation_time < midnight
+    )
+
+
+# Named audience segments; each returns a filter over User
+SEGMENTS = {
+    "reservations_tonight": _reservations_tonight,
+}
+
+
+def audience_filter(roles=None, segment=None, now=None):
+    """Build the WHERE clause selecting active users in any of ``roles`` and/or ``segment``."""
+    now = now or datetime.utcnow()
+    criteria = [User.status == "active"]
+    if roles:
+        criteria.append(User.role.in_([RoleEnum(role) for role in roles]))
+    if segment:
+        criteria.append(SEGMENTS[segment](now))
+    return and_(*criteria)
+
+
+def broadcast(sender_id, title, message, roles=None, segment=None, type='app', priority=0, action_url=None):
+    """Fan a notification out to an audience with set-based INSERT ... SELECT statements.
+
+    One statement writes every Notification row, one more queues the emails for
+    recipients who opted in (or schedules their digests, for low priorities);
+    nothing is loaded into Python per recipient. The
+    caller commits. Returns the number of notifications created.
+    """
+    now = datetime.utcnow()
+    audience = audience_filter(roles, segment, now)
+    expires_at = now + timedelta(days=7)
+
+    notifications = select(
+        User.id,
+        literal(sender_id, db.Integer),
+        literal(title, db.String),
+        literal(message, db.Text),
+        literal(type, db.String),
+        literal(False, db.Boolean),
+        literal(priority, db.Integer),
+        literal(now, db.DateTime),
+        literal(expires_at, db.DateTime),
+        literal(action_url, db.String)
+    ).where(audience)
+    result = db.session.execute(
+        insert(Notification).from_select(
+            ['recipient_id', 'sender_id', 'title', 'message', 'type', 'is_read',
+             'priority', 'created_at', 'expires_at', 'action_url'],
+            notifications
+        )
+    )
+    created = result.rowcount
+    if created:
+        increment_unread_for(audience)
+
+    if created and current_app.config.get('SMTP_SERVER') and is_digested(priority):
+        # Low priority: recipients get it in their next digest instead
+        schedule_digests_for(audience, now)
+    elif created and current_app.config.get('SMTP_SERVER'):
+        # The body is identical for everyone, so render it once
+        subject, html = Notification(title=title, message=message, action_url=action_url, created_at=now).render_email()
+        emails = select(
+            User.email,
+            literal(subject, db.String),
+            literal(html, db.Text),
+            literal('pending', db.String),
+            literal(0, db.Integer),
+            literal(now, db.DateTime),
+            literal(now, db.DateTime)
+        ).where(audience, User.email_notifications == true(), User.email.isnot(None))
+        db.session.execute(
+            insert(EmailOutbox).from_select(
+                ['recipient_email', 'subject', 'html_body', 'status', 'attempts', 'next_attempt_at', 'created_at'],
+                emails
+            )
+        )
+
+    return created
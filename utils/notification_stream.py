@@ -0,0 +1,209 @@
+# utils/notification_stream.py
+"""Push delivery of notification changes to connected clients.
+
+Each worker process keeps a registry of open streams per user. Commits that
+change a user's notifications publish that user's id on a cross-worker
+signal: Postgres ``LISTEN/NOTIFY`` when the database is Postgres, otherwise an
+append-only signal file that every worker tails (SQLite deployments on one
+host). A listener thread per worker wakes only the affected streams.
+
+Streams hold a request thread for their lifetime, so gunicorn.conf.py runs
+threaded workers (gthread, GUNICORN_THREADS each); gevent works too. On sync
+workers the stream endpoint answers 503 instead of blocking the worker.
+"""
+
+import os
+import select
+import threading
+from collections import defaultdict
+
+from sqlalchemy import text
+
+from models import db
+from utils.unread_counters import unread_cache
+
+CHANNEL = 'dineflow_notifications'
+EVERYONE = '*'
+
+
+class Subscription:
+    def __init__(self, user_id):
+        self.user_id = user_id
+        self._event = threading.Event()
+
+    def notify(self):
+        self._event.set()
+
+    def wait(self, timeout):
+        """Block until woken or ``timeout``; True when there is something new."""
+        woken = self._event.wait(timeout)
+        self._event.clear()
+        return woken
+
+
+class PostgresSignal:
+    """Cross-worker signal over Postgres LISTEN/NOTIFY."""
+
+    def __init__(self, app):
+        self.app = app
+
+    def publish(self, payload):
+        with db.engine.connect() as connection:
+            connection.execute(text("SELECT pg_notify(:channel, :payload)"), {"channel": CHANNEL, "payload": payload})
+            connection.commit()
+
+    def listen(self, deliver, stop):
+        # A dedicated connection, taken out of the pool for good
+        connection = db.engine.raw_connection()
+        connection.detach()
+        dbapi = connection.driver_connection
+        dbapi.autocommit = True
+        with dbapi.cursor() as cursor:
+            cursor.execute(f"LISTEN {CHANNEL}")
+        try:
+            while not stop.is_set():
+                if select.select([dbapi], [], [], 5.0) == ([], [], []):
+                    continue
+                dbapi.poll()
+                while dbapi.notifies:
+                    deliver(dbapi.notifies.pop(0).payload)
+        finally:
+            connection.close()
+
+
+class FileSignal:
+    """Cross-worker signal through an append-only file, for single-host SQLite setups."""
+
+    MAX_SIZE = 1024 * 1024
+
+    def __init__(self, app):
+        self.path = app.config.get('NOTIFICATION_SIGNAL_FILE') or os.path.join(app.instance_path, 'notification-signal.log')
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self.interval = app.config.get('NOTIFICATION_SIGNAL_POLL_INTERVAL', 0.25)
+
+    def publish(self, payload):
+        fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            if os.fstat(fd).st_size > self.MAX_SIZE:
+                os.ftruncate(fd, 0)  # listeners see the file shrink and wake everyone
+            os.write(fd, f"{payload}\n".encode())
+        finally:
+            os.close(fd)
+
+    def listen(self, deliver, stop):
+        offset = os.path.getsize(self.path) if os.path.exists(self.path) else 0
+        while not stop.wait(self.interval):
+            try:
+                size = os.path.getsize(self.path)
+            except FileNotFoundError:
+                continue
+            if size < offset:
+                offset = 0
+                deliver(EVERYONE)
+            if size == offset:
+                continue
+            with open(self.path, 'rb') as fh:
+                fh.seek(offset)
+                chunk = fh.read(size - offset)
+            # Only consume complete lines; a partial write is picked up next round
+            complete = chunk.rfind(b'\n') + 1
+            offset += complete
+            for line in chunk[:complete].decode().splitlines():
+                deliver(line)
+
+
+class NotificationHub:
+    def __init__(self):
+        self.app = None
+        self.backend = None
+        self._subscribers = defaultdict(set)
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._pid = None
+
+    def init_app(self, app):
+        self.app = app
+        backend = app.config.get('NOTIFICATION_STREAM_BACKEND', 'auto')
+        if backend == 'auto':
+            backend = 'postgres' if app.config['SQLALCHEMY_DATABASE_URI'].startswith('postgresql') else 'file'
+        self.backend = {'postgres': PostgresSignal, 'file': FileSignal}[backend](app) if backend != 'none' else None
+
+    # ---------------------------------------------------------- subscribers
+    def subscribe(self, user_id):
+        self._ensure_listening()
+        subscription = Subscription(user_id)
+        with self._lock:
+            self._subscribers[user_id].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.user_id)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[subscription.user_id]
+
+    def _wake(self, user_ids):
+        with self._lock:
+            if user_ids is None:
+                targets = [s for subs in self._subscribers.values() for s in subs]
+            else:
+                targets = [s for user_id in user_ids for s in self._subscribers.get(user_id, ())]
+        for subscription in targets:
+            subscription.notify()
+
+    # --------------------------------------------------------------- signal
+    def publish(self, user_ids=None):
+        """Announce committed changes for ``user_ids`` (None: everyone) to all workers."""
+        if self.backend is None:
+            self._wake(user_ids)
+            return
+        if user_ids is None:
+            payloads = [EVERYONE]
+        else:
+            # Stay well inside Postgres' 8000-byte NOTIFY payload limit
+            ids = sorted(str(user_id) for user_id in user_ids)
+            payloads = [','.join(ids[i:i + 500]) for i in range(0, len(ids), 500)]
+        try:
+            for payload in payloads:
+                self.backend.publish(payload)
+        except Exception:
+            self.app.logger.exception("Failed to publish notification signal")
+            self._wake(user_ids)
+
+    def _deliver(self, payload):
+        if payload == EVERYONE:
+            unread_cache.invalidate()
+            self._wake(None)
+            return
+        user_ids = [int(part) for part in payload.split(',') if part]
+        unread_cache.invalidate(user_ids)  # other workers' writes, so drop our cached badges
+        self._wake(user_ids)
+
+    def _ensure_listening(self):
+        if self.backend is None or self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._stop.clear()
+            threading.Thread(target=self._listen, name='notification-listener', daemon=True).start()
+            self._pid = os.getpid()
+
+    def _listen(self):
+        while not self._stop.is_set():
+            try:
+                with self.app.app_context():
+                    self.backend.listen(self._deliver, self._stop)
+            except Exception:
+                self.app.logger.exception("Notification listener failed; restarting")
+                self._wake(None)  # streams re-check rather than miss anything
+                self._stop.wait(2.0)
+
+
+notification_hub = NotificationHub()
+
+
+def init_notification_stream(app):
+    notification_hub.init_app(app)
@@ -0,0 +1,28 @@
+# utils/paging.py
+"""Keyset paging shared by the list endpoints.
+
+A page is requested with ``?limit=`` and ``?before=<cursor>``, where the cursor
+names the last item of the previous page, usually by its id. A full page
+carries the next cursor in the ``X-Next-Before`` header. A shorter page is the
+last one.
+"""
+
+from flask import jsonify, request
+
+NEXT_PAGE_HEADER = 'X-Next-Before'
+
+
+def page_limit(default, maximum):
+    """``?limit=`` clamped to 1..``maximum``; ``default`` when absent or not a number."""
+    return max(1, min(request.args.get('limit', default, type=int), maximum))
+
+
+def page_response(items, limit, serialize, cursor=None):
+    """JSON list of ``items``, pointing at the next page when this one is full.
+
+    ``cursor(item)`` gives the ``before`` value after ``item``; by default its id.
+    """
+    response = jsonify([serialize(item) for item in items])
+    if items and len(items) == limit:
+        response.headers[NEXT_PAGE_HEADER] = str(cursor(items[-1]) if cursor else items[-1].id)
+    return response
@@ -0,0 +1,126 @@
+# utils/passwords.py
+"""Password hashing policy and a bounded hashing executor.
+
+PASSWORD_HASH_SCHEME selects how new hashes are made: ``bcrypt`` with
+PASSWORD_BCRYPT_ROUNDS, or ``werkzeug`` with PASSWORD_WERKZEUG_METHOD.
+Existing hashes of either kind keep verifying. ``needs_rehash`` reports hashes
+made under different settings, so login can upgrade them in place.
+
+Hashing is deliberately slow, so it runs on a small pool of PASSWORD_HASH_WORKERS
+threads. bcrypt and hashlib release the GIL, so hashes run in parallel while
+the request thread waits. At most PASSWORD_HASH_MAX_PENDING hashes may be
+running or queued. Beyond that ``HashingBusy`` is raised straight away, so a
+login burst is shed with a 503 instead of pinning every worker. A hash still
+waiting after PASSWORD_HASH_TIMEOUT seconds raises ``HashingBusy`` too.
+"""
+
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+
+import bcrypt
+from flask import current_app
+from werkzeug.security import check_password_hash, generate_password_hash
+
+
+class HashingBusy(Exception):
+    """Raised when the hashing executor is at its admission limit."""
+
+
+def _is_bcrypt(password_hash):
+    return password_hash.startswith(('$2a$', '$2b$', '$2y$'))
+
+
+def _hash(password, scheme, rounds, method):
+    if scheme == 'bcrypt':
+        return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(rounds)).decode('ascii')
+    return generate_password_hash(password, method=method)
+
+
+def _verify(password_hash, password):
+    if _is_bcrypt(password_hash):
+        return bcrypt.checkpw(password.encode('utf-8'), password_hash.encode('ascii'))
+    return check_password_hash(password_hash, password)
+
+
+class PasswordHasher:
+    def __init__(self, workers=4, max_pending=32):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.timeout = 30.0
+        self._executor = None
+        self._slots = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.workers = app.config.get('PASSWORD_HASH_WORKERS', 4)
+        self.max_pending = app.config.get('PASSWORD_HASH_MAX_PENDING', 32)
+        self.timeout = app.config.get('PASSWORD_HASH_TIMEOUT', 30.0)
+        self._pid = None
+        app.extensions['password_hasher'] = self
+
+    def _ensure_started(self):
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='password-hash')
+            self._slots = threading.BoundedSemaphore(self.max_pending)
+            self._pid = os.getpid()
+
+    def run(self, fn, *args):
+        """Run ``fn(*args)`` on the hashing pool and wait for the result."""
+        self._ensure_started()
+        if not self._slots.acquire(blocking=False):
+            raise HashingBusy("Too many password hashes in progress")
+        try:
+            future = self._executor.submit(fn, *args)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        try:
+            return future.result(timeout=self.timeout)
+        except TimeoutError:
+            # Queued behind a saturated pool; the hash keeps its slot until it finishes
+            future.cancel()
+            raise HashingBusy("Password hashing timed out") from None
+
+
+password_hasher = PasswordHasher()
+
+
+def init_password_hasher(app):
+    password_hasher.init_app(app)
+
+
+# ---------------------------------------------------------------- policy
+def hash_password(password):
+    """Hash ``password`` under the configured policy."""
+    config = current_app.config
+    return password_hasher.run(
+        _hash, password,
+        config.get('PASSWORD_HASH_SCHEME', 'bcrypt'),
+        config.get('PASSWORD_BCRYPT_ROUNDS', 12),
+        config.get('PASSWORD_WERKZEUG_METHOD', 'scrypt')
+    )
+
+
+def verify_password(password_hash, password):
+    if not password_hash:
+        return False
+    return password_hasher.run(_verify, password_hash, password)
+
+
+def needs_rehash(password_hash):
+    """Whether ``password_hash`` was made under settings other than the current policy."""
+    config = current_app.config
+    if config.get('PASSWORD_HASH_SCHEME', 'bcrypt') == 'bcrypt':
+        if not _is_bcrypt(password_hash):
+            return True
+        return int(password_hash.split('$')[2]) != config.get('PASSWORD_BCRYPT_ROUNDS', 12)
+    if _is_bcrypt(password_hash):
+        return True
+    return not password_hash.startswith(config.get('PASSWORD_WERKZEUG_METHOD', 'scrypt'))
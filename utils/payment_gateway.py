@@ -0,0 +1,169 @@
+# utils/payment_gateway.py
+
+import random
+import string
+import time
+
+from utils.gateway_client import GatewayClient
+
+# Methods that are settled through an external gateway. Cash is settled at the till.
+GATEWAY_METHODS = ('mpesa', 'credit_card', 'debit_card')
+
+
+class PaymentGateway:
+    """Base class for payment gateways.
+
+    ``charge`` runs in a background worker, never inside a request. It must set
+    ``payment.transaction_id`` and return True on success, False on a decline,
+    or None when the outcome will be reported later through the callback endpoint.
+    Transient errors (timeouts, connection failures) should be raised so the
+    outbox can retry the payment.
+    """
+
+    name = None
+
+    @classmethod
+    def from_config(cls, config):
+        return cls()
+
+    def charge(self, payment):
+        raise NotImplementedError
+
+    def verify(self, method, transaction_id):
+        raise NotImplementedError
+
+
+class SimulatedGateway(PaymentGateway):
+    """Local gateway for development and testing.
+
+    ``latency`` is the simulated round-trip in seconds and ``failure_rate`` the
+    probability (0..1) that a charge is declined.
+    """
+
+    name = 'simulated'
+
+    def __init__(self, latency=0.0, failure_rate=0.0):
+        self.latency = latency
+        self.failure_rate = failure_rate
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(
+            latency=config.get('PAYMENT_GATEWAY_LATENCY', 0.0),
+            failure_rate=config.get('PAYMENT_GATEWAY_FAILURE_RATE', 0.0),
+        )
+
+    def charge(self, payment):
+        if self.latency:
+            time.sleep(self.latency)
+        if self.failure_rate and random.random() < self.failure_rate:
+            return False
+
+        if payment.method == 'mpesa':
+            payment.transaction_id = f"MPESA_{random.randint(100000, 999999)}"
+        elif payment.method in ('credit_card', 'debit_card'):
+            payment.transaction_id = f"CARD_{''.join(random.choices(string.ascii_uppercase + string.digits, k=12))}"
+        else:
+            return False
+        return True
+
+    def verify(self, method, transaction_id):
+        return bool(transaction_id)
+
+
+# Gateway statuses mapped to charge outcomes; pending results arrive via the callback
+_CHARGE_OUTCOMES = {'completed': True, 'failed': False, 'pending': None}
+
+
+def process_mpesa_payment(client, payment):
+    """Request an M-Pesa payment and record the gateway transaction ID"""
+    result = client.post(
+        '/mpesa/payments',
+        json={"reference": str(payment.id), "amount": payment.amount},
+        idempotency_key=f"payment-{payment.id}"
+    )
+    payment.transaction_id = result.get('transaction_id')
+    return _CHARGE_OUTCOMES.get(result.get('status'), False)
+
+
+def process_card_payment(client, payment):
+    """Charge a card and record the gateway transaction ID"""
+    result = client.post(
+        '/card/charges',
+        json={"reference": str(payment.id), "amount": payment.amount, "method": payment.method},
+        idempotency_key=f"payment-{payment.id}"
+    )
+    payment.transaction_id = result.get('transaction_id')
+    return _CHARGE_OUTCOMES.get(result.get('status'), False)
+
+
+def verify_mpesa_payment(client, transaction_id):
+    return client.get(f'/mpesa/payments/{transaction_id}').get('status') == 'completed'
+
+
+def verify_card_payment(client, transaction_id):
+    return client.get(f'/card/charges/{transaction_id}').get('status') == 'completed'
+
+
+class HttpGateway(PaymentGateway):
+    """Real gateway over HTTP, built on the shared pooled GatewayClient."""
+
+    name = 'http'
+
+    def __init__(self, client):
+        self.client = client
+
+    @classmethod
+    def from_config(cls, config):
+        if not config.get('PAYMENT_GATEWAY_URL'):
+            raise RuntimeError("PAYMENT_GATEWAY_URL is required for the http payment gateway")
+        return cls(GatewayClient.from_config(config))
+
+    def charge(self, payment):
+        if payment.method == 'mpesa':
+            return process_mpesa_payment(self.client, payment)
+        return process_card_payment(self.client, payment)
+
+    def verify(self, method, transaction_id):
+        if not transaction_id:
+            return False
+        if method == 'mpesa':
+            return verify_mpesa_payment(self.client, transaction_id)
+        return verify_card_payment(self.client, transaction_id)
+
+
+GATEWAYS = {
+    SimulatedGateway.name: SimulatedGateway,
+    HttpGateway.name: HttpGateway,
+}
+
+_gateway = None
+
+
+def register_gateway(name, gateway_cls):
+    """Make a gateway class selectable through the PAYMENT_GATEWAY setting."""
+    GATEWAYS[name] = gateway_cls
+
+
+def init_gateway(app):
+    global _gateway
+    name = app.config.get('PAYMENT_GATEWAY', SimulatedGateway.name)
+    if name not in GATEWAYS:
+        raise RuntimeError(f"Unknown payment gateway: {name}")
+    _gateway = GATEWAYS[name].from_config(app.config)
+    return _gateway
+
+
+def get_gateway():
+    if _gateway is None:
+        raise RuntimeError("Payment gateway is not initialised; call init_gateway(app)")
+    return _gateway
+
+
+def process_payment(payment):
+    """Process payment through the configured gateway"""
+    if payment.method == 'cash':
+        return True  # Cash payments always succeed
+    if payment.method not in GATEWAY_METHODS:
+        return False
+    return get_gateway().charge(payment)
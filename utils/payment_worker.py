@@ -0,0 +1,244 @@
+# utils/payment_worker.py
+
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+import click
+from flask.cli import AppGroup
+
+from models import db, Payment, PaymentOutbox
+from utils.gateway_client import GatewayError, GatewayUnavailable
+from utils.payment_gateway import process_payment
+
+
+def apply_payment_result(payment, success, confirm_order=False):
+    """Record a gateway outcome on the payment (and its order, for checkout payments).
+
+    ``success`` is True/False for a settled charge; None means the gateway accepted
+    the charge and will report the outcome through the callback endpoint.
+    """
+    if success is None:
+        return
+    if success:
+        payment.status = 'completed'
+        payment.paid_at = datetime.utcnow()
+    else:
+        payment.status = 'failed'
+
+    if confirm_order and payment.order:
+        payment.order.status = 'confirmed' if success else 'payment_failed'
+
+
+class PaymentProcessor:
+    """Drains the payment outbox on a per-process worker pool.
+
+    Requests only insert a ``pending`` payment plus its outbox row and call
+    ``submit``; the gateway round-trip happens here. A poller thread re-submits
+    rows that were never picked up (e.g. the process died mid-flight), so the
+    outbox is the source of truth and the in-memory queue is only a fast path.
+    """
+
+    def __init__(self, app=None):
+        self.app = None
+        self._executor = None
+        self._poller = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        app.extensions['payment_processor'] = self
+        app.cli.add_command(payments_cli)
+        # Recovery must not wait for the next payment: poll the outbox from the start,
+        # and again in every worker forked after this (cheap once started). Not under
+        # `flask <command>`, e.g. `flask db upgrade`, where the tables may not exist yet
+        if click.get_current_context(silent=True) is None:
+            self._ensure_started()
+        app.before_request(self._ensure_started)
+
+    # ------------------------------------------------------------------ pool
+    def _ensure_started(self):
+        # Pools and threads do not survive a fork, so (re)create them per process.
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            workers = self.app.config.get('PAYMENT_WORKERS', 4)
+            self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='payment-worker') if workers else None
+            self._stop.clear()
+            interval = self.app.config.get('PAYMENT_OUTBOX_POLL_INTERVAL', 5)
+            if interval and self._executor:
+                self._poller = threading.Thread(target=self._poll_loop, args=(interval,), name='payment-outbox-poller', daemon=True)
+                self._poller.start()
+            self._pid = os.getpid()
+
+    def submit(self, outbox_id):
+        """Hand a committed outbox row to the pool. Runs inline when PAYMENT_WORKERS is 0."""
+        self._ensure_started()
+        if self._executor is None:
+            self.process(outbox_id)
+        else:
+            self._executor.submit(self.process, outbox_id)
+
+    def shutdown(self, wait=True):
+        self._stop.set()
+        if self._executor:
+            self._executor.shutdown(wait=wait)
+        self._pid = None
+
+    # ------------------------------------------------------------ processing
+    def process(self, outbox_id):
+        with self.app.app_context():
+            try:
+                self._process(outbox_id)
+            except Exception:
+                db.session.rollback()
+                self.app.logger.exception(f"Payment outbox entry {outbox_id} crashed")
+
+    def _process(self, outbox_id):
+        # Claim the row atomically so a poller and a direct submit never double-charge.
+        claimed = PaymentOutbox.query.filter_by(id=outbox_id, status='pending').update(
+            {"status": "processing", "attempts": PaymentOutbox.attempts + 1, "updated_at": datetime.utcnow()},
+            synchronize_session=False
+        )
+        db.session.commit()
+        if not claimed:
+            return
+
+        outbox = db.session.get(PaymentOutbox, outbox_id)
+        payment = db.session.get(Payment, outbox.payment_id)
+        if payment is None or payment.status != 'pending':
+            outbox.status = 'done'
+            db.session.commit()
+            return
+
+        # Release the connection for the duration of the gateway round-trip.
+        db.session.expunge(payment)
+        db.session.rollback()
+
+        try:
+            success = process_payment(payment)
+        except GatewayUnavailable as e:
+            self._schedule_retry(outbox_id, e)
+            return
+        except GatewayError as e:
+            # The gateway rejected the charge (4xx); the same request will be rejected again
+            self._schedule_retry(outbox_id, e, permanent=True)
+            return
+        except Exception as e:
+            self._schedule_retry(outbox_id, e)
+            return
+
+        payment = db.session.merge(payment)
+        outbox = db.session.get(PaymentOutbox, outbox_id)
+        apply_payment_result(payment, success, confirm_order=outbox.confirm_order)
+        outbox.status = 'done'
+        outbox.last_error = None
+        db.session.commit()
+
+    def _schedule_retry(self, outbox_id, error, permanent=False):
+        outbox = db.session.get(PaymentOutbox, outbox_id)
+        outbox.last_error = str(error)
+        max_attempts = self.app.config.get('PAYMENT_MAX_ATTEMPTS', 3)
+        if permanent or outbox.attempts >= max_attempts:
+            outbox.status = 'failed'
+            apply_payment_result(outbox.payment, False, confirm_order=outbox.confirm_order)
+            self.app.logger.error(f"Payment {outbox.payment_id} failed after {outbox.attempts} attempts: {error}")
+        else:
+            backoff = self.app.config.get('PAYMENT_RETRY_BACKOFF', 2.0) * (2 ** (outbox.attempts - 1))
+            outbox.status = 'pending'
+            outbox.available_at = datetime.utcnow() + timedelta(seconds=random.uniform(0, backoff))
+            self.app.logger.warning(f"Payment {outbox.payment_id} attempt {outbox.attempts} failed: {error}")
+        db.session.commit()
+
+    # ---------------------------------------------------------------- polling
+    def due_entries(self, limit=100):
+        """Ids of outbox rows that are ready to run, re-queueing stale claims first."""
+        now = datetime.utcnow()
+        lease = timedelta(seconds=self.app.config.get('PAYMENT_PROCESSING_LEASE', 300))
+        PaymentOutbox.query.filter(
+            PaymentOutbox.status == 'processing',
+            PaymentOutbox.updated_at < now - lease
+        ).update({"status": "pending"}, synchronize_session=False)
+        db.session.commit()
+
+        rows = (
+            db.session.query(PaymentOutbox.id)
+            .filter(PaymentOutbox.status == 'pending', PaymentOutbox.available_at <= now)
+            .order_by(PaymentOutbox.available_at)
+            .limit(limit)
+            .all()
+        )
+        db.session.rollback()
+        return [row.id for row in rows]
+
+    def _poll_loop(self, interval):
+        while not self._stop.wait(interval):
+            try:
+                with self.app.app_context():
+                    ids = self.due_entries()
+                for outbox_id in ids:
+                    self._executor.submit(self.process, outbox_id)
+            except Exception:
+                self.app.logger.exception("Payment outbox poll failed")
+
+    def drain(self):
+        """Process every due entry synchronously. Returns the number of entries run."""
+        processed = 0
+        while True:
+            with self.app.app_context():
+                ids = self.due_entries()
+            if not ids:
+                return processed
+            for outbox_id in ids:
+                self.process(outbox_id)
+                processed += 1
+
+
+payment_processor = PaymentProcessor()
+
+
+def init_payment_processor(app):
+    payment_processor.init_app(app)
+
+
+def enqueue_payment(payment, confirm_order=False):
+    """Stage the outbox row for a new pending payment in the current session.
+
+    Call ``payment_processor.submit(outbox.id)`` once the transaction commits.
+    """
+    outbox = PaymentOutbox(payment=payment, confirm_order=confirm_order)
+    db.session.add(outbox)
+    return outbox
+
+
+# ------------------------------------------------------------------ CLI
+payments_cli = AppGroup('payments', help="Payment outbox maintenance.")
+
+
+@payments_cli.command('drain')
+def drain_command():
+    """Process all due payment outbox entries and exit."""
+    processed = payment_processor.drain()
+    click.echo(f"Processed {processed} payment(s)")
+
+
+@payments_cli.command('worker')
+@click.option('--interval', default=2.0, show_default=True, help="Seconds between outbox polls.")
+def worker_command(interval):
+    """Run a standalone outbox worker until interrupted."""
+    click.echo("Payment worker started")
+    try:
+        while True:
+            if not payment_processor.drain():
+                time.sleep(interval)
+    except KeyboardInterrupt:
+        click.echo("Payment worker stopped")
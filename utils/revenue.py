@@ -0,0 +1,119 @@
+# utils/revenue.py
+
+from datetime import datetime, time, timedelta
+
+import click
+from flask.cli import AppGroup
+from sqlalchemy import func, insert, select, text
+
+from models import db, Payment, RevenueRollup
+
+_SUMMED = ('amount', 'tip_amount', 'tax_amount', 'discount')
+
+
+def _day_bounds(start, end):
+    return datetime.combine(start, time.min), datetime.combine(end + timedelta(days=1), time.min)
+
+
+def _completed_payments_grouped(start, end):
+    """SELECT of completed payment totals grouped by day/method/cashier for [start, end]."""
+    lower, upper = _day_bounds(start, end)
+    day = func.date(Payment.paid_at)
+    method = func.coalesce(Payment.method, 'unknown')
+    return (
+        select(
+            day.label('day'),
+            method.label('method'),
+            Payment.cashier_id,
+            func.count(Payment.id).label('payment_count'),
+            *[func.coalesce(func.sum(getattr(Payment, name)), 0.0).label(name) for name in _SUMMED]
+        )
+        .where(Payment.status == 'completed', Payment.paid_at >= lower, Payment.paid_at < upper)
+        .group_by(day, method, Payment.cashier_id)
+    )
+
+
+def rebuild_rollups(start, end):
+    """Recompute rollups for [start, end] from raw payments in one transaction.
+
+    Payments settled meanwhile are neither lost nor counted twice: the rollups
+    are locked before the payments are read, so a settling transaction either
+    commits first and is in the recount, or waits and adds on top of it.
+    """
+    table = RevenueRollup.__table__
+    if db.session.get_bind().dialect.name == 'postgresql':
+        # Conflicts with the flush listener's upserts, not with readers
+        db.session.execute(text(f"LOCK TABLE {table.name} IN SHARE ROW EXCLUSIVE MODE"))
+    # On SQLite this first write takes the write lock, and INSERT ... SELECT reads behind it
+    db.session.execute(table.delete().where(table.c.day >= start, table.c.day <= end))
+    columns = ['day', 'method', 'cashier_id', 'payment_count', *_SUMMED]
+    result = db.session.execute(
+        insert(table).from_select(columns, _completed_payments_grouped(start, end))
+    )
+    db.session.commit()
+    return result.rowcount
+
+
+def _row_to_dict(row):
+    """One report row, from a rollup or a live aggregate alike; sums rounded to cents."""
+    day = row.day if isinstance(row.day, str) else row.day.isoformat()
+    return {
+        "day": day,
+        "method": row.method,
+        "cashier_id": row.cashier_id,
+        "payment_count": row.payment_count,
+        **{name: round(getattr(row, name) or 0.0, 2) for name in _SUMMED}
+    }
+
+
+def daily_report(start, end, today=None):
+    """Revenue per day/method/cashier for [start, end].
+
+    Closed days come from the rollup table; only the current (open) day is
+    aggregated from raw payments.
+    """
+    today = today or datetime.utcnow().date()
+    rows = []
+
+    closed_end = min(end, today - timedelta(days=1))
+    if start <= closed_end:
+        rollups = (
+            RevenueRollup.query
+            .filter(RevenueRollup.day >= start, RevenueRollup.day <= closed_end, RevenueRollup.payment_count != 0)
+            .order_by(RevenueRollup.day, RevenueRollup.method, RevenueRollup.cashier_id)
+        )
+        rows.extend(_row_to_dict(r) for r in rollups)
+
+    if start <= today <= end:
+        live = db.session.execute(_completed_payments_grouped(today, today))
+        rows.extend(sorted((_row_to_dict(r) for r in live), key=lambda r: (r["method"], r["cashier_id"])))
+
+    return rows
+
+
+# ------------------------------------------------------------------ CLI
+revenue_cli = AppGroup('revenue', help="Revenue rollup maintenance.")
+
+
+@revenue_cli.command('rebuild')
+@click.option('--start', 'start', required=True, type=click.DateTime(formats=['%Y-%m-%d']), help="First day (UTC).")
+@click.option('--end', 'end', type=click.DateTime(formats=['%Y-%m-%d']), help="Last day (UTC), defaults to --start.")
+def rebuild_command(start, end):
+    """Rebuild revenue rollups from raw payments, e.g. after a backfill."""
+    start = start.date()
+    end = end.date() if end else start
+    if end < start:
+        raise click.BadParameter("--end must not be before --start")
+
+    # Rebuild in monthly chunks so a long backfill never holds one huge transaction
+    current = start
+    total = 0
+    while current <= end:
+        chunk_end = min(end, (current.replace(day=28) + timedelta(days=4)).replace(day=1) - timedelta(days=1))
+        total += rebuild_rollups(current, chunk_end)
+        current = chunk_end + timedelta(days=1)
+    click.echo(f"Rebuilt {total} rollup row(s) for {start} .. {end}")
+
+
+def init_revenue(app):
+    app.cli.add_command(revenue_cli)
@@ -0,0 +1,197 @@
+# utils/serialization.py
+"""JSON encoding for API responses.
+
+``FastJSONProvider`` replaces Flask's JSON provider, so every ``jsonify`` in
+every blueprint encodes with orjson when it is installed, and with the stdlib
+``json`` module otherwise. The output means the same either way. Keys stay
+sorted, dates keep Flask's HTTP-date format, and debug mode still
+pretty-prints.
+
+List endpoints go further with compiled serializers. ``compile_serializer``
+turns a field spec into a function that reads attributes through
+``operator.attrgetter`` and leaves datetimes as they are. ``json_response``
+then writes them as ISO 8601 in C: the same text ``isoformat()`` gives, without
+a Python call per value. Keys keep the order of the spec.
+
+Lists that can grow without bound go through ``streamed_json_response``
+instead. It reads the query ``yield_per`` rows at a time and sends the array
+one batch after another. If the client accepts it, the stream is compressed on
+the fly with brotli (when the optional ``brotli`` package is installed) or
+gzip. The worker never holds more than one batch of rows or of JSON, whatever
+the size of the result.
+"""
+
+import json
+import zlib
+from datetime import date, datetime
+from operator import attrgetter
+
+from flask import current_app, request, stream_with_context
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # optional: falls back to the stdlib encoder
+    orjson = None
+
+try:
+    import brotli
+except ImportError:  # optional: streams are gzip-compressed without it
+    brotli = None
+
+_PROVIDER_OPTIONS = (
+    orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS | orjson.OPT_SORT_KEYS if orjson else 0
+)
+_RESPONSE_OPTIONS = orjson.OPT_NON_STR_KEYS if orjson else 0
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """Flask's provider with orjson underneath; behaves like the default one."""
+
+    def _fast(self, kwargs=None):
+        if orjson is None or kwargs or not self.sort_keys:
+            return False
+        return self.compact or (self.compact is None and not self._app.debug)
+
+    def dumps(self, obj, **kwargs):
+        if not self._fast(kwargs):
+            return super().dumps(obj, **kwargs)
+        return orjson.dumps(obj, default=self.default, option=_PROVIDER_OPTIONS).decode()
+
+    def response(self, *args, **kwargs):
+        if not self._fast():
+            return super().response(*args, **kwargs)
+        obj = self._prepare_response_obj(args, kwargs)
+        body = orjson.dumps(obj, default=self.default, option=_PROVIDER_OPTIONS | orjson.OPT_APPEND_NEWLINE)
+        return self._app.response_class(body, mimetype=self.mimetype)
+
+
+# ------------------------------------------------------------ serializers
+def _iso(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return current_app.json.default(value)
+
+
+def dumps(payload):
+    """``payload`` as JSON bytes; datetimes become ISO 8601 strings."""
+    if isinstance(current_app.json, FastJSONProvider) and orjson is not None:
+        return orjson.dumps(payload, default=current_app.json.default, option=_RESPONSE_OPTIONS)
+    return json.dumps(payload, default=_iso, separators=(',', ':')).encode()
+
+
+def json_response(payload, status=200, headers=None):
+    return current_app.response_class(dumps(payload), status=status, headers=headers, mimetype='application/json')
+
+
+def optional(path):
+    """``path`` (dotted), or None as soon as any step along it is None."""
+    steps = path.split('.')
+
+    def get(obj):
+        for step in steps:
+            if obj is None:
+                return None
+            obj = getattr(obj, step)
+        return obj
+    return get
+
+
+def nested(attribute, serializer):
+    """The related object through ``serializer``, or None."""
+    get = attrgetter(attribute)
+
+    def serialize_nested(obj):
+        value = get(obj)
+        return serializer(value) if value is not None else None
+    return serialize_nested
+
+
+def many(attribute, serializer, where=None):
+    """Every related object through ``serializer``, optionally only those matching ``where``."""
+    get = attrgetter(attribute)
+    if where is None:
+        return lambda obj: [serializer(value) for value in get(obj)]
+    return lambda obj: [serializer(value) for value in get(obj) if where(value)]
+
+
+def compile_serializer(fields):
+    """A function turning one object into a JSON-ready dict.
+
+    ``fields`` maps each output key to an attribute name, or to a callable
+    taking the object (``optional``, ``nested``, ``many`` or any function).
+    """
+    keys = tuple(fields)
+    getters = tuple(attrgetter(spec) if isinstance(spec, str) else spec for spec in fields.values())
+
+    def serialize(obj):
+        return dict(zip(keys, [get(obj) for get in getters]))
+    return serialize
+
+
+# -------------------------------------------------------------- streaming
+class _BrotliStream:
+    def __init__(self, quality):
+        self._compressor = brotli.Compressor(quality=quality)
+
+    def compress(self, data):
+        return self._compressor.process(data)
+
+    def flush(self):
+        return self._compressor.finish()
+
+
+def _compressor(accept_encodings):
+    """(content coding, compressor) for the best coding the client accepts, or (None, None)."""
+    config = current_app.config
+    if not config.get('RESPONSE_COMPRESSION', True):
+        return None, None
+    if brotli is not None and accept_encodings['br']:
+        return 'br', _BrotliStream(config.get('RESPONSE_BROTLI_QUALITY', 4))
+    if accept_encodings['gzip']:
+        return 'gzip', zlib.compressobj(config.get('RESPONSE_GZIP_LEVEL', 6), zlib.DEFLATED, 31)
+    return None, None
+
+
+def _json_array(rows, serializer, batch_size):
+    separator = b'['
+    batch = []
+    for row in rows:
+        batch.append(dumps(serializer(row)))
+        if len(batch) == batch_size:
+            yield separator + b','.join(batch)
+            separator, batch = b',', []
+    if batch:
+        yield separator + b','.join(batch)
+        separator = b','
+    yield b']' if separator == b',' else b'[]'
+
+
+def _compressed(chunks, compressor):
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def streamed_json_response(query, serializer):
+    """``query`` as a JSON array of ``serializer`` output, streamed and compressed per Accept-Encoding.
+
+    The query runs here, so database errors still surface in the view; rows are
+    fetched STREAM_BATCH_SIZE at a time while the body is sent. Eager loads
+    must be ``selectinload`` or many-to-one ``joinedload``.
+    """
+    batch_size = current_app.config.get('STREAM_BATCH_SIZE', 500)
+    chunks = _json_array(iter(query.yield_per(batch_size)), serializer, batch_size)
+    headers = {"Vary": "Accept-Encoding"}
+    encoding, compressor = _compressor(request.accept_encodings)
+    if compressor is not None:
+        chunks = _compressed(chunks, compressor)
+        headers["Content-Encoding"] = encoding
+    return current_app.response_class(stream_with_context(chunks), headers=headers, mimetype='application/json')
+
+
+def init_serialization(app):
+    if app.config.get('JSON_SERIALIZER', 'auto') != 'stdlib':
+        app.json = FastJSONProvider(app)
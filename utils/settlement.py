@@ -0,0 +1,274 @@
+# utils/settlement.py
+
+import csv
+import heapq
+import os
+import sys
+import tempfile
+from collections import Counter
+from datetime import datetime, time, timedelta
+from itertools import groupby
+from operator import itemgetter
+
+import click
+from flask.cli import AppGroup
+from sqlalchemy import select, update
+
+from models import db, Order, Payment
+from utils.conditional import orders_of, touch
+from utils.payment_gateway import GATEWAY_METHODS
+
+# Amounts closer than this are treated as equal (floats, cents)
+AMOUNT_TOLERANCE = 0.005
+
+_key = itemgetter(0)
+
+
+# --------------------------------------------------------- statement side
+def _read_statement(path, id_column, amount_column, on_invalid=None):
+    """Yield ``(transaction_id, amount, line_number)`` from a gateway CSV export.
+
+    Rows whose amount does not parse are skipped and passed to
+    ``on_invalid(transaction_id, raw_amount, line_number)``.
+    """
+    with open(path, newline='') as fh:
+        reader = csv.DictReader(fh)
+        missing = {id_column, amount_column} - set(reader.fieldnames or ())
+        if missing:
+            raise click.UsageError(f"Statement is missing column(s): {', '.join(sorted(missing))}")
+        for row in reader:
+            transaction_id = (row[id_column] or '').strip()
+            if not transaction_id:
+                continue
+            try:
+                amount = float(row[amount_column])
+            except (TypeError, ValueError):
+                if on_invalid:
+                    on_invalid(transaction_id, row[amount_column], reader.line_num)
+                continue
+            yield transaction_id, amount, reader.line_num
+
+
+def _is_sorted(rows):
+    previous = None
+    for row in rows:
+        if previous is not None and row[0] < previous:
+            return False
+        previous = row[0]
+    return True
+
+
+def _spill(chunk, tmpdir):
+    chunk.sort(key=_key)
+    fd, path = tempfile.mkstemp(suffix='.csv', dir=tmpdir)
+    with os.fdopen(fd, 'w', newline='') as fh:
+        csv.writer(fh).writerows(chunk)
+    return path
+
+
+def _read_spill(path):
+    with open(path, newline='') as fh:
+        for transaction_id, amount, line in csv.reader(fh):
+            yield transaction_id, float(amount), int(line)
+
+
+def sorted_statement(path, id_column, amount_column, chunk_size=50000, on_invalid=None):
+    """Stream statement rows ordered by transaction id with bounded memory.
+
+    Exports that are already sorted are streamed as-is; otherwise the file is
+    sorted externally in ``chunk_size`` runs and merged back with a heap.
+    ``on_invalid`` is called once per row with an unparseable amount.
+    """
+    if _is_sorted(_read_statement(path, id_column, amount_column)):
+        yield from _read_statement(path, id_column, amount_column, on_invalid)
+        return
+
+    with tempfile.TemporaryDirectory(prefix='settlement-') as tmpdir:
+        runs, chunk = [], []
+        for row in _read_statement(path, id_column, amount_column, on_invalid):
+            chunk.append(row)
+            if len(chunk) >= chunk_size:
+                runs.append(_spill(chunk, tmpdir))
+                chunk = []
+        if chunk:
+            runs.append(_spill(chunk, tmpdir))
+        yield from heapq.merge(*[_read_spill(run) for run in runs], key=_key)
+
+
+# ---------------------------------------------------------------- DB side
+def day_payments(day, batch_size=1000):
+    """Stream ``(transaction_id, payment_id, amount, status)`` tuples for one UTC day.
+
+    Plain column rows from a server-side cursor; no ORM objects are built.
+    """
+    lower = datetime.combine(day, time.min)
+    transaction_id = Payment.transaction_id
+    if db.engine.dialect.name == 'postgresql':
+        # Byte order, so the database sorts exactly like Python compares strings
+        transaction_id = transaction_id.collate('C')
+
+    stmt = (
+        select(Payment.transaction_id, Payment.id, Payment.amount, Payment.status)
+        .where(
+            Payment.method.in_(GATEWAY_METHODS),
+            Payment.transaction_id.isnot(None),
+            Payment.paid_at >= lower,
+            Payment.paid_at < lower + timedelta(days=1)
+        )
+        .order_by(transaction_id)
+    )
+    result = db.session.execute(stmt.execution_options(stream_results=True))
+    for row in result.yield_per(batch_size):
+        yield tuple(row)
+
+
+# -------------------------------------------------------------- reconcile
+class _StatusWriter:
+    """Buffers payment ids per verification status and writes them in batches."""
+
+    def __init__(self, batch_size):
+        self.batch_size = batch_size
+        self.pending = {}
+        self.verified_at = datetime.utcnow()
+
+    def add(self, payment_id, status):
+        ids = self.pending.setdefault(status, [])
+        ids.append(payment_id)
+        if len(ids) >= self.batch_size:
+            self._write(status, ids)
+            self.pending[status] = []
+
+    def _write(self, status, ids):
+        db.session.execute(
+            update(Payment)
+            .where(Payment.id.in_(ids))
+            .values(verification_status=status, verified_at=self.verified_at)
+            .execution_options(synchronize_session=False)
+        )
+        # Bypasses the flush listeners; payments are served inside their owners' orders
+        owners = db.session.execute(
+            select(Order.user_id).join(Payment, Payment.order_id == Order.id).where(Payment.id.in_(ids)).distinct()
+        ).scalars()
+        touch(db.session.connection(), [orders_of(user_id) for user_id in owners if user_id is not None])
+
+    def flush(self):
+        for status, ids in self.pending.items():
+            if ids:
+                self._write(status, ids)
+        self.pending = {}
+
+
+def reconcile(db_rows, statement_rows, on_issue, mark=None):
+    """Merge-join two streams sorted by transaction id.
+
+    ``on_issue(kind, transaction_id, db_amount, statement_amount)`` receives every
+    discrepancy; ``mark(payment_id, status)`` receives every payment's outcome.
+    Returns a Counter of outcomes.
+    """
+    counts = Counter()
+    mark = mark or (lambda payment_id, status: None)
+    db_groups = groupby(db_rows, key=_key)
+    st_groups = groupby(statement_rows, key=_key)
+    db_next = next(db_groups, None)
+    st_next = next(st_groups, None)
+
+    while db_next or st_next:
+        if st_next is None or (db_next and db_next[0] < st_next[0]):
+            transaction_id, payments = db_next[0], list(db_next[1])
+            for _, payment_id, amount, _status in payments:
+                on_issue('missing_in_statement', transaction_id, amount, None)
+                mark(payment_id, 'missing')
+            counts['missing_in_statement'] += len(payments)
+            db_next = next(db_groups, None)
+            continue
+
+        if db_next is None or st_next[0] < db_next[0]:
+            transaction_id, entries = st_next[0], list(st_next[1])
+            for _, amount, _line in entries:
+                on_issue('missing_in_db', transaction_id, None, amount)
+            counts['missing_in_db'] += len(entries)
+            st_next = next(st_groups, None)
+            continue
+
+        transaction_id = db_next[0]
+        payments, entries = list(db_next[1]), list(st_next[1])
+        db_next, st_next = next(db_groups, None), next(st_groups, None)
+
+        if len(payments) > 1 or len(entries) > 1:
+            kind = 'duplicate_in_db' if len(payments) > 1 else 'duplicate_in_statement'
+            on_issue(kind, transaction_id, sum(p[2] for p in payments), sum(e[1] for e in entries))
+            for payment in payments:
+                mark(payment[1], 'duplicate')
+            counts[kind] += 1
+            continue
+
+        _, payment_id, db_amount, status = payments[0]
+        statement_amount = entries[0][1]
+        if abs(db_amount - statement_amount) > AMOUNT_TOLERANCE:
+            on_issue('amount_mismatch', transaction_id, db_amount, statement_amount)
+            mark(payment_id, 'mismatch')
+            counts['amount_mismatch'] += 1
+        elif status != 'completed':
+            on_issue('status_mismatch', transaction_id, db_amount, statement_amount)
+            mark(payment_id, 'mismatch')
+            counts['status_mismatch'] += 1
+        else:
+            mark(payment_id, 'verified')
+            counts['matched'] += 1
+
+    return counts
+
+
+# ------------------------------------------------------------------ CLI
+settlement_cli = AppGroup('settlement', help="End-of-day settlement jobs.")
+
+
+@settlement_cli.command('reconcile')
+@click.option('--date', 'day', required=True, type=click.DateTime(formats=['%Y-%m-%d']), help="Business day to settle (UTC).")
+@click.option('--statement', required=True, type=click.Path(exists=True, dir_okay=False), help="Gateway statement CSV.")
+@click.option('--report', type=click.Path(dir_okay=False, writable=True), help="Write discrepancies to this CSV (default: stdout).")
+@click.option('--id-column', default='transaction_id', show_default=True)
+@click.option('--amount-column', default='amount', show_default=True)
+@click.option('--batch-size', default=1000, show_default=True, help="Rows fetched and updated per round-trip.")
+@click.option('--dry-run', is_flag=True, help="Report only; do not record verification results.")
+def reconcile_command(day, statement, report, id_column, amount_column, batch_size, dry_run):
+    """Reconcile a day's gateway payments against a statement export."""
+    out = open(report, 'w', newline='') if report else sys.stdout
+    try:
+        writer = csv.writer(out)
+        writer.writerow(['issue', 'transaction_id', 'db_amount', 'statement_amount'])
+        marks = _StatusWriter(batch_size)
+        invalid = []
+
+        def on_invalid(transaction_id, raw_amount, line):
+            # One bad line must not abort the whole file; it is reported and left unmatched
+            click.echo(f"Statement line {line}: invalid amount {raw_amount!r} for {transaction_id}; skipped", err=True)
+            writer.writerow(['invalid_amount', transaction_id, None, raw_amount])
+            invalid.append(line)
+
+        counts = reconcile(
+            day_payments(day.date(), batch_size),
+            sorted_statement(statement, id_column, amount_column, on_invalid=on_invalid),
+            on_issue=lambda *issue: writer.writerow(issue),
+            mark=None if dry_run else marks.add
+        )
+        if invalid:
+            counts['invalid_amount'] = len(invalid)
+        if dry_run:
+            db.session.rollback()
+        else:
+            marks.flush()
+            db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    finally:
+        if report:
+            out.close()
+
+    summary = ', '.join(f"{kind}={count}" for kind, count in sorted(counts.items())) or 'no payments'
+    click.echo(f"Settlement {day.date()}: {summary}", err=True)
+
+
+def init_settlement(app):
+    app.cli.add_command(settlement_cli)
@@ -0,0 +1,132 @@
+# utils/throttle.py
+"""Sliding-window rate limits for the authentication endpoints.
+
+Each rule allows ``limit`` hits per ``period`` seconds per key (client IP or
+submitted email). The sliding window is estimated from two fixed windows:
+the current count plus the previous window's count weighted by how much of it
+still overlaps. The ``throttle`` decorator checks every rule before the view
+runs, so a throttled request never reaches the user lookup or the password hash.
+
+Keys are stored as a SHA-256 digest, so an attacker-chosen email cannot make
+a counter key of arbitrary size in either backend.
+
+THROTTLE_BACKEND picks where counts live. ``memory`` is per process and has no
+I/O. ``database`` stores them in ``throttle_counters`` with one
+``INSERT ... ON CONFLICT ... RETURNING`` per key, so all workers share them.
+"""
+
+import hashlib
+import threading
+import time
+from functools import wraps
+
+from flask import current_app, jsonify, request
+from sqlalchemy import delete, select
+
+from models import db, ThrottleCounter
+from utils.upsert import upsert_increment
+
+
+class MemoryBackend:
+    def __init__(self, app):
+        self._counts = {}
+        self._lock = threading.Lock()
+        self._pruned_at = 0.0
+
+    def hit(self, key, window_start, period):
+        """Count a hit; returns (hits in the current window, hits in the previous one)."""
+        now = time.time()
+        with self._lock:
+            current = self._counts.get((key, window_start), (0, 0))[0] + 1
+            self._counts[(key, window_start)] = (current, window_start + 2 * period)
+            previous = self._counts.get((key, window_start - period), (0, 0))[0]
+            if now - self._pruned_at > 1:
+                self._counts = {k: v for k, v in self._counts.items() if v[1] > now}
+                self._pruned_at = now
+        return current, previous
+
+
+class DatabaseBackend:
+    def __init__(self, app):
+        periods = [_parse(rule)[1] for rule in app.config.get('THROTTLE_RULES', {}).values()]
+        self.horizon = 2 * max(periods, default=3600)
+        self._pruned_at = 0
+
+    def hit(self, key, window_start, period):
+        table = ThrottleCounter.__table__
+        # Own short transaction: the count must stick even if the request rolls back
+        with db.engine.begin() as connection:
+            current = upsert_increment(
+                connection, table, {"key": key, "window_start": window_start}, {"hits": 1}, returning=['hits']
+            ).scalar()
+            previous = connection.execute(
+                select(table.c.hits).where(table.c.key == key, table.c.window_start == window_start - period)
+            ).scalar() or 0
+            now = int(time.time())
+            if now - self._pruned_at > 60:
+                connection.execute(delete(table).where(table.c.window_start < now - self.horizon))
+                self._pruned_at = now
+        return current, previous
+
+
+MAX_EMAIL_LENGTH = 254  # RFC 5321 path limit; longer input is refused before it is counted
+
+BACKENDS = {
+    'memory': MemoryBackend,
+    'database': DatabaseBackend,
+}
+
+_backend = None
+
+
+def _parse(rule):
+    """``"10/60"`` -> (10, 60): ten hits per sixty seconds."""
+    limit, period = rule.split('/')
+    return int(limit), int(period)
+
+
+def init_throttle(app):
+    global _backend
+    name = app.config.get('THROTTLE_BACKEND', 'memory')
+    if name not in BACKENDS:
+        raise RuntimeError(f"Unknown throttle backend: {name}")
+    _backend = BACKENDS[name](app)
+
+
+def hit(rule_name, key, now=None):
+    """Count a hit against ``rule_name`` for ``key``; returns seconds to wait, or 0 if allowed."""
+    rule = current_app.config.get('THROTTLE_RULES', {}).get(rule_name)
+    if not rule or not key:
+        return 0
+    limit, period = _parse(rule)
+    now = now or time.time()
+    window_start = int(now // period * period)
+    digest = hashlib.sha256(key.encode()).hexdigest()
+    current, previous = _backend.hit(f"{rule_name}:{digest}", window_start, period)
+    overlap = 1 - (now - window_start) / period
+    if current + previous * overlap <= limit:
+        return 0
+    # Conservative: by the time the current window rolls over the estimate has dropped
+    return max(1, int(window_start + period - now))
+
+
+def throttle(endpoint):
+    """Apply the ``<endpoint>_ip`` and ``<endpoint>_email`` rules before the view runs."""
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            if current_app.config.get('THROTTLE_ENABLED', True):
+                data = request.get_json(silent=True) or {}
+                email = data.get('email') if isinstance(data, dict) else None
+                wait = hit(f"{endpoint}_ip", request.remote_addr)
+                if isinstance(email, str) and len(email) <= MAX_EMAIL_LENGTH:
+                    wait = max(wait, hit(f"{endpoint}_email", email.strip().lower()))
+                elif email is not None and not wait:
+                    return jsonify({"error": "Invalid email"}), 400
+                if wait:
+                    response = jsonify({"error": "Too many attempts, please try again later"})
+                    response.headers['Retry-After'] = str(wait)
+                    return response, 429
+            return f(*args, **kwargs)
+        return decorated_function
+    return decorator
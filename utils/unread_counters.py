@@ -0,0 +1,301 @@
+# utils/unread_counters.py
+
+import os
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from datetime import datetime, timedelta
+
+import click
+from flask import current_app
+from flask.cli import AppGroup
+from sqlalchemy import and_, delete, func, literal, or_, select
+
+from models import db, Notification, NotificationInbox, User
+from utils.upsert import upsert_increment, upsert_increment_from_select, upsert_values
+
+
+class UnreadCountCache:
+    """Process-local, bounded TTL cache of unread counts keyed by user id.
+
+    Other workers' writes become visible once an entry expires, so ``ttl``
+    bounds how stale a badge can be. Writes made by this process invalidate
+    their entries on commit.
+    """
+
+    def __init__(self, ttl=5.0, max_entries=10000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, user_id):
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is None:
+                return None
+            count, expires = entry
+            if expires < time.monotonic():
+                del self._entries[user_id]
+                return None
+            self._entries.move_to_end(user_id)
+            return count
+
+    def set(self, user_id, count):
+        with self._lock:
+            self._entries[user_id] = (count, time.monotonic() + self.ttl)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_ids=None):
+        with self._lock:
+            if user_ids is None:
+                self._entries.clear()
+            for user_id in user_ids or ():
+                self._entries.pop(user_id, None)
+
+
+unread_cache = UnreadCountCache()
+
+
+def init_unread_counters(app):
+    unread_cache.ttl = app.config.get('NOTIFICATION_UNREAD_CACHE_TTL', 5.0)
+    unread_cache.max_entries = app.config.get('NOTIFICATION_UNREAD_CACHE_SIZE', 10000)
+    app.cli.add_command(notifications_cli)
+    expiry_purger.init_app(app)
+
+
+# ------------------------------------------------------------ maintenance
+def mark_dirty(session, user_ids):
+    """Drop the cached counts for ``user_ids`` once ``session`` commits."""
+    session.info.setdefault('unread_dirty', set()).update(user_ids)
+
+
+def adjust_unread(connection, deltas):
+    """Apply ``{user_id: delta}`` to the stored counters inside the caller's transaction."""
+    table = NotificationInbox.__table__
+    for user_id, delta in deltas.items():
+        if delta:
+            upsert_increment(connection, table, {"user_id": user_id}, {"unread_count": delta})
+
+
+def increment_unread_for(audience, session=None):
+    """Add one unread notification for every user matching the ``audience`` filter."""
+    session = session or db.session
+    upsert_increment_from_select(
+        session.connection(),
+        NotificationInbox.__table__,
+        ['user_id'], ['unread_count'],
+        select(User.id, literal(1)).where(audience)
+    )
+    # Broadcast audiences are large; expire everything rather than tracking ids
+    session.info['unread_dirty_all'] = True
+
+
+def unread_criteria(last_read_at=None):
+    """WHERE clause for notifications that are still unread.
+
+    ``last_read_at`` is either one user's watermark (a datetime or None), which
+    keeps the query a range scan over the inbox index, or the
+    ``NotificationInbox.last_read_at`` column when joining across users.
+    """
+    unread = Notification.is_read.is_(False)
+    if last_read_at is None:
+        return unread
+    if isinstance(last_read_at, datetime):
+        return and_(unread, Notification.created_at > last_read_at)
+    return and_(unread, or_(last_read_at.is_(None), Notification.created_at > last_read_at))
+
+
+def read_watermark(user_id, session=None):
+    """The user's "mark all read" watermark, or None if they never used it."""
+    session = session or db.session
+    return session.execute(
+        select(NotificationInbox.last_read_at).where(NotificationInbox.user_id == user_id)
+    ).scalar()
+
+
+def read_watermarks(connection, user_ids):
+    """``{user_id: last_read_at}`` for the users that have a watermark."""
+    rows = connection.execute(
+        select(NotificationInbox.user_id, NotificationInbox.last_read_at).where(
+            NotificationInbox.user_id.in_(list(user_ids)),
+            NotificationInbox.last_read_at.isnot(None)
+        )
+    )
+    return dict(rows.all())
+
+
+def mark_all_read(user_id, now=None, session=None):
+    """Move the user's watermark to ``now``: a single-row write however many are unread.
+
+    The caller commits.
+    """
+    session = session or db.session
+    upsert_values(
+        session.connection(), NotificationInbox.__table__, {"user_id": user_id},
+        {"last_read_at": now or datetime.utcnow(), "unread_count": 0}
+    )
+    mark_dirty(session, [user_id])
+
+
+def count_unread(user_id):
+    """The authoritative unread count, computed from the notifications table.
+
+    Expired rows still count until ``expiry_purger`` deletes them (and
+    decrements the counter), so this matches what the maintained counter
+    tracks. The purge runs every NOTIFICATION_PURGE_INTERVAL seconds, which
+    bounds how long the badge can include notifications the inbox hides.
+    """
+    return Notification.query.filter(
+        Notification.recipient_id == user_id,
+        unread_criteria(read_watermark(user_id))
+    ).count()
+
+
+def reconcile(user_id):
+    """Recompute one user's counter from the notifications table and store it."""
+    count = count_unread(user_id)
+    upsert_values(
+        db.session.connection(), NotificationInbox.__table__, {"user_id": user_id},
+        {"unread_count": count, "reconciled_at": datetime.utcnow()}
+    )
+    db.session.commit()
+    return count
+
+
+def unread_count_for(user_id):
+    """Unread count for the badge: cache hit, else a primary-key lookup."""
+    count = unread_cache.get(user_id)
+    if count is not None:
+        return count
+
+    inbox = db.session.get(NotificationInbox, user_id)
+    interval = timedelta(seconds=current_app.config.get('NOTIFICATION_COUNTER_RECONCILE_INTERVAL', 3600))
+    if inbox is None or inbox.reconciled_at is None or inbox.reconciled_at < datetime.utcnow() - interval:
+        count = reconcile(user_id)
+    else:
+        count = max(inbox.unread_count, 0)
+
+    unread_cache.set(user_id, count)
+    return count
+
+
+def purge_expired(batch_size=1000, pause=0.0, now=None):
+    """Delete expired notifications in bounded batches, one short transaction each.
+
+    Each batch is picked through the ``expires_at`` index and the unread
+    counters of its recipients are adjusted in the same transaction, for the
+    rows this call actually deleted. Returns the number of rows deleted.
+    """
+    now = now or datetime.utcnow()
+    deleted = 0
+    while True:
+        batch = db.session.execute(
+            select(Notification.id, Notification.recipient_id, unread_criteria(NotificationInbox.last_read_at))
+            .outerjoin(NotificationInbox, NotificationInbox.user_id == Notification.recipient_id)
+            .where(Notification.expires_at < now)
+            .order_by(Notification.expires_at)
+            .limit(batch_size)
+        ).all()
+        if not batch:
+            return deleted
+
+        gone = set(db.session.execute(
+            delete(Notification)
+            .where(Notification.id.in_([row.id for row in batch]))
+            .returning(Notification.id)
+            .execution_options(synchronize_session=False)
+        ).scalars())
+
+        # Another worker's purge may have deleted (and counted) some of the batch already
+        deltas = defaultdict(int)
+        for notification_id, recipient_id, unread in batch:
+            if unread and notification_id in gone:
+                deltas[recipient_id] -= 1
+        adjust_unread(db.session.connection(), deltas)
+        mark_dirty(db.session, deltas)
+        db.session.commit()
+
+        deleted += len(gone)
+        if len(batch) < batch_size:
+            return deleted
+        if pause:
+            time.sleep(pause)  # let other writers in between batches
+
+
+class ExpiryPurger:
+    """Per-process thread running ``purge_expired`` every NOTIFICATION_PURGE_INTERVAL seconds.
+
+    Workers may purge concurrently; each only decrements for the rows it deleted.
+    """
+
+    def __init__(self):
+        self.app = None
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.app = app
+        if app.config.get('NOTIFICATION_PURGE_INTERVAL', 300):
+            # Started by the first request, so CLI commands such as `flask db upgrade` never run it
+            app.before_request(self._ensure_started)
+
+    def _ensure_started(self):
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            self._thread = threading.Thread(target=self._run, name='notification-purge', daemon=True)
+            self._thread.start()
+            self._pid = os.getpid()
+
+    def _run(self):
+        interval = self.app.config.get('NOTIFICATION_PURGE_INTERVAL', 300)
+        while True:
+            time.sleep(interval)
+            try:
+                with self.app.app_context():
+                    purge_expired(pause=0.05)
+            except Exception:
+                self.app.logger.exception("Purging expired notifications failed")
+
+
+expiry_purger = ExpiryPurger()
+
+
+# ------------------------------------------------------------------ CLI
+notifications_cli = AppGroup('notifications', help="Notification maintenance.")
+
+
+@notifications_cli.command('purge-expired')
+@click.option('--batch-size', default=1000, show_default=True, help="Rows deleted per transaction.")
+@click.option('--pause', default=0.05, show_default=True, help="Seconds to sleep between batches.")
+def purge_expired_command(batch_size, pause):
+    """Delete notifications whose expires_at has passed."""
+    deleted = purge_expired(batch_size=batch_size, pause=pause)
+    click.echo(f"Purged {deleted} expired notification(s)")
+
+
+@notifications_cli.command('reconcile-counters')
+def reconcile_counters_command():
+    """Recompute every user's unread counter from the notifications table."""
+    now = datetime.utcnow()
+    counts = (
+        select(Notification.recipient_id, func.count(Notification.id))
+        .outerjoin(NotificationInbox, NotificationInbox.user_id == Notification.recipient_id)
+        .where(unread_criteria(NotificationInbox.last_read_at))
+        .group_by(Notification.recipient_id)
+    )
+    table = NotificationInbox.__table__
+    db.session.execute(table.update().values(unread_count=0, reconciled_at=now))
+    fixed = 0
+    for user_id, count in db.session.execute(counts).all():
+        upsert_values(db.session.connection(), table, {"user_id": user_id}, {"unread_count": count, "reconciled_at": now})
+        fixed += 1
+    db.session.commit()
+    unread_cache.invalidate()
+    click.echo(f"Reconciled unread counters for {fixed} user(s)")
@@ -0,0 +1,65 @@
+# utils/upsert.py
+
+from sqlalchemy import func
+from sqlalchemy.dialects import postgresql, sqlite
+
+
+def _insert_for(dialect_name):
+    if dialect_name == 'postgresql':
+        return postgresql.insert
+    if dialect_name == 'sqlite':
+        return sqlite.insert
+    raise NotImplementedError(f"Upserts are not supported on {dialect_name}")
+
+
+def upsert_increment(connection, table, keys, increments, returning=None, values=None):
+    """Add ``increments`` to the row identified by ``keys``, inserting it if missing.
+
+    Runs as a single ``INSERT ... ON CONFLICT DO UPDATE`` so concurrent writers
+    never lose an update. ``keys`` must match a unique constraint on ``table``.
+    ``values``, if given, are written as they are alongside the increments.
+    """
+    values = values or {}
+    insert = _insert_for(connection.dialect.name)
+    stmt = insert(table).values(**keys, **increments, **values)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=list(keys),
+        set_={**{name: table.c[name] + stmt.excluded[name] for name in increments}, **values}
+    )
+    if returning is not None:
+        stmt = stmt.returning(*[table.c[name] for name in returning])
+    return connection.execute(stmt)
+
+
+def upsert_increment_from_select(connection, table, key_names, increment_names, select):
+    """Like ``upsert_increment`` for every row produced by ``select``.
+
+    ``select`` yields the key columns followed by the increment columns, in the
+    order given. SQLite requires it to carry a WHERE clause (``WHERE true`` will do).
+    """
+    insert = _insert_for(connection.dialect.name)
+    stmt = insert(table).from_select([*key_names, *increment_names], select)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=list(key_names),
+        set_={name: table.c[name] + stmt.excluded[name] for name in increment_names}
+    )
+    return connection.execute(stmt)
+
+
+def upsert_values(connection, table, keys, values):
+    """Insert or overwrite the row identified by ``keys`` with ``values``."""
+    insert = _insert_for(connection.dialect.name)
+    stmt = insert(table).values(**keys, **values)
+    stmt = stmt.on_conflict_do_update(index_elements=list(keys), set_=values)
+    return connection.execute(stmt)
+
+
+def upsert_fill(connection, table, keys, values):
+    """Insert the row identified by ``keys``, or set only those ``values`` that are still NULL."""
+    insert = _insert_for(connection.dialect.name)
+    stmt = insert(table).values(**keys, **values)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=list(keys),
+        set_={name: func.coalesce(table.c[name], stmt.excluded[name]) for name in values}
+    )
+    return connection.execute(stmt)
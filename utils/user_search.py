@@ -0,0 +1,54 @@
+# utils/user_search.py
+
+from sqlalchemy import literal_column, select, table
+
+from models import db, User
+from models.user import RoleEnum
+
+STATUSES = ("active", "suspended", "banned")
+
+_users_fts = table('users_fts')
+
+
+def _like_pattern(term):
+    escaped = term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    return f"%{escaped}%"
+
+
+def email_prefix_filter(prefix):
+    """Case-insensitive prefix match as a range over the ``lower(email)`` index, not a scanning LIKE."""
+    prefix = prefix.lower()
+    email = db.func.lower(User.email)
+    return db.and_(email >= prefix, email < prefix + '￿')
+
+
+def name_filter(term, dialect_name):
+    """Case-insensitive substring match on ``full_name`` through the dialect's trigram index."""
+    if dialect_name == 'sqlite' and len(term) >= 3:
+        # FTS5 trigram phrase; quotes inside the term are doubled
+        phrase = '"' + term.replace('"', '""') + '"'
+        matches = select(literal_column('rowid')).select_from(_users_fts).where(
+            literal_column('users_fts').op('MATCH')(phrase)
+        )
+        return User.id.in_(matches)
+    # Postgres: served by the pg_trgm GIN index; shorter terms have no trigrams to use
+    return User.full_name.ilike(_like_pattern(term), escape='\\')
+
+
+def search_users(name=None, email=None, role=None, status=None, before=None, limit=25):
+    """One page of users matching every given filter, newest first.
+
+    ``before`` is the id of the last user on the previous page (keyset paging).
+    """
+    query = User.query
+    if email:
+        query = query.filter(email_prefix_filter(email))
+    if name:
+        query = query.filter(name_filter(name, db.session.get_bind().dialect.name))
+    if role:
+        query = query.filter(User.role == RoleEnum(role))
+    if status:
+        query = query.filter(User.status == status)
+    if before is not None:
+        query = query.filter(User.id < before)
+    return query.order_by(User.id.desc()).limit(limit).all()